@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from constants import ACTIVITY_CACHE_MAX_SIZE
+from constants import ACTIVITY_CACHE_TTL
+from files import get_state_directory
+from typing import Optional
+
+
+class ActivityCache:
+    """
+    On-disk cache of the full activities, keyed by event UID, so that replayed
+    pages, backfill re-runs and retries don't fetch the same activities again.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the payloads take more than `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: Optional[str] = None,
+        ttl: float = ACTIVITY_CACHE_TTL,
+        max_size: int = ACTIVITY_CACHE_MAX_SIZE,
+        compress: bool = True,
+    ) -> None:
+        self._ttl = ttl
+        self._max_size = max_size
+        self._compress = compress
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+
+        path = path or os.path.join(get_state_directory(), "activity_cache.db")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(
+            path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS activities ("
+            " uid TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " compressed INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL"
+            ")"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS activities_accessed_at"
+            " ON activities (accessed_at)"
+        )
+        with self._lock:
+            self._evict()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get(self, uid: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload, compressed FROM activities"
+                " WHERE uid = ? AND created_at > ?",
+                (uid, now - self._ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE activities SET accessed_at = ? WHERE uid = ?", (now, uid)
+            )
+
+        payload, compressed = row
+        return json.loads(zlib.decompress(payload) if compressed else payload)
+
+    def set(self, uid: str, activity: dict) -> None:
+        payload = json.dumps(activity, separators=(",", ":")).encode("utf8")
+        if self._compress:
+            payload = zlib.compress(payload)
+
+        with self._lock:
+            now = time.time()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO activities"
+                " (uid, payload, compressed, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (uid, payload, int(self._compress), len(payload), now, now),
+            )
+            # Tracked in memory to avoid summing the whole table on every insert,
+            # the actual size is computed again when evicting.
+            self._size += len(payload)
+            if self._size > self._max_size:
+                self._evict()
+
+    def _get_size(self) -> int:
+        (size,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM activities"
+        ).fetchone()
+        return size
+
+    def _evict(self) -> None:
+        self._connection.execute(
+            "DELETE FROM activities WHERE created_at <= ?", (time.time() - self._ttl,)
+        )
+
+        # Evicts down to 90% of the limit, so that the next inserts don't have
+        # to evict again right away.
+        excess = self._get_size() - int(self._max_size * 0.9)
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM activities WHERE uid IN ("
+                " SELECT uid FROM ("
+                "  SELECT uid, SUM(size) OVER (ORDER BY accessed_at, uid) - size"
+                "   AS evicted_before"
+                "  FROM activities"
+                " ) WHERE evicted_before < ?"
+                ")",
+                (excess,),
+            )
+        self._size = self._get_size()
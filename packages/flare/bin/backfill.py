@@ -0,0 +1,91 @@
+import json
+
+from dataclasses import dataclass
+from dataclasses import replace
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class BackfillSlice:
+    """
+    A time range of the backfill, scrolled on its own cursor.
+    """
+
+    index: int
+    start: datetime
+    end: datetime
+    next: Optional[str] = None
+    done: bool = False
+
+    def advance(self, *, next: Optional[str], done: bool = False) -> "BackfillSlice":
+        return replace(self, next=next or self.next, done=done)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "start": self.start.isoformat(),
+                "end": self.end.isoformat(),
+                "next": self.next,
+                "done": self.done,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, index: int, value: str) -> "BackfillSlice":
+        data = json.loads(value)
+        return cls(
+            index=index,
+            start=datetime.fromisoformat(data["start"]),
+            end=datetime.fromisoformat(data["end"]),
+            next=data["next"],
+            done=data["done"],
+        )
+
+
+@dataclass(frozen=True)
+class BackfillPlan:
+    """
+    Splits the backfill of a new tenant into time slices that are fetched in
+    parallel. The live cursor picks up at `end` once every slice is done.
+    """
+
+    end: datetime
+    slices: list[BackfillSlice]
+
+    @property
+    def done(self) -> bool:
+        return all(backfill_slice.done for backfill_slice in self.slices)
+
+    @property
+    def progress(self) -> float:
+        """
+        Percentage of the backfilled time range that was completely fetched.
+        """
+        total = sum(
+            (backfill_slice.end - backfill_slice.start).total_seconds()
+            for backfill_slice in self.slices
+        )
+        if not total:
+            return 100.0
+
+        done = sum(
+            (backfill_slice.end - backfill_slice.start).total_seconds()
+            for backfill_slice in self.slices
+            if backfill_slice.done
+        )
+        return round(done / total * 100, 1)
+
+
+def plan_backfill(*, start: datetime, end: datetime, slice_count: int) -> BackfillPlan:
+    step = (end - start) / slice_count
+    boundaries = [start + step * index for index in range(slice_count)] + [end]
+    return BackfillPlan(
+        end=end,
+        slices=[
+            BackfillSlice(
+                index=index, start=boundaries[index], end=boundaries[index + 1]
+            )
+            for index in range(slice_count)
+        ],
+    )
@@ -0,0 +1,123 @@
+import time
+
+from backfill import BackfillSlice
+from constants import CHECKPOINT_MAX_INTERVAL
+from constants import CHECKPOINT_MAX_PENDING_EVENTS
+from data_store import DataStore
+from datetime import datetime
+from datetime import timezone
+from dedup import DedupIndex
+from event_emitter import EventSink
+from metrics import Metrics
+from types import TracebackType
+from typing import Optional
+
+
+class Checkpointer:
+    """
+    Buffers the ingestion checkpoints in memory and writes them to the data
+    store in a single commit, either when explicitly flushed (page boundaries,
+    shutdown) or every `max_pending_events` events or `max_interval` seconds.
+    Values that did not change since the last write are never rewritten.
+
+    The emitter is always flushed first, so neither a checkpoint nor the dedup
+    index ever gets ahead of the events that were actually handed over to splunk.
+    """
+
+    def __init__(
+        self,
+        *,
+        data_store: DataStore,
+        emitter: Optional[EventSink] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        max_pending_events: int = CHECKPOINT_MAX_PENDING_EVENTS,
+        max_interval: float = CHECKPOINT_MAX_INTERVAL,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self._data_store = data_store
+        self._emitter = emitter
+        self._dedup_index = dedup_index
+        self._max_pending_events = max_pending_events
+        self._max_interval = max_interval
+        self._metrics = metrics or Metrics()
+
+        self._last_fetch: Optional[datetime] = None
+        self._next_by_tenant: dict[int, str] = {}
+        self._backfill_slices: dict[tuple[int, int], BackfillSlice] = {}
+        self._spool_offsets: dict[int, tuple[int, int]] = {}
+        self._pending_events = 0
+        self._flushed_at = time.monotonic()
+        # When the checkpoints were last written to the data store.
+        self.committed_at: Optional[datetime] = None
+
+    def __enter__(self) -> "Checkpointer":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.flush()
+        if self._dedup_index:
+            self._dedup_index.save(force=True)
+
+    def set_last_fetch(self, last_fetch: datetime) -> None:
+        self._last_fetch = last_fetch
+
+    def set_next_by_tenant(self, tenant_id: int, next: Optional[str]) -> None:
+        if next:
+            self._next_by_tenant[tenant_id] = next
+
+    def set_backfill_slice(self, tenant_id: int, backfill_slice: BackfillSlice) -> None:
+        self._backfill_slices[(tenant_id, backfill_slice.index)] = backfill_slice
+
+    def set_spool_offset(self, tenant_id: int, offset: tuple[int, int]) -> None:
+        self._spool_offsets[tenant_id] = offset
+
+    def record_event(self) -> None:
+        """
+        Counts an emitted event, flushing if too many events or too much time
+        went by since the last flush.
+        """
+        self._pending_events += 1
+        if (
+            self._pending_events >= self._max_pending_events
+            or time.monotonic() - self._flushed_at >= self._max_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self._emitter:
+            with self._metrics.time("emitter_flush"):
+                self._emitter.flush()
+        # Only remembers the UIDs of events that were actually handed over.
+        if self._dedup_index:
+            self._dedup_index.save()
+
+        self._pending_events = 0
+        self._flushed_at = time.monotonic()
+        if (
+            self._last_fetch is None
+            and not self._next_by_tenant
+            and not self._backfill_slices
+            and not self._spool_offsets
+        ):
+            return
+
+        with self._metrics.time("checkpoint"), self._data_store.transaction():
+            if self._last_fetch is not None:
+                self._data_store.set_last_fetch(self._last_fetch)
+            for tenant_id, next in self._next_by_tenant.items():
+                self._data_store.set_next_by_tenant(tenant_id, next)
+            for (tenant_id, _), backfill_slice in self._backfill_slices.items():
+                self._data_store.set_backfill_slice(tenant_id, backfill_slice)
+            for tenant_id, offset in self._spool_offsets.items():
+                self._data_store.set_spool_offset(tenant_id, offset)
+
+        self.committed_at = datetime.now(timezone.utc)
+        self._last_fetch = None
+        self._next_by_tenant = {}
+        self._backfill_slices = {}
+        self._spool_offsets = {}
@@ -6,7 +6,55 @@ APP_NAME = "flare"
 HOST = "localhost"
 SPLUNK_PORT = 8089
 REALM = APP_NAME + "_realm"
-CRON_JOB_THRESHOLD_SINCE_LAST_FETCH = timedelta(minutes=10)
+LEASE_TTL = timedelta(minutes=2)
+LEASE_HEARTBEAT_INTERVAL = 30.0
+DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_FULL_EVENT_MAX_WORKERS = 4
+DEFAULT_TENANT_CONCURRENCY = 4
+DEFAULT_BACKFILL_SLICES = 4
+EVENTS_QUEUE_MAX_SIZE = 1000
+MAX_REQUESTS_PER_SECOND = 25.0
+MIN_REQUESTS_PER_SECOND = 0.2
+MAX_THROTTLED_RETRIES = 5
+FLARE_SESSION_POOL_SIZE = 32
+FEED_PAGE_CHUNK_SIZE = 64 * 1024
+ADAPTIVE_PAGE_SIZE = "auto"
+DEFAULT_ADAPTIVE_PAGE_SIZE = 100
+MIN_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+MAX_PAGE_BYTES = 16 * 1024 * 1024
+PAGE_TARGET_LATENCY = 5.0
+SEARCH_REQUEST_TIMEOUT = 60.0
+ACTIVITY_REQUEST_TIMEOUT = 30.0
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+CHECKPOINT_MAX_PENDING_EVENTS = 1000
+CHECKPOINT_MAX_INTERVAL = 30.0
+EMITTER_MAX_BUFFER_SIZE = 256 * 1024
+EMITTER_MAX_BUFFER_AGE = 1.0
+DEDUP_CAPACITY = 500_000
+DEDUP_FALSE_POSITIVE_RATE = 1e-6
+DEDUP_MAX_GENERATION_AGE = 7 * 24 * 60 * 60.0
+DEDUP_MIN_SAVE_INTERVAL = 30.0
+ACTIVITY_CACHE_TTL = 7 * 24 * 60 * 60.0
+ACTIVITY_CACHE_MAX_SIZE = 256 * 1024 * 1024
+LOOKUP_CACHE_TTL = 15 * 60.0
+SPOOL_SEGMENT_SIZE = 64 * 1024 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024 * 1024
+SPOOL_READ_SIZE = 1024 * 1024
+SPOOL_POLL_INTERVAL = 0.1
+# Upper bounds of the timing histograms, from 1ms to about 2 minutes.
+METRICS_HISTOGRAM_BUCKETS = tuple(0.001 * 2**i for i in range(18))
+METRICS_LOG_MAX_SIZE = 10 * 1024 * 1024
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TOP_FUNCTIONS = 20
+DAEMON_MIN_IDLE_BACKOFF = 1.0
+DEFAULT_DAEMON_IDLE_BACKOFF = 60.0
+DAEMON_CONFIG_RELOAD_INTERVAL = 300.0
+HEC_MAX_BATCH_SIZE = 1024 * 1024
+HEC_ACK_TIMEOUT = 120.0
+HEC_ACK_POLL_INTERVAL = 1.0
+HEC_SOURCE = "flare"
+FULL_EVENT_RETRY_BACKOFF = 1.0
 
 
 class PasswordKeys(Enum):
@@ -16,14 +64,49 @@ class PasswordKeys(Enum):
     SEVERITIES_FILTER = "severities_filter"
     SOURCE_TYPES_FILTER = "source_types_filter"
     NUMBER_OF_DAYS_TO_BACKFILL = "number_of_days_to_backfill"
+    FULL_EVENT_REQUESTS_PER_SECOND = "full_event_requests_per_second"
+    FULL_EVENT_MAX_WORKERS = "full_event_max_workers"
+    TENANT_CONCURRENCY = "tenant_concurrency"
+    OUTPUT_MODE = "output_mode"
+    HEC_URL = "hec_url"
+    HEC_TOKEN = "hec_token"
+    HEC_INDEX = "hec_index"
+    HEC_USE_ACK = "hec_use_ack"
+    HEC_VERIFY_TLS = "hec_verify_tls"
+    SOURCETYPE = "sourcetype"
+    DAEMON_IDLE_BACKOFF = "daemon_idle_backoff"
+    BACKFILL_SLICES = "backfill_slices"
+    DEDUP_ENABLED = "dedup_enabled"
+    PAGE_SIZE = "page_size"
+    DATA_STORE_BACKEND = "data_store_backend"
+
+
+class OutputMode(Enum):
+    STDOUT = "stdout"
+    HEC = "hec"
+
+
+class Sourcetype(Enum):
+    # Line merged on `^{`, timestamped with the time of ingestion.
+    FLARE_JSON = "flare_json"
+    # One event per line, timestamped with the event's creation date.
+    FLARE_NDJSON = "flare_ndjson"
+
+
+class DataStoreBackend(Enum):
+    CONFIG = "config"
+    SQLITE = "sqlite"
 
 
 class DataStoreKeys(Enum):
     START_DATE = "start_date"
     TIMESTAMP_LAST_FETCH = "timestamp_last_fetch"
+    MIGRATED_FROM_CONFIG = "migrated_from_config"
 
     SECTION_METADATA = "metadata"
     SECTION_TENANT_DATA = "tenant_data"
+    SECTION_LEASES = "leases"
+    SECTION_BACKFILL = "backfill"
 
     @staticmethod
     def get_next_token(tenant_id: int) -> str:
@@ -32,3 +115,15 @@ class DataStoreKeys(Enum):
     @staticmethod
     def get_earliest_ingested(tenant_id: int) -> str:
         return f"timestamp_earliest_ingested_{tenant_id}"
+
+    @staticmethod
+    def get_backfill_slice(tenant_id: int, index: int) -> str:
+        return f"{tenant_id}_{index}"
+
+    @staticmethod
+    def get_tenant_lease(tenant_id: int) -> str:
+        return f"tenant_{tenant_id}"
+
+    @staticmethod
+    def get_spool_offset(tenant_id: int) -> str:
+        return f"spool_offset_{tenant_id}"
@@ -1,99 +1,727 @@
-import json
 import os
+import queue
+import signal
 import sys
+import threading
+import time
 
 
 if sys.version_info < (3, 9):
     sys.exit("Error: This application requires Python 3.9 or higher.")
 
-from data_store import ConfigDataStore
+from activity_cache import ActivityCache
+from backfill import BackfillPlan
+from backfill import BackfillSlice
+from backfill import plan_backfill
+from checkpoint import Checkpointer
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextlib import nullcontext
+from data_store import DataStore
+from data_store import get_data_store
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from dedup import DedupIndex
+from event_emitter import EventSink
+from files import get_state_directory
+from spool import Spool
+from spool import SpoolOffset
+from typing import TYPE_CHECKING
+from typing import ContextManager
 from typing import Iterator
+from typing import NamedTuple
 from typing import Optional
 
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "vendor"))
-import vendor.splunklib.client as client
-
 from constants import APP_NAME
-from constants import CRON_JOB_THRESHOLD_SINCE_LAST_FETCH
+from constants import DAEMON_MIN_IDLE_BACKOFF
+from constants import DEFAULT_DAEMON_IDLE_BACKOFF
+from constants import DEFAULT_FULL_EVENT_MAX_WORKERS
+from constants import EMITTER_MAX_BUFFER_AGE
+from constants import EVENTS_QUEUE_MAX_SIZE
 from constants import HOST
+from constants import MAX_REQUESTS_PER_SECOND
+from constants import MIN_REQUESTS_PER_SECOND
 from constants import SPLUNK_PORT
-from constants import PasswordKeys
+from constants import SPOOL_MAX_SIZE
+from constants import SPOOL_POLL_INTERVAL
+from constants import DataStoreKeys
 from flare import FlareAPI
+from hec import get_event_sink
+from hec import get_event_timestamp
+from ingest_config import IngestConfig
+from ingest_config import IngestConfigLoader
+from ingestion_status import write_ingestion_status
+from lease import LeaseKeeper
 from logger import Logger
+from logger import is_profiling_enabled
+from metrics import Metrics
+from metrics import write_metrics
+from rate_limiter import AdaptiveRateLimiter
+
+
+if TYPE_CHECKING:
+    import vendor.splunklib.client as client
 
 
 def main(
     logger: Logger,
-    storage_passwords: client.StoragePasswords,
+    storage_passwords: "client.StoragePasswords",
     flare_api_cls: type[FlareAPI],
-    data_store: ConfigDataStore,
+    data_store: Optional[DataStore] = None,
 ) -> None:
-    # To avoid cron jobs from doing the same work at the same time, exit new cron jobs if a cron job is already doing work
-    last_fetched_timestamp = data_store.get_last_fetch()
-    if last_fetched_timestamp and last_fetched_timestamp > (
-        datetime.now(timezone.utc) - CRON_JOB_THRESHOLD_SINCE_LAST_FETCH
-    ):
-        logger.info(
-            f"Fetched events less than {int(CRON_JOB_THRESHOLD_SINCE_LAST_FETCH.seconds / 60)} minutes ago, exiting"
-        )
-        return
-
-    api_key = get_api_key(storage_passwords=storage_passwords)
-    tenant_ids = get_tenant_ids(storage_passwords=storage_passwords)
-    ingest_full_event_data = get_ingest_full_event_data(
-        storage_passwords=storage_passwords
+    config = IngestConfig.load(storage_passwords=storage_passwords)
+    ingest_events(
+        logger=logger,
+        config=config,
+        flare_api_cls=flare_api_cls,
+        data_store=data_store or get_data_store(backend=config.data_store_backend),
+        rate_limiter=create_rate_limiter(config),
+        dedup_index=DedupIndex() if config.dedup_enabled else None,
+        activity_cache=ActivityCache() if config.ingest_full_event_data else None,
     )
-    number_of_days_to_backfill = get_number_of_days_to_backfill(
-        storage_passwords=storage_passwords
+
+
+def profile_run(*, logger: Logger) -> ContextManager[None]:
+    """
+    Profiles a single ingestion run when profiling is enabled, so that each
+    run of the daemon gets its own artifact instead of one for its lifetime.
+    """
+    if not is_profiling_enabled():
+        return nullcontext()
+
+    # Only imported when enabled, it costs nothing otherwise.
+    from profiling import profile
+
+    return profile(logger=logger, name="ingest_events")
+
+
+def run_daemon(
+    logger: Logger,
+    storage_passwords: "client.StoragePasswords",
+    flare_api_cls: type[FlareAPI],
+    shutdown_event: threading.Event,
+    data_store: Optional[DataStore] = None,
+) -> None:
+    """
+    Polls the feeds continuously until `shutdown_event` is set, keeping the
+    configuration, listed again every few minutes, and the rate limiter
+    between runs. When a run finds no new
+    events, the next one is delayed by an exponential backoff capped by the
+    configured idle backoff.
+
+    Tenants are leased for the duration of each run, so scheduled runs or
+    other daemons can only pick up the tenants this one is not ingesting.
+    The data store backend is chosen with the first configuration, changing
+    it takes a restart.
+    """
+    config_loader = IngestConfigLoader()
+    config: Optional[IngestConfig] = None
+    rate_limiter: Optional[AdaptiveRateLimiter] = None
+    dedup_index: Optional[DedupIndex] = None
+    activity_cache: Optional[ActivityCache] = None
+    idle_backoff = DAEMON_MIN_IDLE_BACKOFF
+
+    logger.info("Starting the ingestion daemon")
+    while not shutdown_event.is_set():
+        try:
+            loaded_config = config_loader.load(storage_passwords=storage_passwords)
+            if loaded_config is not config or rate_limiter is None:
+                config = loaded_config
+                data_store = data_store or get_data_store(
+                    backend=config.data_store_backend
+                )
+                rate_limiter = create_rate_limiter(config, stop_event=shutdown_event)
+                dedup_index = (
+                    (dedup_index or DedupIndex()) if config.dedup_enabled else None
+                )
+                activity_cache = (
+                    (activity_cache or ActivityCache())
+                    if config.ingest_full_event_data
+                    else None
+                )
+
+            with profile_run(logger=logger):
+                events_fetched_count = ingest_events(
+                    logger=logger,
+                    config=config,
+                    flare_api_cls=flare_api_cls,
+                    data_store=data_store,
+                    rate_limiter=rate_limiter,
+                    dedup_index=dedup_index,
+                    activity_cache=activity_cache,
+                    shutdown_event=shutdown_event,
+                )
+        except Exception as e:
+            logger.error(f"Exception={e}")
+            events_fetched_count = 0
+
+        if events_fetched_count:
+            idle_backoff = DAEMON_MIN_IDLE_BACKOFF
+            continue
+
+        shutdown_event.wait(idle_backoff)
+        max_idle_backoff = (
+            config.idle_backoff if config else DEFAULT_DAEMON_IDLE_BACKOFF
+        )
+        idle_backoff = min(idle_backoff * 2, max_idle_backoff)
+    logger.info("Stopped the ingestion daemon")
+
+
+def create_rate_limiter(
+    config: IngestConfig, *, stop_event: Optional[threading.Event] = None
+) -> AdaptiveRateLimiter:
+    # A single rate limiter is shared by every tenant since they all consume
+    # the same API key's quota. The configured rate is only a starting point,
+    # the limiter speeds up or backs off based on the API's responses.
+    # Rates below one request per second still allow a request at a time.
+    return AdaptiveRateLimiter(
+        rate=config.full_event_requests_per_second,
+        capacity=max(1.0, config.full_event_requests_per_second),
+        min_rate=MIN_REQUESTS_PER_SECOND,
+        max_rate=MAX_REQUESTS_PER_SECOND,
+        stop_event=stop_event,
     )
-    severities_filter = get_severities_filter(storage_passwords=storage_passwords)
-    source_types_filter = get_source_types_filter(storage_passwords=storage_passwords)
 
-    data_store.set_last_fetch(datetime.now(timezone.utc))
 
-    total_events_fetched_count = 0
+def ingest_events(
+    logger: Logger,
+    config: IngestConfig,
+    flare_api_cls: type[FlareAPI],
+    data_store: DataStore,
+    rate_limiter: AdaptiveRateLimiter,
+    dedup_index: Optional[DedupIndex] = None,
+    activity_cache: Optional[ActivityCache] = None,
+    shutdown_event: Optional[threading.Event] = None,
+) -> int:
+    """
+    Fetches the new events of every tenant and returns how many were emitted.
+    Setting `shutdown_event` stops the run early, after a final checkpoint.
+
+    Each tenant is leased first, so that runs overlapping with this one skip it
+    instead of fetching the same pages again.
+    """
+    with LeaseKeeper(data_store=data_store, logger=logger) as lease_keeper:
+        tenant_ids: list[int] = []
+        for tenant_id in config.tenant_ids:
+            if lease_keeper.acquire(DataStoreKeys.get_tenant_lease(tenant_id)):
+                tenant_ids.append(tenant_id)
+            else:
+                logger.info(
+                    f"Tenant {tenant_id} is being ingested by another process, skipping"
+                )
+
+        if not tenant_ids:
+            logger.info("Every tenant is being ingested by another process, exiting")
+            return 0
+
+        return ingest_tenants(
+            logger=logger,
+            config=config,
+            tenant_ids=tenant_ids,
+            lease_keeper=lease_keeper,
+            flare_api_cls=flare_api_cls,
+            data_store=data_store,
+            rate_limiter=rate_limiter,
+            dedup_index=dedup_index,
+            activity_cache=activity_cache,
+            shutdown_event=shutdown_event,
+        )
 
-    for tenant_id in tenant_ids:
-        events_fetched_count = 0
 
+class FeedItem(NamedTuple):
+    tenant_id: int
+    # None for the live cursor.
+    backfill_slice: Optional[BackfillSlice]
+    # None once the cursor is done, `completed` tells whether it reached the end.
+    event: Optional[dict]
+    next_token: Optional[str]
+    completed: bool = False
+
+
+def ingest_tenants(
+    logger: Logger,
+    config: IngestConfig,
+    tenant_ids: list[int],
+    lease_keeper: LeaseKeeper,
+    flare_api_cls: type[FlareAPI],
+    data_store: DataStore,
+    rate_limiter: AdaptiveRateLimiter,
+    dedup_index: Optional[DedupIndex] = None,
+    activity_cache: Optional[ActivityCache] = None,
+    shutdown_event: Optional[threading.Event] = None,
+) -> int:
+    started_at = time.monotonic()
+    data_store.set_last_fetch(datetime.now(timezone.utc))
+    # The cache outlives the runs in daemon mode, only this run's lookups are logged.
+    cache_hits, cache_misses = (
+        (activity_cache.hits, activity_cache.misses) if activity_cache else (0, 0)
+    )
+
+    cursors: list[tuple[int, Optional[BackfillSlice]]] = []
+    for tenant_id in tenant_ids:
         # The earliest ingested date serves as a low water mark to look
         # for identifiers 30 days prior to the day a tenant was first configured.
-        start_date = data_store.get_earliest_ingested_by_tenant(tenant_id)
-        if not start_date:
-            start_date = datetime.now(timezone.utc) - timedelta(
-                days=number_of_days_to_backfill
+        if not data_store.get_earliest_ingested_by_tenant(tenant_id):
+            data_store.set_earliest_ingested_by_tenant(
+                tenant_id,
+                datetime.now(timezone.utc)
+                - timedelta(days=config.number_of_days_to_backfill),
+            )
+
+        backfill_plan = get_backfill_plan(
+            config=config, tenant_id=tenant_id, data_store=data_store
+        )
+        if backfill_plan and not backfill_plan.done:
+            cursors.extend(
+                (tenant_id, backfill_slice)
+                for backfill_slice in backfill_plan.slices
+                if not backfill_slice.done
+            )
+        else:
+            cursors.append((tenant_id, None))
+
+    # Stages shared by every tenant, e.g. the emitter's checkpoints, are
+    # recorded apart from the tenants' own.
+    run_metrics = Metrics()
+    tenant_metrics = {tenant_id: Metrics() for tenant_id in tenant_ids}
+
+    # Cursors are fetched concurrently and hand their events over to this
+    # thread, the only one spooling events and committing the feed checkpoints.
+    events_queue: "queue.Queue[FeedItem]" = queue.Queue(maxsize=EVENTS_QUEUE_MAX_SIZE)
+    stop_event = threading.Event()
+    # Tenants whose spool is full stop fetching until their events are emitted.
+    stopped_tenant_ids: set[int] = set()
+
+    def fetch_cursor_feed(
+        tenant_id: int, backfill_slice: Optional[BackfillSlice]
+    ) -> None:
+        events_fetched_count = 0
+        completed = False
+        try:
+            for event, next_token in fetch_feed(
+                logger=logger,
+                api_key=config.api_key,
+                tenant_id=tenant_id,
+                ingest_full_event_data=config.ingest_full_event_data,
+                severities=config.severities_filter,
+                source_types=config.source_types_filter,
+                flare_api_cls=flare_api_cls,
+                data_store=data_store,
+                rate_limiter=rate_limiter,
+                max_workers=config.full_event_max_workers,
+                backfill_slice=backfill_slice,
+                activity_cache=activity_cache,
+                page_size=config.page_size,
+                adaptive_page_size=config.adaptive_page_size,
+                metrics=tenant_metrics[tenant_id],
+            ):
+                if not put_until_stopped(
+                    events_queue,
+                    FeedItem(tenant_id, backfill_slice, event, next_token),
+                    stop_event,
+                ):
+                    return
+                events_fetched_count += 1
+
+                # The lease was taken over by another process, which now owns
+                # this tenant's progress.
+                if tenant_id in stopped_tenant_ids or not lease_keeper.is_held(
+                    DataStoreKeys.get_tenant_lease(tenant_id)
+                ):
+                    return
+            completed = True
+        except Exception:
+            # Already logged by fetch_feed, the cursor resumes on the next run.
+            tenant_metrics[tenant_id].increment("errors")
+        finally:
+            if backfill_slice:
+                logger.info(
+                    f"Fetched {events_fetched_count} events on tenant {tenant_id} backfill slice {backfill_slice.index}"
+                )
+            else:
+                logger.info(
+                    f"Fetched {events_fetched_count} events on tenant {tenant_id}"
+                )
+            # Signals the writer that this cursor is done.
+            put_until_stopped(
+                events_queue,
+                FeedItem(tenant_id, backfill_slice, None, None, completed),
+                stop_event,
             )
-            data_store.set_earliest_ingested_by_tenant(tenant_id, start_date)
 
-        for event, next_token in fetch_feed(
+    total_events_fetched_count = 0
+    newest_materialized_at: dict[int, str] = {}
+    # Tenants whose live cursor read the feed to its end.
+    caught_up_tenant_ids: set[int] = set()
+    remaining_cursors = len(cursors)
+    page_next_tokens: dict[tuple[int, Optional[int]], str] = {}
+    fetching_done = threading.Event()
+
+    with ExitStack() as stack:
+        # Every tenant has its own spool, owned by whoever holds its lease.
+        spools = {
+            tenant_id: stack.enter_context(
+                Spool(path=os.path.join(get_state_directory(), "spool", str(tenant_id)))
+            )
+            for tenant_id in tenant_ids
+        }
+        # The feed checkpoints only move forward once the spool is synced.
+        checkpointers = {
+            tenant_id: stack.enter_context(
+                Checkpointer(
+                    data_store=data_store,
+                    emitter=spools[tenant_id],
+                    metrics=tenant_metrics[tenant_id],
+                )
+            )
+            for tenant_id in tenant_ids
+        }
+        emitter_executor = stack.enter_context(
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="flare-emitter")
+        )
+        drain_future = emitter_executor.submit(
+            drain_spools,
             logger=logger,
-            api_key=api_key,
-            tenant_id=tenant_id,
-            ingest_full_event_data=ingest_full_event_data,
-            severities=severities_filter,
-            source_types=source_types_filter,
-            flare_api_cls=flare_api_cls,
+            spools=spools,
+            emitter=get_event_sink(config),
             data_store=data_store,
-        ):
-            data_store.set_last_fetch(datetime.now(timezone.utc))
+            lease_keeper=lease_keeper,
+            dedup_index=dedup_index,
+            tenant_metrics=tenant_metrics,
+            metrics=run_metrics,
+            fetching_done=fetching_done,
+            shutdown_event=shutdown_event,
+        )
+        executor = stack.enter_context(
+            ThreadPoolExecutor(
+                max_workers=config.tenant_concurrency, thread_name_prefix="flare-tenant"
+            )
+        )
 
-            data_store.set_next_by_tenant(tenant_id, next_token)
+        try:
+            for tenant_id, backfill_slice in cursors:
+                executor.submit(fetch_cursor_feed, tenant_id, backfill_slice)
+
+            while remaining_cursors:
+                if shutdown_event and shutdown_event.is_set():
+                    logger.info("Shutting down, stopping the ingestion")
+                    break
+
+                try:
+                    item = events_queue.get(timeout=EMITTER_MAX_BUFFER_AGE)
+                except queue.Empty:
+                    # Don't hold on to buffered events while tenants are slow.
+                    for tenant_spool in spools.values():
+                        tenant_spool.flush()
+                    continue
+
+                tenant_id = item.tenant_id
+                backfill_slice = item.backfill_slice
+                checkpointer = checkpointers[tenant_id]
+                cursor_key = (
+                    tenant_id,
+                    backfill_slice.index if backfill_slice else None,
+                )
+                # A tenant whose lease was taken over belongs to another process,
+                # its progress and its spool must not be touched anymore.
+                is_leased = (
+                    tenant_id not in stopped_tenant_ids
+                    and lease_keeper.is_held(DataStoreKeys.get_tenant_lease(tenant_id))
+                )
+
+                if item.event is None:
+                    # A cursor that failed partway through a page resumes from
+                    # the last page it completely spooled.
+                    if is_leased and item.completed and backfill_slice:
+                        checkpointer.set_backfill_slice(
+                            tenant_id,
+                            backfill_slice.advance(
+                                next=page_next_tokens.get(cursor_key), done=True
+                            ),
+                        )
+                    elif is_leased and item.completed:
+                        caught_up_tenant_ids.add(tenant_id)
+                    checkpointer.flush()
+                    remaining_cursors -= 1
+                    continue
+
+                if not is_leased:
+                    continue
+
+                tenant_spool = spools[tenant_id]
+                if tenant_spool.size >= SPOOL_MAX_SIZE:
+                    # The rest of the page is fetched again on the next run.
+                    stopped_tenant_ids.add(tenant_id)
+                    logger.info(
+                        f"Spool of tenant {tenant_id} is full, stopping its ingestion"
+                    )
+                    continue
+
+                event = item.event
+                event["tenant_id"] = tenant_id
+                with tenant_metrics[tenant_id].time("spool_write"):
+                    tenant_spool.emit(event)
+                tenant_metrics[tenant_id].increment("events_fetched")
+                # ISO dates of the same feed sort chronologically.
+                materialized_at = event.get("metadata", {}).get("materialized_at")
+                if materialized_at and materialized_at > newest_materialized_at.get(
+                    tenant_id, ""
+                ):
+                    newest_materialized_at[tenant_id] = materialized_at
+
+                checkpointer.set_last_fetch(datetime.now(timezone.utc))
+                checkpointer.record_event()
+                total_events_fetched_count += 1
+
+                # The last event of a page comes with its next token, which is
+                # safe to resume from now that the whole page was spooled.
+                if item.next_token:
+                    page_next_tokens[cursor_key] = item.next_token
+                    if backfill_slice:
+                        checkpointer.set_backfill_slice(
+                            tenant_id, backfill_slice.advance(next=item.next_token)
+                        )
+                    else:
+                        checkpointer.set_next_by_tenant(tenant_id, item.next_token)
+                    checkpointer.flush()
+        finally:
+            stop_event.set()
+            fetching_done.set()
+
+        # Every spooled event is emitted before the spools are closed.
+        suppressed_count = drain_future.result()
 
-            event["tenant_id"] = tenant_id
+    logger.info(f"Fetched {total_events_fetched_count} events across all tenants")
+    if suppressed_count:
+        logger.info(f"Suppressed {suppressed_count} duplicate events")
+    logger.debug(
+        "Request rate is %.2f/s after being throttled %d times",
+        rate_limiter.rate,
+        rate_limiter.throttled_count,
+    )
+    if activity_cache:
+        logger.debug(
+            "Activity cache had %d hits and %d misses",
+            activity_cache.hits - cache_hits,
+            activity_cache.misses - cache_misses,
+        )
 
-            # stdout is picked up by splunk and this is how events
-            # are ingested after being retrieved from Flare.
-            print(json.dumps(event), flush=True)
+    run_duration = time.monotonic() - started_at
+    run_metrics.observe("run", run_duration)
+    try:
+        write_metrics(metrics=run_metrics)
+        for tenant_id, metrics in tenant_metrics.items():
+            write_metrics(metrics=metrics, tenant_id=tenant_id)
+    except Exception as e:
+        # The metrics never get in the way of the ingestion.
+        logger.error(f"Failed to write the metrics: {e}")
 
-            events_fetched_count += 1
-        logger.info(f"Fetched {events_fetched_count} events on tenant {tenant_id}")
-        total_events_fetched_count += events_fetched_count
+    try:
+        write_ingestion_status(
+            get_run_status(
+                data_store=data_store,
+                rate_limiter=rate_limiter,
+                tenant_metrics=tenant_metrics,
+                checkpointers=checkpointers,
+                newest_materialized_at=newest_materialized_at,
+                caught_up_tenant_ids=caught_up_tenant_ids,
+                run_duration=run_duration,
+            )
+        )
+    except Exception as e:
+        logger.error(f"Failed to write the ingestion status: {e}")
+    return total_events_fetched_count
+
+
+def get_run_status(
+    data_store: DataStore,
+    rate_limiter: AdaptiveRateLimiter,
+    tenant_metrics: dict[int, Metrics],
+    checkpointers: dict[int, Checkpointer],
+    newest_materialized_at: dict[int, str],
+    caught_up_tenant_ids: set[int],
+    run_duration: float,
+) -> dict:
+    """
+    Summarizes the run for the status endpoint, which reads it as is instead
+    of going through the data store.
+    """
+    last_fetch = data_store.get_last_fetch()
+    backfill_plans = data_store.get_backfill_plans()
+    tenants: dict[str, dict] = {}
+    for tenant_id, metrics in tenant_metrics.items():
+        committed_at = checkpointers[tenant_id].committed_at
+        backfill_plan = backfill_plans.get(tenant_id)
+        tenants[str(tenant_id)] = {
+            "last_checkpoint_at": committed_at.isoformat() if committed_at else None,
+            "newest_materialized_at": newest_materialized_at.get(tenant_id),
+            "caught_up": tenant_id in caught_up_tenant_ids,
+            "events_emitted": metrics.get_counter("events_emitted"),
+            "events_per_second": metrics.get_counter("events_emitted")
+            / max(run_duration, 1e-3),
+            "errors": metrics.get_counter("errors"),
+            "retries": metrics.get_counter("retries"),
+            "throttles": metrics.get_counter("throttles"),
+            "backfill": {
+                "progress": backfill_plan.progress,
+                "done": backfill_plan.done,
+            }
+            if backfill_plan
+            else None,
+        }
+
+    return {
+        "last_fetched_at": last_fetch.isoformat() if last_fetch else None,
+        "rate_limit": {
+            "rate": rate_limiter.rate,
+            "throttled_count": rate_limiter.throttled_count,
+        },
+        "tenants": tenants,
+    }
+
+
+def get_backfill_plan(
+    config: IngestConfig, tenant_id: int, data_store: DataStore
+) -> Optional[BackfillPlan]:
+    """
+    Returns the backfill plan of a tenant, planning one if the tenant was never
+    fetched before.
+    """
+    backfill_plan = data_store.get_backfill_plan(tenant_id)
+    if backfill_plan or config.backfill_slices < 2:
+        return backfill_plan
+
+    # Tenants that were already fetched, e.g. before backfills were sliced,
+    # simply keep going on their live cursor.
+    start_date = data_store.get_earliest_ingested_by_tenant(tenant_id)
+    if data_store.get_next_by_tenant(tenant_id) or not start_date:
+        return None
+
+    backfill_plan = plan_backfill(
+        start=start_date,
+        end=datetime.now(timezone.utc),
+        slice_count=config.backfill_slices,
+    )
+    data_store.set_backfill_plan(tenant_id, backfill_plan)
+    return backfill_plan
+
+
+def put_until_stopped(
+    events_queue: "queue.Queue[FeedItem]",
+    item: FeedItem,
+    stop_event: threading.Event,
+) -> bool:
+    """
+    Blocks until the item is queued, unless the writer stopped reading.
+    """
+    while not stop_event.is_set():
+        try:
+            events_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def drain_spools(
+    logger: Logger,
+    spools: dict[int, Spool],
+    emitter: EventSink,
+    data_store: DataStore,
+    lease_keeper: LeaseKeeper,
+    dedup_index: Optional[DedupIndex],
+    tenant_metrics: dict[int, Metrics],
+    metrics: Metrics,
+    fetching_done: threading.Event,
+    shutdown_event: Optional[threading.Event] = None,
+) -> int:
+    """
+    Emits the spooled events of every tenant, starting where the previous run
+    stopped, until the fetching is done and every spool was drained. Returns
+    how many duplicate events were suppressed.
+
+    Events spooled by a crashed run are emitted again without going back to
+    the API, the dedup index drops the ones that were already emitted.
+    """
+    offsets: dict[int, SpoolOffset] = {}
+    for tenant_id, tenant_spool in spools.items():
+        offsets[tenant_id] = (
+            data_store.get_spool_offset(tenant_id) or tenant_spool.start
+        )
+        if offsets[tenant_id] < tenant_spool.end:
+            logger.info(
+                f"Emitting the events spooled for tenant {tenant_id} by a previous run"
+            )
 
-    logger.info(f"Fetched {total_events_fetched_count} events across all tenants")
+    suppressed_count = 0
+    with emitter, Checkpointer(
+        data_store=data_store,
+        emitter=emitter,
+        dedup_index=dedup_index,
+        metrics=metrics,
+    ) as checkpointer:
+        while not (shutdown_event and shutdown_event.is_set()):
+            # Checked before reading, the events spooled meanwhile are read by
+            # the next pass.
+            is_fetching_done = fetching_done.is_set()
+            is_drained = True
+            for tenant_id, tenant_spool in spools.items():
+                if not lease_keeper.is_held(DataStoreKeys.get_tenant_lease(tenant_id)):
+                    continue
+
+                events, offset = tenant_spool.read(offsets[tenant_id])
+                if offset == offsets[tenant_id]:
+                    continue
+
+                is_drained = False
+                emitted_at = time.time()
+                batch_suppressed_count = 0
+                with tenant_metrics[tenant_id].time("emit"):
+                    for event in events:
+                        # Pages replayed after a crash, overlapping runs and filter
+                        # changes would otherwise index the same events again.
+                        uid = event.get("metadata", {}).get("uid")
+                        if dedup_index and uid and dedup_index.check_and_add(uid):
+                            batch_suppressed_count += 1
+                            continue
+
+                        # Events are handed over to splunk either through stdout, which
+                        # is picked up by the scripted input, or through HEC.
+                        emitter.emit(event)
+                        checkpointer.record_event()
+
+                        created_at = get_event_timestamp(event)
+                        if created_at is not None:
+                            tenant_metrics[tenant_id].observe(
+                                "lag", emitted_at - created_at
+                            )
+
+                suppressed_count += batch_suppressed_count
+                tenant_metrics[tenant_id].increment(
+                    "duplicates", batch_suppressed_count
+                )
+                tenant_metrics[tenant_id].increment(
+                    "events_emitted", len(events) - batch_suppressed_count
+                )
+
+                # Committed by the next flush, once these events were handed over.
+                checkpointer.set_spool_offset(tenant_id, offset)
+                offsets[tenant_id] = offset
+
+            if is_drained:
+                checkpointer.flush()
+                for tenant_id, tenant_spool in spools.items():
+                    tenant_spool.remove_before(offsets[tenant_id])
+                if is_fetching_done:
+                    break
+                fetching_done.wait(SPOOL_POLL_INTERVAL)
+
+    for tenant_id, tenant_spool in spools.items():
+        tenant_spool.remove_before(offsets[tenant_id])
+    return suppressed_count
 
 
 def fetch_feed(
@@ -104,21 +732,55 @@ def fetch_feed(
     severities: list[str],
     source_types: list[str],
     flare_api_cls: type[FlareAPI],
-    data_store: ConfigDataStore,
-) -> Iterator[tuple[dict, str]]:
+    data_store: DataStore,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    max_workers: int = DEFAULT_FULL_EVENT_MAX_WORKERS,
+    backfill_slice: Optional[BackfillSlice] = None,
+    activity_cache: Optional[ActivityCache] = None,
+    page_size: Optional[int] = None,
+    adaptive_page_size: bool = False,
+    metrics: Optional[Metrics] = None,
+) -> Iterator[tuple[dict, Optional[str]]]:
+    """
+    Fetches a tenant's feed from its live cursor, or from one of its backfill
+    slices. Errors are logged and raised again.
+    """
     flare_api: FlareAPI = flare_api_cls(
         api_key=api_key,
         tenant_id=tenant_id,
         logger=logger,
+        rate_limiter=rate_limiter,
+        max_workers=max_workers,
+        activity_cache=activity_cache,
+        page_size=page_size,
+        adaptive_page_size=adaptive_page_size,
+        metrics=metrics,
     )
 
     try:
-        next = data_store.get_next_by_tenant(tenant_id)
-        start_date = data_store.get_earliest_ingested_by_tenant(tenant_id)
-        logger.info(f"Fetching {tenant_id=}, {next=}, {start_date=}")
+        end_date: Optional[datetime] = None
+        if backfill_slice:
+            next = backfill_slice.next
+            start_date: Optional[datetime] = backfill_slice.start
+            end_date = backfill_slice.end
+            logger.info(
+                f"Fetching {tenant_id=}, backfill_slice={backfill_slice.index}, {next=}, {start_date=}, {end_date=}"
+            )
+        else:
+            next = data_store.get_next_by_tenant(tenant_id)
+            backfill_plan = data_store.get_backfill_plan(tenant_id)
+            # The live cursor starts where the backfill ended.
+            start_date = (
+                backfill_plan.end
+                if backfill_plan
+                else data_store.get_earliest_ingested_by_tenant(tenant_id)
+            )
+            logger.info(f"Fetching {tenant_id=}, {next=}, {start_date=}")
+
         for event_next in flare_api.fetch_feed_events(
             next=next,
             start_date=start_date,
+            end_date=end_date,
             ingest_full_event_data=ingest_full_event_data,
             severities=severities,
             source_types=source_types,
@@ -126,89 +788,12 @@ def fetch_feed(
             yield event_next
     except Exception as e:
         logger.error(f"Exception={e}")
+        raise
 
 
-def get_storage_password_value(
-    storage_passwords: client.StoragePasswords, password_key: str
-) -> Optional[str]:
-    for item in storage_passwords.list():
-        if item.content.username == password_key:
-            return item.clear_password
-
-    return None
-
-
-def get_api_key(storage_passwords: client.StoragePasswords) -> str:
-    api_key = get_storage_password_value(
-        storage_passwords=storage_passwords, password_key=PasswordKeys.API_KEY.value
-    )
-    if not api_key:
-        raise Exception("API key not found")
-    return api_key
-
-
-def get_number_of_days_to_backfill(storage_passwords: client.StoragePasswords) -> int:
-    number_of_days_to_backfill = get_storage_password_value(
-        storage_passwords=storage_passwords,
-        password_key=PasswordKeys.NUMBER_OF_DAYS_TO_BACKFILL.value,
-    )
-
-    try:
-        return int(number_of_days_to_backfill) if number_of_days_to_backfill else 30
-    except Exception as e:
-        raise Exception("Number of days to backfill not a number") from e
-
-
-def get_tenant_ids(storage_passwords: client.StoragePasswords) -> list[int]:
-    stored_tenant_ids = get_storage_password_value(
-        storage_passwords=storage_passwords, password_key=PasswordKeys.TENANT_IDS.value
-    )
-    tenant_ids = None
-    try:
-        tenant_ids = json.loads(stored_tenant_ids) if stored_tenant_ids else None
-    except Exception:
-        pass
-
-    if tenant_ids is None:
-        raise Exception("Tenant IDs not found")
-    return tenant_ids
-
-
-def get_ingest_full_event_data(storage_passwords: client.StoragePasswords) -> bool:
-    return (
-        get_storage_password_value(
-            storage_passwords=storage_passwords,
-            password_key=PasswordKeys.INGEST_FULL_EVENT_DATA.value,
-        )
-        == "true"
-    )
-
-
-def get_severities_filter(storage_passwords: client.StoragePasswords) -> list[str]:
-    severities_filter = get_storage_password_value(
-        storage_passwords=storage_passwords,
-        password_key=PasswordKeys.SEVERITIES_FILTER.value,
-    )
-
-    if severities_filter:
-        return severities_filter.split(",")
-
-    return []
+def get_splunk_service(logger: Logger, token: str) -> "client.Service":
+    import vendor.splunklib.client as client
 
-
-def get_source_types_filter(storage_passwords: client.StoragePasswords) -> list[str]:
-    source_types_filter = get_storage_password_value(
-        storage_passwords=storage_passwords,
-        password_key=PasswordKeys.SOURCE_TYPES_FILTER.value,
-    )
-
-    if source_types_filter:
-        return source_types_filter.split(",")
-
-    return []
-
-
-def get_splunk_service(logger: Logger, token: str) -> client.Service:
     try:
         splunk_service = client.connect(
             host=HOST,
@@ -226,7 +811,6 @@ def get_splunk_service(logger: Logger, token: str) -> client.Service:
 
 if __name__ == "__main__":
     logger = Logger(class_name=__file__)
-    data_store = ConfigDataStore()
     token = sys.stdin.readline().strip()  # SEE: passAuth in https://docs.splunk.com/Documentation/Splunk/9.4.0/Admin/Inputsconf
     if not token:
         raise Exception(
@@ -234,11 +818,23 @@ if __name__ == "__main__":
         )
 
     splunk_service = get_splunk_service(logger=logger, token=token)
-    app: client.Application = splunk_service.apps[APP_NAME]
-
-    main(
-        logger=logger,
-        storage_passwords=app.service.storage_passwords,
-        flare_api_cls=FlareAPI,
-        data_store=data_store,
-    )
+    app = splunk_service.apps[APP_NAME]
+
+    if "--daemon" in sys.argv[1:]:
+        shutdown_event = threading.Event()
+        # Splunk sends SIGTERM when the input is disabled or splunkd stops.
+        signal.signal(signal.SIGTERM, lambda signum, frame: shutdown_event.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: shutdown_event.set())
+        run_daemon(
+            logger=logger,
+            storage_passwords=app.service.storage_passwords,
+            flare_api_cls=FlareAPI,
+            shutdown_event=shutdown_event,
+        )
+    else:
+        with profile_run(logger=logger):
+            main(
+                logger=logger,
+                storage_passwords=app.service.storage_passwords,
+                flare_api_cls=FlareAPI,
+            )
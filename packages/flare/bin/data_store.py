@@ -1,105 +1,424 @@
 import configparser
+import json
 import os
+import sqlite3
+import threading
 
-from constants import APP_NAME
+from abc import ABC
+from abc import abstractmethod
+from backfill import BackfillPlan
+from backfill import BackfillSlice
+from constants import DataStoreBackend
 from constants import DataStoreKeys
+from contextlib import contextmanager
 from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from files import get_app_local_directory
+from files import lock_file
+from files import write_atomically
+from typing import ContextManager
+from typing import Iterator
 from typing import Optional
 
 
-# Define the config file path
-splunk_home = os.environ.get("SPLUNK_HOME", "/opt/splunk")
-config_path = os.path.join(
-    splunk_home, "etc", "apps", f"{APP_NAME}", "local", "data_store.conf"
-)
+def get_config_path() -> str:
+    return os.path.join(get_app_local_directory(), "data_store.conf")
 
 
-class ConfigDataStore:
-    def __init__(self) -> None:
-        config_store = configparser.RawConfigParser()
-        config_store.read(config_path)
+class DataStore(ABC):
+    """
+    Key value store for the ingestion state, organized in sections.
+    """
 
-        # Add data sections
-        if DataStoreKeys.SECTION_METADATA.value not in config_store.sections():
-            config_store.add_section(DataStoreKeys.SECTION_METADATA.value)
-        if DataStoreKeys.SECTION_TENANT_DATA.value not in config_store.sections():
-            config_store.add_section(DataStoreKeys.SECTION_TENANT_DATA.value)
-        self._store = config_store
+    @abstractmethod
+    def _get(self, section: str, key: str) -> Optional[str]:
+        pass
 
-    def _commit(self) -> None:
-        with open(config_path, "w") as configfile:
-            self._store.write(configfile)
+    @abstractmethod
+    def _set(self, section: str, key: str, value: str) -> None:
+        pass
 
-    def _sync(self) -> None:
-        self._store.read(config_path)
+    @abstractmethod
+    def _keys(self, section: str) -> list[str]:
+        pass
 
-    def reset(self) -> None:
-        self._store.clear()
-        self._commit()
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        """
+        Groups several updates into a single write of the data store.
+        """
 
-    def get_last_fetch(self) -> Optional[datetime]:
-        self._sync()
-        last_fetched = self._store.get(
-            DataStoreKeys.SECTION_METADATA.value,
-            DataStoreKeys.TIMESTAMP_LAST_FETCH.value,
-            fallback=None,
-        )
+    @abstractmethod
+    def reset(self) -> None:
+        pass
 
-        if last_fetched:
+    def _get_datetime(self, section: str, key: str) -> Optional[datetime]:
+        value = self._get(section, key)
+        if value:
             try:
-                return datetime.fromisoformat(last_fetched)
+                return datetime.fromisoformat(value)
             except Exception:
                 pass
         return None
 
+    def get_last_fetch(self) -> Optional[datetime]:
+        return self._get_datetime(
+            DataStoreKeys.SECTION_METADATA.value,
+            DataStoreKeys.TIMESTAMP_LAST_FETCH.value,
+        )
+
     def set_last_fetch(self, last_fetch: datetime) -> None:
-        self._store.set(
+        self._set(
             DataStoreKeys.SECTION_METADATA.value,
             DataStoreKeys.TIMESTAMP_LAST_FETCH.value,
             last_fetch.isoformat(),
         )
-        self._commit()
 
     def get_next_by_tenant(self, tenant_id: int) -> Optional[str]:
-        self._sync()
-        return self._store.get(
+        return self._get(
             DataStoreKeys.SECTION_TENANT_DATA.value,
             DataStoreKeys.get_next_token(tenant_id=tenant_id),
-            fallback=None,
         )
 
     def set_next_by_tenant(self, tenant_id: int, next: Optional[str]) -> None:
         if not next:
             return
 
-        self._store.set(
+        self._set(
             DataStoreKeys.SECTION_TENANT_DATA.value,
             DataStoreKeys.get_next_token(tenant_id=tenant_id),
             next,
         )
-        self._commit()
 
     def get_earliest_ingested_by_tenant(self, tenant_id: int) -> Optional[datetime]:
-        self._sync()
-        earliest_ingested = self._store.get(
+        return self._get_datetime(
             DataStoreKeys.SECTION_TENANT_DATA.value,
             DataStoreKeys.get_earliest_ingested(tenant_id=tenant_id),
-            fallback=None,
         )
 
-        if earliest_ingested:
-            try:
-                return datetime.fromisoformat(earliest_ingested)
-            except Exception:
-                pass
-        return None
-
     def set_earliest_ingested_by_tenant(
         self, tenant_id: int, earliest_ingested: datetime
     ) -> None:
-        self._store.set(
+        self._set(
             DataStoreKeys.SECTION_TENANT_DATA.value,
             DataStoreKeys.get_earliest_ingested(tenant_id=tenant_id),
             earliest_ingested.isoformat(),
         )
-        self._commit()
+
+    def get_spool_offset(self, tenant_id: int) -> Optional[tuple[int, int]]:
+        """
+        Returns the offset of the tenant's spool up to which events were emitted.
+        """
+        value = self._get(
+            DataStoreKeys.SECTION_TENANT_DATA.value,
+            DataStoreKeys.get_spool_offset(tenant_id=tenant_id),
+        )
+        if not value:
+            return None
+
+        try:
+            segment, position = value.split(":")
+            return int(segment), int(position)
+        except Exception:
+            return None
+
+    def set_spool_offset(self, tenant_id: int, offset: tuple[int, int]) -> None:
+        self._set(
+            DataStoreKeys.SECTION_TENANT_DATA.value,
+            DataStoreKeys.get_spool_offset(tenant_id=tenant_id),
+            f"{offset[0]}:{offset[1]}",
+        )
+
+    def get_backfill_plan(self, tenant_id: int) -> Optional[BackfillPlan]:
+        with self.transaction():
+            value = self._get(DataStoreKeys.SECTION_BACKFILL.value, str(tenant_id))
+            if not value:
+                return None
+
+            plan = json.loads(value)
+            slices: list[BackfillSlice] = []
+            for index in range(plan["slices"]):
+                slice_value = self._get(
+                    DataStoreKeys.SECTION_BACKFILL.value,
+                    DataStoreKeys.get_backfill_slice(tenant_id, index),
+                )
+                if not slice_value:
+                    return None
+                slices.append(BackfillSlice.from_json(index, slice_value))
+
+        return BackfillPlan(end=datetime.fromisoformat(plan["end"]), slices=slices)
+
+    def get_backfill_plans(self) -> dict[int, BackfillPlan]:
+        plans: dict[int, BackfillPlan] = {}
+        for key in self._keys(DataStoreKeys.SECTION_BACKFILL.value):
+            if key.isdigit():
+                plan = self.get_backfill_plan(int(key))
+                if plan:
+                    plans[int(key)] = plan
+        return plans
+
+    def set_backfill_plan(self, tenant_id: int, plan: BackfillPlan) -> None:
+        with self.transaction():
+            for backfill_slice in plan.slices:
+                self.set_backfill_slice(tenant_id, backfill_slice)
+            # Written last, a plan is only visible once all its slices are.
+            self._set(
+                DataStoreKeys.SECTION_BACKFILL.value,
+                str(tenant_id),
+                json.dumps({"end": plan.end.isoformat(), "slices": len(plan.slices)}),
+            )
+
+    def set_backfill_slice(self, tenant_id: int, backfill_slice: BackfillSlice) -> None:
+        self._set(
+            DataStoreKeys.SECTION_BACKFILL.value,
+            DataStoreKeys.get_backfill_slice(tenant_id, backfill_slice.index),
+            backfill_slice.to_json(),
+        )
+
+    def get_lease(self, name: str) -> Optional[tuple[str, datetime]]:
+        """
+        Returns the owner of a lease and when it expires, if it was ever taken.
+        """
+        value = self._get(DataStoreKeys.SECTION_LEASES.value, name)
+        if not value:
+            return None
+
+        try:
+            owner, expires_at = value.rsplit(" ", 1)
+            return owner, datetime.fromisoformat(expires_at)
+        except Exception:
+            return None
+
+    def try_acquire_lease(self, name: str, owner: str, ttl: timedelta) -> bool:
+        """
+        Takes or renews a lease for `ttl`, unless another owner holds it and
+        it has not expired yet. The transaction makes it exclusive across
+        processes.
+        """
+        with self.transaction():
+            now = datetime.now(timezone.utc)
+            lease = self.get_lease(name)
+            if lease and lease[0] != owner and lease[1] > now:
+                return False
+
+            self._set(
+                DataStoreKeys.SECTION_LEASES.value,
+                name,
+                f"{owner} {(now + ttl).isoformat()}",
+            )
+            return True
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self.transaction():
+            lease = self.get_lease(name)
+            if lease and lease[0] == owner:
+                self._set(
+                    DataStoreKeys.SECTION_LEASES.value,
+                    name,
+                    f"{owner} {datetime.now(timezone.utc).isoformat()}",
+                )
+
+
+class ConfigDataStore(DataStore):
+    def __init__(self, *, path: Optional[str] = None) -> None:
+        self._path = path or get_config_path()
+        config_store = configparser.RawConfigParser()
+        config_store.read(self._path)
+
+        # Add data sections
+        if DataStoreKeys.SECTION_METADATA.value not in config_store.sections():
+            config_store.add_section(DataStoreKeys.SECTION_METADATA.value)
+        if DataStoreKeys.SECTION_TENANT_DATA.value not in config_store.sections():
+            config_store.add_section(DataStoreKeys.SECTION_TENANT_DATA.value)
+        if DataStoreKeys.SECTION_LEASES.value not in config_store.sections():
+            config_store.add_section(DataStoreKeys.SECTION_LEASES.value)
+        if DataStoreKeys.SECTION_BACKFILL.value not in config_store.sections():
+            config_store.add_section(DataStoreKeys.SECTION_BACKFILL.value)
+        self._store = config_store
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._dirty = False
+
+    def _commit(self) -> None:
+        with write_atomically(self._path) as configfile:
+            self._store.write(configfile)
+
+    def _sync(self) -> None:
+        self._store.read(self._path)
+
+    def _get(self, section: str, key: str) -> Optional[str]:
+        with self._lock:
+            # Syncing within a transaction would drop its pending updates, the
+            # file was already read when the transaction started.
+            if not self._transaction_depth:
+                self._sync()
+            return self._store.get(section, key, fallback=None)
+
+    def _keys(self, section: str) -> list[str]:
+        with self._lock:
+            if not self._transaction_depth:
+                self._sync()
+            if not self._store.has_section(section):
+                return []
+            return self._store.options(section)
+
+    def _set(self, section: str, key: str, value: str) -> None:
+        # Updates the latest content of the file, not the one last read.
+        with self.transaction():
+            if self._store.get(section, key, fallback=None) != value:
+                self._store.set(section, key, value)
+                self._dirty = True
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    self._transaction_depth -= 1
+                return
+
+            # Serializes the read-modify-write of the file between processes.
+            with lock_file(f"{self._path}.lock"):
+                self._sync()
+                self._transaction_depth = 1
+                try:
+                    yield
+                finally:
+                    self._transaction_depth = 0
+                    if self._dirty:
+                        self._dirty = False
+                        self._commit()
+
+    def reset(self) -> None:
+        with self.transaction():
+            self._store.clear()
+            self._dirty = True
+
+
+class SqliteDataStore(DataStore):
+    """
+    Data store backed by SQLite in WAL mode, with one row per key. Reads only
+    touch the requested row and concurrent processes are serialized by SQLite.
+    """
+
+    def __init__(self, *, path: Optional[str] = None) -> None:
+        self._connection = sqlite3.connect(
+            path or os.path.join(get_app_local_directory(), "data_store.db"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS data_store ("
+            " section TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " PRIMARY KEY (section, key)"
+            ") WITHOUT ROWID"
+        )
+        self._migrate_from_config()
+
+    def _migrate_from_config(self) -> None:
+        """
+        Imports the state of the configparser data store the first time the
+        SQLite data store is used, so that switching does not re-ingest anything.
+        """
+        with self.transaction():
+            if self._get(
+                DataStoreKeys.SECTION_METADATA.value,
+                DataStoreKeys.MIGRATED_FROM_CONFIG.value,
+            ):
+                return
+
+            config_path = get_config_path()
+            if os.path.exists(config_path):
+                config_store = configparser.RawConfigParser()
+                config_store.read(config_path)
+                for section in config_store.sections():
+                    for key, value in config_store.items(section):
+                        self._set(section, key, value)
+
+            self._set(
+                DataStoreKeys.SECTION_METADATA.value,
+                DataStoreKeys.MIGRATED_FROM_CONFIG.value,
+                datetime.now(timezone.utc).isoformat(),
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _get(self, section: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM data_store WHERE section = ? AND key = ?",
+                (section, key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _keys(self, section: str) -> list[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key FROM data_store WHERE section = ?", (section,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _set(self, section: str, key: str, value: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO data_store (section, key, value) VALUES (?, ?, ?)"
+                " ON CONFLICT (section, key) DO UPDATE SET value = excluded.value"
+                " WHERE value != excluded.value",
+                (section, key, value),
+            )
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    self._transaction_depth -= 1
+                return
+
+            # Take the write lock right away so that two processes never
+            # interleave their updates.
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._transaction_depth = 1
+            try:
+                yield
+            except:
+                self._connection.execute("ROLLBACK")
+                raise
+            else:
+                self._connection.execute("COMMIT")
+            finally:
+                self._transaction_depth = 0
+
+    def reset(self) -> None:
+        # The migration marker is kept so that a reset does not bring back
+        # the state of the configparser data store.
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM data_store WHERE NOT (section = ? AND key = ?)",
+                (
+                    DataStoreKeys.SECTION_METADATA.value,
+                    DataStoreKeys.MIGRATED_FROM_CONFIG.value,
+                ),
+            )
+
+
+def get_data_store(*, backend: DataStoreBackend) -> DataStore:
+    if backend == DataStoreBackend.SQLITE:
+        return SqliteDataStore()
+    return ConfigDataStore()
@@ -0,0 +1,197 @@
+import hashlib
+import math
+import os
+import struct
+import time
+
+from constants import DEDUP_CAPACITY
+from constants import DEDUP_FALSE_POSITIVE_RATE
+from constants import DEDUP_MAX_GENERATION_AGE
+from constants import DEDUP_MIN_SAVE_INTERVAL
+from files import get_state_directory
+from files import write_atomically
+from typing import Optional
+
+
+# Magic, version, bit count, hash count, then the item count and creation
+# time of the current and previous generations.
+_HEADER = struct.Struct("<4sHQHQdQd")
+_MAGIC = b"FDDP"
+_VERSION = 1
+
+
+class BloomGeneration:
+    def __init__(
+        self,
+        *,
+        bit_count: int,
+        hash_count: int,
+        bits: Optional[bytearray] = None,
+        count: int = 0,
+        created_at: Optional[float] = None,
+    ) -> None:
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+        self.count = count
+        self.created_at = time.time() if created_at is None else created_at
+
+    def positions(self, uid: str) -> list[int]:
+        # Double hashing over a single digest, see Kirsch and Mitzenmacher.
+        digest = hashlib.blake2b(uid.encode("utf8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        second |= 1
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+    def contains(self, positions: list[int]) -> bool:
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7)) for position in positions
+        )
+
+    def add(self, positions: list[int]) -> None:
+        bits = self.bits
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class DedupIndex:
+    """
+    Bounded set of the event UIDs that were already emitted, backed by two
+    rotating Bloom filters. New UIDs go into the current generation, which
+    replaces the previous one once it holds `capacity` UIDs or gets older than
+    `max_generation_age`, so memory and disk use stay fixed.
+
+    A false positive drops an event that was never emitted, which is why the
+    default false positive rate is kept very low.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: Optional[str] = None,
+        capacity: int = DEDUP_CAPACITY,
+        false_positive_rate: float = DEDUP_FALSE_POSITIVE_RATE,
+        max_generation_age: float = DEDUP_MAX_GENERATION_AGE,
+        min_save_interval: float = DEDUP_MIN_SAVE_INTERVAL,
+    ) -> None:
+        self._path = path or os.path.join(get_state_directory(), "dedup_index.bin")
+        self._capacity = capacity
+        self._max_generation_age = max_generation_age
+        self._min_save_interval = min_save_interval
+        self._bit_count = math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2
+        )
+        self._hash_count = max(1, round(self._bit_count / capacity * math.log(2)))
+
+        self.suppressed_count = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._current, self._previous = self._load() or (
+            self._new_generation(),
+            self._new_generation(),
+        )
+
+    def _new_generation(self) -> BloomGeneration:
+        return BloomGeneration(bit_count=self._bit_count, hash_count=self._hash_count)
+
+    def _load(self) -> Optional[tuple[BloomGeneration, BloomGeneration]]:
+        if not os.path.exists(self._path):
+            return None
+
+        with open(self._path, "rb") as dedup_file:
+            data = dedup_file.read()
+
+        try:
+            (
+                magic,
+                version,
+                bit_count,
+                hash_count,
+                current_count,
+                current_created_at,
+                previous_count,
+                previous_created_at,
+            ) = _HEADER.unpack_from(data)
+        except struct.error:
+            return None
+
+        size = (bit_count + 7) // 8
+        # The index is rebuilt from scratch when its sizing changed.
+        if (
+            magic != _MAGIC
+            or version != _VERSION
+            or bit_count != self._bit_count
+            or hash_count != self._hash_count
+            or len(data) != _HEADER.size + 2 * size
+        ):
+            return None
+
+        return (
+            BloomGeneration(
+                bit_count=bit_count,
+                hash_count=hash_count,
+                bits=bytearray(data[_HEADER.size : _HEADER.size + size]),
+                count=current_count,
+                created_at=current_created_at,
+            ),
+            BloomGeneration(
+                bit_count=bit_count,
+                hash_count=hash_count,
+                bits=bytearray(data[_HEADER.size + size :]),
+                count=previous_count,
+                created_at=previous_created_at,
+            ),
+        )
+
+    def save(self, *, force: bool = False) -> None:
+        """
+        Writes the index atomically. Unless forced, writes are spaced by at least
+        `min_save_interval` seconds: an index lagging behind only lets a few
+        duplicates through after a crash.
+        """
+        if not self._dirty:
+            return
+        if not force and time.monotonic() - self._saved_at < self._min_save_interval:
+            return
+
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            self._bit_count,
+            self._hash_count,
+            self._current.count,
+            self._current.created_at,
+            self._previous.count,
+            self._previous.created_at,
+        )
+        with write_atomically(self._path, mode="wb") as dedup_file:
+            dedup_file.write(header)
+            dedup_file.write(self._current.bits)
+            dedup_file.write(self._previous.bits)
+
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _rotate_if_needed(self) -> None:
+        if (
+            self._current.count >= self._capacity
+            or time.time() - self._current.created_at >= self._max_generation_age
+        ):
+            self._previous = self._current
+            self._current = self._new_generation()
+
+    def check_and_add(self, uid: str) -> bool:
+        """
+        Returns True if the UID was already seen, otherwise remembers it.
+        """
+        positions = self._current.positions(uid)
+        if self._current.contains(positions) or self._previous.contains(positions):
+            self.suppressed_count += 1
+            return True
+
+        self._rotate_if_needed()
+        self._current.add(positions)
+        self._dirty = True
+        return False
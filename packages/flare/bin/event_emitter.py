@@ -0,0 +1,107 @@
+import json
+import sys
+import time
+
+from abc import ABC
+from abc import abstractmethod
+from constants import EMITTER_MAX_BUFFER_AGE
+from constants import EMITTER_MAX_BUFFER_SIZE
+from types import TracebackType
+from typing import IO
+from typing import Optional
+
+
+# Reusing the encoder avoids building a new one for every event, which
+# json.dumps does as soon as the separators are customized.
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def dumps(event: dict) -> str:
+    return _encoder.encode(event)
+
+
+class EventSink(ABC):
+    """
+    Buffers serialized events and writes them out together once the buffer
+    is large or old enough, instead of one write per event.
+    """
+
+    def __init__(self, *, max_buffer_size: int, max_buffer_age: float) -> None:
+        self._max_buffer_size = max_buffer_size
+        self._max_buffer_age = max_buffer_age
+
+        self._buffer: list[str] = []
+        self._buffer_size = 0
+        self._buffered_at = 0.0
+
+    def __enter__(self) -> "EventSink":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.flush()
+
+    @abstractmethod
+    def _serialize(self, event: dict) -> str:
+        pass
+
+    @abstractmethod
+    def _write(self, data: str) -> None:
+        pass
+
+    def emit(self, event: dict) -> None:
+        serialized_event = self._serialize(event)
+        if not self._buffer:
+            self._buffered_at = time.monotonic()
+        self._buffer.append(serialized_event)
+        self._buffer_size += len(serialized_event)
+
+        if (
+            self._buffer_size >= self._max_buffer_size
+            or time.monotonic() - self._buffered_at >= self._max_buffer_age
+        ):
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if not self._buffer:
+            return
+
+        self._write("".join(self._buffer))
+        self._buffer = []
+        self._buffer_size = 0
+
+    def flush(self) -> None:
+        """
+        Returns once every emitted event has been handed over to splunk.
+        """
+        self._write_buffer()
+
+
+class EventEmitter(EventSink):
+    """
+    Writes events to stdout, where they are picked up by splunk, one JSON
+    document per line.
+    """
+
+    def __init__(
+        self,
+        *,
+        stream: Optional[IO[str]] = None,
+        max_buffer_size: int = EMITTER_MAX_BUFFER_SIZE,
+        max_buffer_age: float = EMITTER_MAX_BUFFER_AGE,
+    ) -> None:
+        super().__init__(max_buffer_size=max_buffer_size, max_buffer_age=max_buffer_age)
+        self._stream = stream
+
+    def _serialize(self, event: dict) -> str:
+        return dumps(event) + "\n"
+
+    def _write(self, data: str) -> None:
+        # Resolved on every write since sys.stdout can be swapped, e.g. by tests.
+        stream = self._stream or sys.stdout
+        stream.write(data)
+        stream.flush()
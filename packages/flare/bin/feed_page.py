@@ -0,0 +1,175 @@
+import codecs
+import json
+import time
+
+from collections import deque
+from typing import Any
+from typing import Iterator
+from typing import Optional
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class JsonStreamReader:
+    """
+    Decodes JSON values one at a time from a stream of byte chunks, only keeping
+    the text of the value being decoded in memory.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._decoder = codecs.getincrementaldecoder("utf8")()
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+        self.size = 0
+        # Time spent waiting for the chunks, not decoding them.
+        self.read_time = 0.0
+
+    def _read(self) -> bool:
+        if self._exhausted:
+            return False
+
+        # Drops the text that was already decoded before growing the buffer.
+        self._buffer = self._buffer[self._position :]
+        self._position = 0
+        while True:
+            started_at = time.monotonic()
+            chunk = next(self._chunks, None)
+            self.read_time += time.monotonic() - started_at
+            if chunk is None:
+                break
+            if chunk:
+                self.size += len(chunk)
+                self._buffer += self._decoder.decode(chunk)
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._exhausted = True
+        return False
+
+    def peek(self) -> str:
+        """
+        Returns the next character that is not whitespace, without consuming it.
+        """
+        while True:
+            while self._position < len(self._buffer):
+                if self._buffer[self._position] not in _WHITESPACE:
+                    return self._buffer[self._position]
+                self._position += 1
+            if not self._read():
+                raise ValueError("Unexpected end of the JSON document")
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(
+                f"Expected one of {characters!r} at {self._position}, got {character!r}"
+            )
+        self._position += 1
+        return character
+
+    def decode(self) -> Any:
+        self.peek()
+        while True:
+            # A value ending with the buffer could be truncated, e.g. a number.
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+                if end < len(self._buffer) or self._exhausted:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise
+
+            # Doubles the buffer so that large values are decoded in linear time.
+            target_size = 2 * (len(self._buffer) - self._position)
+            while len(self._buffer) - self._position < target_size and self._read():
+                pass
+
+
+class FeedPage:
+    """
+    A page of the event feed, parsed while its body is streamed: `items` yields
+    the events one by one, without the whole page ever being held in memory.
+
+    `next` should be read once the items were consumed: reading it first
+    buffers the items when the API sends `next` after them.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._reader = JsonStreamReader(chunks)
+        self._values: dict[str, Any] = {}
+        self._pending_items: "deque[dict]" = deque()
+        self._in_items = False
+        self._done = False
+        self.item_count = 0
+        self._reader.expect("{")
+        if self._reader.peek() == "}":
+            self._reader.expect("}")
+            self._done = True
+
+    def _parse(self) -> Optional[dict]:
+        """
+        Parses the document up to its next item, returning None at its end.
+        """
+        reader = self._reader
+        while not self._done:
+            if self._in_items:
+                if reader.peek() == "]":
+                    reader.expect("]")
+                    self._in_items = False
+                    self._done = reader.expect(",}") == "}"
+                    continue
+
+                item = reader.decode()
+                if reader.peek() != "]":
+                    reader.expect(",")
+                self.item_count += 1
+                return item
+
+            key = reader.decode()
+            reader.expect(":")
+            if key == "items":
+                reader.expect("[")
+                self._in_items = True
+                continue
+
+            self._values[key] = reader.decode()
+            self._done = reader.expect(",}") == "}"
+        return None
+
+    @property
+    def size(self) -> int:
+        """
+        Number of bytes of the body read so far.
+        """
+        return self._reader.size
+
+    @property
+    def read_time(self) -> float:
+        """
+        Seconds spent reading the body so far, without the time the items
+        spent with the caller.
+        """
+        return self._reader.read_time
+
+    @property
+    def next(self) -> Optional[str]:
+        while "next" not in self._values and not self._done:
+            item = self._parse()
+            if item is not None:
+                self._pending_items.append(item)
+        return self._values.get("next")
+
+    def items(self) -> Iterator[dict]:
+        while True:
+            if self._pending_items:
+                yield self._pending_items.popleft()
+                continue
+
+            item = self._parse()
+            if item is None:
+                return
+            yield item
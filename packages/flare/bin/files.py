@@ -0,0 +1,87 @@
+import os
+import sys
+
+from constants import APP_NAME
+from contextlib import contextmanager
+from typing import IO
+from typing import Any
+from typing import Iterator
+
+
+def get_splunk_home() -> str:
+    return os.environ.get("SPLUNK_HOME", "/opt/splunk")
+
+
+def get_app_local_directory() -> str:
+    """
+    Directory of the app's local configuration, which upgrades keep.
+    """
+    return os.path.join(get_splunk_home(), "etc", "apps", APP_NAME, "local")
+
+
+def get_state_directory() -> str:
+    """
+    Directory of the ingestion's bulk state, e.g. its spool. Unlike the app's
+    own directory, it is left out of diags and of the bundles pushed to
+    search head clusters.
+    """
+    return os.path.join(
+        get_splunk_home(), "var", "lib", "splunk", "modinputs", APP_NAME
+    )
+
+
+@contextmanager
+def write_atomically(path: str, *, mode: str = "w") -> Iterator[IO[Any]]:
+    """
+    Yields a temporary file, only readable by its owner, that replaces `path`
+    once it is synced to disk. Readers see either the previous content or the
+    new one, and a crash never leaves a truncated file behind.
+    """
+    # Only imported when writing, which the status endpoint never does.
+    import tempfile
+
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+@contextmanager
+def lock_file(path: str) -> Iterator[None]:
+    """
+    Holds an exclusive lock on `path`, created if needed, which other
+    processes wait for.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+
+            # Locks the first byte. LK_LOCK gives up after 10 tries a second
+            # apart, so waiting longer takes a retry.
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+    finally:
+        # Closing the file releases the lock.
+        os.close(fd)
@@ -5,20 +5,58 @@ if sys.version_info < (3, 9):
     sys.exit("Error: This application requires Python 3.9 or higher.")
 
 
+import random
 import requests
+import socket
+import threading
 import time
 
+from activity_cache import ActivityCache
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from constants import ACTIVITY_REQUEST_TIMEOUT
+from constants import DEFAULT_ADAPTIVE_PAGE_SIZE
+from constants import DEFAULT_FULL_EVENT_MAX_WORKERS
+from constants import DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND
+from constants import FEED_PAGE_CHUNK_SIZE
+from constants import FLARE_SESSION_POOL_SIZE
+from constants import FULL_EVENT_RETRY_BACKOFF
+from constants import MAX_REQUESTS_PER_SECOND
+from constants import MAX_THROTTLED_RETRIES
+from constants import SEARCH_REQUEST_TIMEOUT
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from feed_page import FeedPage
 from logger import Logger
+from metrics import Metrics
+from page_size import PageSizeTuner
+from rate_limiter import AdaptiveRateLimiter
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from token_cache import TokenCache
 from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import Iterator
 from typing import Optional
 from typing import Union
+from urllib.parse import urljoin
+from urllib.parse import urlparse
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import ReadTimeoutError
 from vendor.flareio import FlareApiClient
-from vendor.requests.auth import AuthBase
+
+
+def is_timeout(error: Exception) -> bool:
+    """
+    Tells whether a request failed because the API was too slow to answer,
+    including read timeouts that the session already retried.
+    """
+    if isinstance(error, requests.Timeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, ReadTimeoutError)
 
 
 def ensure_str(value: Union[str, bytes]) -> str:
@@ -27,22 +65,171 @@ def ensure_str(value: Union[str, bytes]) -> str:
     return value
 
 
+def with_page_token(
+    *, events: Iterable[dict], feed_page: FeedPage
+) -> Iterator[tuple[dict, Optional[str]]]:
+    """
+    Pairs the last event of the page with its next token, which is only read
+    once the items were parsed: the API may send it after them, and reading
+    it first would buffer the whole page.
+    """
+    previous_event: Optional[dict] = None
+    for event in events:
+        if previous_event is not None:
+            yield (previous_event, None)
+        previous_event = event
+    if previous_event is not None:
+        yield (previous_event, feed_page.next)
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """
+    Enables TCP keep-alive on the pooled connections, so that the ones idling
+    between the runs of the daemon are not silently dropped by the network.
+    """
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class CachedTokenFlareApiClient(FlareApiClient):
+    """
+    Reuses the API tokens of the token cache, and caches the ones it generates.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: str,
+        tenant_id: Optional[int],
+        session: requests.Session,
+        token_cache: TokenCache,
+    ) -> None:
+        super().__init__(api_key=api_key, tenant_id=tenant_id, session=session)
+        self._token_cache = token_cache
+        self._is_token_cached = False
+
+        cached_token = token_cache.get(api_key=api_key, tenant_id=tenant_id)
+        if cached_token:
+            self._api_token, expires_at = cached_token
+            # The client compares the expiration date to the naive local time.
+            self._api_token_exp = expires_at.astimezone().replace(tzinfo=None)
+            self._is_token_cached = True
+
+    def generate_token(self) -> str:
+        token = super().generate_token()
+        self._is_token_cached = False
+        if self._api_token_exp:
+            self._token_cache.set(
+                api_key=self._api_key,
+                tenant_id=self._tenant_id,
+                token=token,
+                expires_at=self._api_token_exp.astimezone(timezone.utc),
+            )
+        return token
+
+    def _request(
+        self,
+        *,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        request = requests.Request(
+            method=method,
+            url=urljoin(f"https://{self._api_domain}", url),
+            params=params,
+            json=json,
+            headers=headers,
+        )
+        netloc = urlparse(request.url).netloc
+        if netloc != self._api_domain:
+            raise Exception(
+                f"Client was used to access {netloc=} at url={request.url}. Only the domain {self._api_domain} is supported."
+            )
+
+        response = self._send(request=request, stream=stream, timeout=timeout)
+        if response.status_code == 401 and self._is_token_cached:
+            # The cached token was revoked, the request is sent again with a
+            # new one.
+            response.close()
+            self._token_cache.invalidate(
+                api_key=self._api_key, tenant_id=self._tenant_id
+            )
+            self._api_token = None
+            response = self._send(request=request, stream=stream, timeout=timeout)
+        return response
+
+    def _send(
+        self, *, request: requests.Request, stream: bool, timeout: Optional[float]
+    ) -> requests.Response:
+        prepared = self._session.prepare_request(request)
+        prepared = self._apply_auth(request=prepared)
+        # Streamed responses are only read as they are consumed.
+        return self._session.send(prepared, stream=stream, timeout=timeout)
+
+
+_shared_lock = threading.Lock()
+_shared_session: Optional[requests.Session] = None
+_shared_token_cache: Optional[TokenCache] = None
+
+
+def get_flare_session() -> requests.Session:
+    """
+    Returns the session shared by every client of the process, so that tenants
+    and runs reuse the same pooled connections.
+    """
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            session = FlareApiClient._create_session()
+            current_user_agent: str = ensure_str(
+                session.headers.get("User-Agent") or ""
+            )
+            session.headers["User-Agent"] = f"{current_user_agent} flare-splunk".strip()
+
+            # Throttling is handled by our rate limiter, which needs to see the 429s
+            # instead of having them retried blindly by the session.
+            retry = FlareApiClient._create_retry()
+            retry.status_forcelist = frozenset(retry.status_forcelist or []) - {429}
+            session.mount(
+                "https://",
+                KeepAliveHTTPAdapter(
+                    max_retries=retry, pool_maxsize=FLARE_SESSION_POOL_SIZE
+                ),
+            )
+            _shared_session = session
+        return _shared_session
+
+
+def get_token_cache() -> TokenCache:
+    global _shared_token_cache
+    with _shared_lock:
+        if _shared_token_cache is None:
+            _shared_token_cache = TokenCache()
+        return _shared_token_cache
+
+
 def get_flare_api_client(
     *,
     api_key: str,
     tenant_id: Union[int, None],
-) -> FlareApiClient:
-    api_client = FlareApiClient(
+) -> CachedTokenFlareApiClient:
+    # Clients only hold the tenant and its token, switching tenants doesn't
+    # cost a new connection nor a token exchange if one was cached.
+    return CachedTokenFlareApiClient(
         api_key=api_key,
         tenant_id=tenant_id,
+        session=get_flare_session(),
+        token_cache=get_token_cache(),
     )
-    current_user_agent: str = ensure_str(
-        api_client._session.headers.get("User-Agent") or ""
-    )
-    api_client._session.headers["User-Agent"] = (
-        f"{current_user_agent} flare-splunk".strip()
-    )
-    return api_client
 
 
 class FlareAPI(AuthBase):
@@ -52,53 +239,125 @@ class FlareAPI(AuthBase):
         api_key: str,
         tenant_id: Optional[int] = None,
         logger: Logger,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        max_workers: int = DEFAULT_FULL_EVENT_MAX_WORKERS,
+        activity_cache: Optional[ActivityCache] = None,
+        page_size: Optional[int] = None,
+        adaptive_page_size: bool = False,
+        metrics: Optional[Metrics] = None,
     ) -> None:
         self.flare_client = get_flare_api_client(
             api_key=api_key,
             tenant_id=tenant_id,
         )
         self.logger = logger
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            rate=DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND,
+            capacity=DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND,
+            max_rate=MAX_REQUESTS_PER_SECOND,
+        )
+        self.max_workers = max_workers
+        self.activity_cache = activity_cache
+        self.page_size = page_size
+        self.page_size_tuner = (
+            PageSizeTuner(page_size=page_size or DEFAULT_ADAPTIVE_PAGE_SIZE)
+            if adaptive_page_size
+            else None
+        )
+        self.metrics = metrics or Metrics()
 
     def fetch_feed_events(
         self,
         *,
         next: Optional[str] = None,
         start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
         ingest_full_event_data: bool,
         severities: list[str],
         source_types: list[str],
-    ) -> Iterator[tuple[dict, str]]:
-        for response in self._fetch_event_feed_metadata(
+    ) -> Iterator[tuple[dict, Optional[str]]]:
+        """
+        Yields the events of the feed. The last event of every page comes with
+        the page's next token, from which the feed resumes once that event and
+        the ones before it were handed over.
+        """
+        for feed_page in self._fetch_event_feed_metadata(
             next=next,
             start_date=start_date,
+            end_date=end_date,
             severities=severities,
             source_types=source_types,
         ):
-            event_feed = response.json()
-            self.logger.debug(event_feed)
-            next_token = event_feed["next"]
-            for event in event_feed["items"]:
+            events: Iterable[dict] = feed_page.items()
+            if ingest_full_event_data:
+                with self.metrics.time("enrichment"):
+                    events = self._fetch_full_events(events=list(events))
+            yield from with_page_token(events=events, feed_page=feed_page)
+            self.logger.debug("Fetched an event feed page", next=feed_page.next)
+
+    def _fetch_full_events(self, *, events: list[dict]) -> list[dict]:
+        """
+        Fetches the full event data for a whole page concurrently, throttled by
+        the rate limiter. Events are returned in the same order as the page so
+        that the checkpointed `next` token stays correct.
+
+        Activities found in the cache are not fetched again.
+        """
+        if not events:
+            return events
+
+        full_events: list[Optional[dict]] = [
+            self.activity_cache.get(event["metadata"]["uid"])
+            if self.activity_cache
+            else None
+            for event in events
+        ]
+        missing = [
+            index for index, full_event in enumerate(full_events) if full_event is None
+        ]
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(missing)),
+                thread_name_prefix="flare-full-event",
+            ) as executor:
+                futures: list[Future[dict]] = [
+                    executor.submit(
+                        self._fetch_full_event_from_uid,
+                        uid=events[index]["metadata"]["uid"],
+                    )
+                    for index in missing
+                ]
+
+            for index, future in zip(missing, futures):
                 try:
-                    if ingest_full_event_data:
-                        event = self._fetch_full_event_from_uid(
-                            uid=event["metadata"]["uid"]
-                        )
-                        time.sleep(1)  # Don't hit rate limit
+                    full_event = future.result()
                 except:
                     # There is already logging in the _fetch_full_event_from_uid
                     # we want to continue getting the other events even if one fails.
-                    pass
-                finally:
-                    yield (event, next_token)
+                    full_events[index] = events[index]
+                    continue
+
+                full_events[index] = full_event
+                if self.activity_cache:
+                    self.activity_cache.set(
+                        events[index]["metadata"]["uid"], full_event
+                    )
+
+        return [full_event for full_event in full_events if full_event is not None]
 
     def _fetch_event_feed_metadata(
         self,
         *,
         next: Optional[str] = None,
         start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
         severities: list[str],
         source_types: list[str],
-    ) -> Iterator[requests.Response]:
+    ) -> Iterator[FeedPage]:
+        """
+        Yields the pages of the feed, which are parsed as they are read from the
+        response. Each page must be consumed before the next one is fetched.
+        """
         data: Dict[str, Any] = {
             "from": next if next else None,
             "order": "asc",
@@ -111,34 +370,125 @@ class FlareAPI(AuthBase):
             },
         }
 
+        if end_date:
+            data["filters"]["materialized_at"]["lt"] = end_date.isoformat()
+
         if len(severities):
             data["severity"] = severities
 
         if len(source_types):
             data["type"] = source_types
 
-        for response in self.flare_client.scroll(
-            method="POST",
-            url="/firework/v4/events/tenant/_search",
-            json=data,
-        ):
-            yield response
-            # Rate limiting.
-            time.sleep(1)
+        while True:
+            page_size = (
+                self.page_size_tuner.page_size
+                if self.page_size_tuner
+                else self.page_size
+            )
+            if page_size:
+                data["size"] = page_size
+
+            try:
+                response = self._request(
+                    method="POST",
+                    url="/firework/v4/events/tenant/_search",
+                    json=data,
+                    stream=True,
+                    timeout=SEARCH_REQUEST_TIMEOUT,
+                )
+            except Exception as e:
+                if not (
+                    self.page_size_tuner
+                    and self.page_size_tuner.can_shrink
+                    and is_timeout(e)
+                ):
+                    raise
+                self.metrics.increment("retries")
+                self.page_size_tuner.on_timeout()
+                self.logger.info(
+                    f"Timed out fetching {page_size} events, retrying with pages of {self.page_size_tuner.page_size}"
+                )
+                continue
+
+            try:
+                response.raise_for_status()
+                feed_page = FeedPage(
+                    response.iter_content(chunk_size=FEED_PAGE_CHUNK_SIZE)
+                )
+
+                yield feed_page
+
+                next_token = feed_page.next
+            finally:
+                response.close()
+
+            # With a streamed body, `elapsed` stops at the response's headers.
+            latency = response.elapsed.total_seconds() + feed_page.read_time
+            self.metrics.observe("search_page", latency)
+            if self.page_size_tuner:
+                self.page_size_tuner.on_page(
+                    latency=latency,
+                    size=feed_page.size,
+                    item_count=feed_page.item_count,
+                )
+
+            if not next_token:
+                break
+            data["from"] = next_token
+
+    def _request(
+        self,
+        *,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """
+        Sends a request at the pace set by the rate limiter, which adapts to the
+        API's feedback. Throttled requests are retried once the limiter allows it.
+        """
+        for _ in range(MAX_THROTTLED_RETRIES):
+            self.metrics.observe("rate_limit_wait", self.rate_limiter.acquire())
+            response = self.flare_client._request(
+                method=method, url=url, json=json, stream=stream, timeout=timeout
+            )
+
+            if not self.rate_limiter.observe(
+                status_code=response.status_code, headers=response.headers
+            ):
+                return response
+            response.close()
+            self.metrics.increment("throttles")
+            self.logger.info(
+                f"Throttled on {url}, lowering the request rate to {self.rate_limiter.rate:.2f}/s"
+            )
+        return response
 
     def _fetch_full_event_from_uid(self, *, uid: str) -> dict:
         number_of_retries = 3
         for current_try in range(number_of_retries):
             try:
-                event_response = self.flare_client.get(
-                    url=f"/firework/v2/activities/{uid}"
-                )
+                with self.metrics.time("activity"):
+                    # A hung connection would otherwise hold the worker, and
+                    # the shutdown waiting for it, forever.
+                    event_response = self._request(
+                        method="GET",
+                        url=f"/firework/v2/activities/{uid}",
+                        timeout=ACTIVITY_REQUEST_TIMEOUT,
+                    )
                 event_response.raise_for_status()
             except Exception as e:
-                time.sleep(1)
+                self.metrics.increment("retries")
                 self.logger.info(
                     f"Failed to fetch event {current_try + 1}/{number_of_retries} retries: {e}"
                 )
+                if current_try + 1 < number_of_retries:
+                    # Exponential backoff, jittered so that the workers
+                    # failing together don't retry together.
+                    backoff = FULL_EVENT_RETRY_BACKOFF * 2**current_try
+                    time.sleep(random.uniform(backoff / 2, backoff))
                 continue
             return event_response.json()["activity"]
         raise Exception(
@@ -146,21 +496,25 @@ class FlareAPI(AuthBase):
         )
 
     def fetch_api_key_validation(self) -> requests.Response:
-        return self.flare_client.get(
+        return self._request(
+            method="GET",
             url="/tokens/test",
         )
 
     def fetch_tenants(self) -> requests.Response:
-        return self.flare_client.get(
+        return self._request(
+            method="GET",
             url="/firework/v2/me/tenants",
         )
 
     def fetch_filters_severity(self) -> requests.Response:
-        return self.flare_client.get(
+        return self._request(
+            method="GET",
             url="/firework/v4/events/filters/severities",
         )
 
     def fetch_filters_source_type(self) -> requests.Response:
-        return self.flare_client.get(
+        return self._request(
+            method="GET",
             url="/firework/v4/events/filters/types",
         )
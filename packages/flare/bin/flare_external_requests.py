@@ -9,94 +9,172 @@ import json
 import os
 import splunk
 
-from urllib import parse
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
 
 
 sys.path.insert(0, os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "vendor"))
-from data_store import ConfigDataStore
-from flare import FlareAPI
-from logger import Logger
+from ingestion_status import get_ingestion_status
+
+
+if TYPE_CHECKING:
+    from flare import FlareAPI
+    from logger import Logger
+
+
+# The Flare API client (requests, flareio), the lookup cache, the data store,
+# the logger and the payload parsing are only imported by the handlers that
+# need them, the status is served without them.
+
+
+def get_logger() -> "Logger":
+    from logger import Logger
+
+    return Logger(class_name=__file__)
+
+
+def get_params(payload: str) -> dict[str, list[str]]:
+    from urllib.parse import parse_qs
+
+    return parse_qs(payload)
+
+
+def fetch_lookup(
+    *,
+    api_key: str,
+    endpoint: str,
+    fetch: Callable[["FlareAPI"], Any],
+    refresh: bool,
+    logger: "Logger",
+) -> Any:
+    """
+    Returns the lookup cached for the API key, fetching it from Flare when it
+    is missing, expired or a refresh is requested.
+    """
+    from lookup_cache import LookupCache
+
+    lookup_cache = LookupCache()
+    if refresh:
+        lookup_cache.invalidate(api_key=api_key, endpoint=endpoint)
+    else:
+        value = lookup_cache.get(api_key=api_key, endpoint=endpoint)
+        if value is not None:
+            logger.debug("Serving the cached %s", endpoint)
+            return value
+
+    from flare import FlareAPI
+
+    response = fetch(FlareAPI(api_key=api_key, logger=logger))
+    value = response.json()
+    # Errors are not cached, the next request tries again.
+    if response.ok:
+        lookup_cache.set(api_key=api_key, endpoint=endpoint, value=value)
+    return value
+
+
+def is_refresh_requested(params: dict[str, list[str]]) -> bool:
+    return params.get("refresh", ["false"])[0] == "true"
 
 
 class FlareValidateApiKey(splunk.rest.BaseRestHandler):
     def handle_POST(self) -> None:
-        logger = Logger(class_name=__file__)
-        payload = self.request["payload"]
-        params = parse.parse_qs(payload)
+        logger = get_logger()
+        params = get_params(self.request["payload"])
 
         if "apiKey" not in params:
             raise Exception("API Key is required")
 
+        from flare import FlareAPI
+
         flare_api = FlareAPI(api_key=params["apiKey"][0], logger=logger)
         flare_api.fetch_api_key_validation()
+        # The configuration starts over with the key, so do its lookups.
+        from lookup_cache import LookupCache
+
+        LookupCache().invalidate(api_key=params["apiKey"][0])
         self.response.setHeader("Content-Type", "application/json")
         self.response.write(json.dumps({}))
 
 
 class FlareUserTenants(splunk.rest.BaseRestHandler):
     def handle_POST(self) -> None:
-        logger = Logger(class_name=__file__)
-        payload = self.request["payload"]
-        params = parse.parse_qs(payload)
+        logger = get_logger()
+        params = get_params(self.request["payload"])
 
         if "apiKey" not in params:
             raise Exception("API Key is required")
 
-        flare_api = FlareAPI(api_key=params["apiKey"][0], logger=logger)
-        response = flare_api.fetch_tenants()
-        response_json = response.json()
-        logger.debug(f"FlareUserTenants: {response_json}")
+        response_json = fetch_lookup(
+            api_key=params["apiKey"][0],
+            endpoint="tenants",
+            fetch=lambda flare_api: flare_api.fetch_tenants(),
+            refresh=is_refresh_requested(params),
+            logger=logger,
+        )
+        logger.debug("FlareUserTenants: %s", response_json)
         self.response.setHeader("Content-Type", "application/json")
         self.response.write(json.dumps(response_json))
 
 
 class FlareSeverityFilters(splunk.rest.BaseRestHandler):
     def handle_POST(self) -> None:
-        logger = Logger(class_name=__file__)
-        payload = self.request["payload"]
-        params = parse.parse_qs(payload)
+        logger = get_logger()
+        params = get_params(self.request["payload"])
 
         if "apiKey" not in params:
             raise Exception("API Key is required")
 
-        flare_api = FlareAPI(api_key=params["apiKey"][0], logger=logger)
-        response = flare_api.fetch_filters_severity()
-        response_json = response.json()
-        logger.debug(f"FlareSeverityFilters: {response_json}")
+        response_json = fetch_lookup(
+            api_key=params["apiKey"][0],
+            endpoint="severity_filters",
+            fetch=lambda flare_api: flare_api.fetch_filters_severity(),
+            refresh=is_refresh_requested(params),
+            logger=logger,
+        )
+        logger.debug("FlareSeverityFilters: %s", response_json)
         self.response.setHeader("Content-Type", "application/json")
         self.response.write(json.dumps(response_json))
 
 
 class FlareSourceTypeFilters(splunk.rest.BaseRestHandler):
     def handle_POST(self) -> None:
-        logger = Logger(class_name=__file__)
-        payload = self.request["payload"]
-        params = parse.parse_qs(payload)
+        logger = get_logger()
+        params = get_params(self.request["payload"])
 
         if "apiKey" not in params:
             raise Exception("API Key is required")
 
-        flare_api = FlareAPI(api_key=params["apiKey"][0], logger=logger)
-        response = flare_api.fetch_filters_source_type()
-        response_json = response.json()
-        logger.debug(f"FlareSourceTypeFilters: {response_json}")
+        response_json = fetch_lookup(
+            api_key=params["apiKey"][0],
+            endpoint="source_type_filters",
+            fetch=lambda flare_api: flare_api.fetch_filters_source_type(),
+            refresh=is_refresh_requested(params),
+            logger=logger,
+        )
+        logger.debug("FlareSourceTypeFilters: %s", response_json)
         self.response.setHeader("Content-Type", "application/json")
         self.response.write(json.dumps(response_json))
 
 
 class FlareIngestionStatus(splunk.rest.BaseRestHandler):
     def handle_GET(self) -> None:
-        logger = Logger(class_name=__file__)
-
-        data_store = ConfigDataStore()
-        last_fetched_timestamp = data_store.get_last_fetch()
-
-        status_resp = {
-            "last_fetched_at": last_fetched_timestamp.isoformat()
-            if last_fetched_timestamp is not None
-            else None
-        }
-        logger.debug(f"FlareIngestionStatus: {status_resp}")
+        # Written by the ingestion at the end of every run.
+        status_resp = get_ingestion_status()
+        if status_resp is None:
+            # Only the releases that predate the status record read this, and
+            # they all kept the ingestion state in data_store.conf.
+            from data_store import ConfigDataStore
+
+            data_store = ConfigDataStore()
+            last_fetched_timestamp = data_store.get_last_fetch()
+            status_resp = {
+                "last_fetched_at": last_fetched_timestamp.isoformat()
+                if last_fetched_timestamp is not None
+                else None,
+                "rate_limit": None,
+                "tenants": {},
+            }
         self.response.setHeader("Content-Type", "application/json")
         self.response.write(json.dumps(status_resp))
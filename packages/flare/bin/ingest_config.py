@@ -0,0 +1,343 @@
+import hashlib
+import json
+import time
+
+from constants import ADAPTIVE_PAGE_SIZE
+from constants import DAEMON_CONFIG_RELOAD_INTERVAL
+from constants import DAEMON_MIN_IDLE_BACKOFF
+from constants import DEFAULT_BACKFILL_SLICES
+from constants import DEFAULT_DAEMON_IDLE_BACKOFF
+from constants import DEFAULT_FULL_EVENT_MAX_WORKERS
+from constants import DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND
+from constants import DEFAULT_TENANT_CONCURRENCY
+from constants import MAX_PAGE_SIZE
+from constants import MAX_REQUESTS_PER_SECOND
+from constants import MIN_REQUESTS_PER_SECOND
+from constants import DataStoreBackend
+from constants import OutputMode
+from constants import PasswordKeys
+from constants import Sourcetype
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Mapping
+from typing import Optional
+
+
+if TYPE_CHECKING:
+    # Only needed by the annotations, splunklib is slow to import.
+    import vendor.splunklib.client as client
+
+
+@dataclass(frozen=True)
+class HecConfig:
+    url: str
+    token: str
+    index: Optional[str]
+    use_ack: bool
+    verify_tls: bool
+
+    @classmethod
+    def from_values(cls, values: Mapping[str, str]) -> "HecConfig":
+        url = values.get(PasswordKeys.HEC_URL.value)
+        if not url:
+            raise Exception("HEC URL not found")
+
+        token = values.get(PasswordKeys.HEC_TOKEN.value)
+        if not token:
+            raise Exception("HEC token not found")
+
+        return cls(
+            url=url.rstrip("/"),
+            token=token,
+            index=values.get(PasswordKeys.HEC_INDEX.value) or None,
+            use_ack=values.get(PasswordKeys.HEC_USE_ACK.value) == "true",
+            verify_tls=values.get(PasswordKeys.HEC_VERIFY_TLS.value) != "false",
+        )
+
+
+@dataclass(frozen=True)
+class IngestConfig:
+    api_key: str
+    tenant_ids: list[int]
+    ingest_full_event_data: bool
+    number_of_days_to_backfill: int
+    severities_filter: list[str]
+    source_types_filter: list[str]
+    full_event_requests_per_second: float
+    full_event_max_workers: int
+    tenant_concurrency: int
+    output_mode: OutputMode = OutputMode.STDOUT
+    hec_config: Optional[HecConfig] = None
+    # Only used by the HEC output mode, the scripted input's events get the
+    # sourcetype of inputs.conf.
+    sourcetype: Sourcetype = Sourcetype.FLARE_JSON
+    idle_backoff: float = DEFAULT_DAEMON_IDLE_BACKOFF
+    backfill_slices: int = DEFAULT_BACKFILL_SLICES
+    dedup_enabled: bool = True
+    # None leaves the page size to the API.
+    page_size: Optional[int] = None
+    adaptive_page_size: bool = False
+    data_store_backend: DataStoreBackend = DataStoreBackend.CONFIG
+
+    @classmethod
+    def from_values(cls, values: Mapping[str, str]) -> "IngestConfig":
+        output_mode = parse_output_mode(values)
+        return cls(
+            api_key=parse_api_key(values),
+            tenant_ids=parse_tenant_ids(values),
+            ingest_full_event_data=parse_ingest_full_event_data(values),
+            number_of_days_to_backfill=parse_number_of_days_to_backfill(values),
+            severities_filter=parse_severities_filter(values),
+            source_types_filter=parse_source_types_filter(values),
+            full_event_requests_per_second=parse_full_event_requests_per_second(values),
+            full_event_max_workers=parse_full_event_max_workers(values),
+            tenant_concurrency=parse_tenant_concurrency(values),
+            output_mode=output_mode,
+            hec_config=(
+                HecConfig.from_values(values) if output_mode == OutputMode.HEC else None
+            ),
+            sourcetype=parse_sourcetype(values),
+            idle_backoff=parse_idle_backoff(values),
+            backfill_slices=parse_backfill_slices(values),
+            dedup_enabled=values.get(PasswordKeys.DEDUP_ENABLED.value) != "false",
+            page_size=parse_page_size(values),
+            adaptive_page_size=values.get(PasswordKeys.PAGE_SIZE.value)
+            == ADAPTIVE_PAGE_SIZE,
+            data_store_backend=parse_data_store_backend(values),
+        )
+
+    @classmethod
+    def load(cls, storage_passwords: "client.StoragePasswords") -> "IngestConfig":
+        return cls.from_values(get_storage_password_values(storage_passwords))
+
+
+class IngestConfigLoader:
+    """
+    Keeps the last loaded configuration, which is only listed from splunkd
+    again once it is `reload_interval` seconds old, and only parsed again
+    when the stored values changed.
+    """
+
+    def __init__(
+        self, *, reload_interval: float = DAEMON_CONFIG_RELOAD_INTERVAL
+    ) -> None:
+        self._reload_interval = reload_interval
+        self._loaded_at = 0.0
+        self._content_hash: Optional[str] = None
+        self._config: Optional[IngestConfig] = None
+
+    def load(self, storage_passwords: "client.StoragePasswords") -> IngestConfig:
+        if (
+            self._config is not None
+            and time.monotonic() - self._loaded_at < self._reload_interval
+        ):
+            return self._config
+
+        values = get_storage_password_values(storage_passwords)
+        self._loaded_at = time.monotonic()
+        content_hash = hashlib.sha256(
+            json.dumps(sorted(values.items())).encode("utf8")
+        ).hexdigest()
+
+        if self._config is None or content_hash != self._content_hash:
+            self._config = IngestConfig.from_values(values)
+            self._content_hash = content_hash
+        return self._config
+
+
+def get_storage_password_values(
+    storage_passwords: "client.StoragePasswords",
+) -> dict[str, str]:
+    """
+    Reads every value stored by the app with a single call to splunkd.
+    """
+    password_keys = {password_key.value for password_key in PasswordKeys}
+    values: dict[str, str] = {}
+    for item in storage_passwords.list():
+        if item.content.username in password_keys:
+            values.setdefault(item.content.username, item.clear_password)
+    return values
+
+
+def parse_api_key(values: Mapping[str, str]) -> str:
+    api_key = values.get(PasswordKeys.API_KEY.value)
+    if not api_key:
+        raise Exception("API key not found")
+    return api_key
+
+
+def parse_number_of_days_to_backfill(values: Mapping[str, str]) -> int:
+    number_of_days_to_backfill = values.get(
+        PasswordKeys.NUMBER_OF_DAYS_TO_BACKFILL.value
+    )
+
+    try:
+        return int(number_of_days_to_backfill) if number_of_days_to_backfill else 30
+    except Exception as e:
+        raise Exception("Number of days to backfill not a number") from e
+
+
+def parse_tenant_ids(values: Mapping[str, str]) -> list[int]:
+    stored_tenant_ids = values.get(PasswordKeys.TENANT_IDS.value)
+    tenant_ids = None
+    try:
+        tenant_ids = json.loads(stored_tenant_ids) if stored_tenant_ids else None
+    except Exception:
+        pass
+
+    if tenant_ids is None:
+        raise Exception("Tenant IDs not found")
+    return tenant_ids
+
+
+def parse_ingest_full_event_data(values: Mapping[str, str]) -> bool:
+    return values.get(PasswordKeys.INGEST_FULL_EVENT_DATA.value) == "true"
+
+
+def parse_severities_filter(values: Mapping[str, str]) -> list[str]:
+    severities_filter = values.get(PasswordKeys.SEVERITIES_FILTER.value)
+
+    if severities_filter:
+        return severities_filter.split(",")
+
+    return []
+
+
+def parse_source_types_filter(values: Mapping[str, str]) -> list[str]:
+    source_types_filter = values.get(PasswordKeys.SOURCE_TYPES_FILTER.value)
+
+    if source_types_filter:
+        return source_types_filter.split(",")
+
+    return []
+
+
+def parse_full_event_requests_per_second(values: Mapping[str, str]) -> float:
+    requests_per_second = values.get(PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value)
+
+    try:
+        value = (
+            float(requests_per_second)
+            if requests_per_second
+            else DEFAULT_FULL_EVENT_REQUESTS_PER_SECOND
+        )
+    except Exception as e:
+        raise Exception("Full event requests per second not a number") from e
+
+    # The adaptive rate limiter starts from this rate and stays within these bounds.
+    if not MIN_REQUESTS_PER_SECOND <= value <= MAX_REQUESTS_PER_SECOND:
+        raise Exception(
+            f"Full event requests per second must be between {MIN_REQUESTS_PER_SECOND} and {MAX_REQUESTS_PER_SECOND}"
+        )
+    return value
+
+
+def parse_full_event_max_workers(values: Mapping[str, str]) -> int:
+    max_workers = values.get(PasswordKeys.FULL_EVENT_MAX_WORKERS.value)
+
+    try:
+        value = int(max_workers) if max_workers else DEFAULT_FULL_EVENT_MAX_WORKERS
+    except Exception as e:
+        raise Exception("Full event max workers not a number") from e
+
+    if value < 1:
+        raise Exception("Full event max workers must be at least 1")
+    return value
+
+
+def parse_tenant_concurrency(values: Mapping[str, str]) -> int:
+    tenant_concurrency = values.get(PasswordKeys.TENANT_CONCURRENCY.value)
+
+    try:
+        value = (
+            int(tenant_concurrency)
+            if tenant_concurrency
+            else DEFAULT_TENANT_CONCURRENCY
+        )
+    except Exception as e:
+        raise Exception("Tenant concurrency not a number") from e
+
+    if value < 1:
+        raise Exception("Tenant concurrency must be at least 1")
+    return value
+
+
+def parse_output_mode(values: Mapping[str, str]) -> OutputMode:
+    output_mode = values.get(PasswordKeys.OUTPUT_MODE.value)
+    if not output_mode:
+        return OutputMode.STDOUT
+
+    try:
+        return OutputMode(output_mode)
+    except Exception as e:
+        raise Exception(f"Output mode {output_mode} not supported") from e
+
+
+def parse_sourcetype(values: Mapping[str, str]) -> Sourcetype:
+    sourcetype = values.get(PasswordKeys.SOURCETYPE.value)
+    if not sourcetype:
+        return Sourcetype.FLARE_JSON
+
+    if parse_output_mode(values) != OutputMode.HEC:
+        raise Exception(
+            "Sourcetype only applies to the HEC output mode, set it in inputs.conf instead"
+        )
+
+    try:
+        return Sourcetype(sourcetype)
+    except Exception as e:
+        raise Exception(f"Sourcetype {sourcetype} not supported") from e
+
+
+def parse_idle_backoff(values: Mapping[str, str]) -> float:
+    idle_backoff = values.get(PasswordKeys.DAEMON_IDLE_BACKOFF.value)
+
+    try:
+        value = float(idle_backoff) if idle_backoff else DEFAULT_DAEMON_IDLE_BACKOFF
+    except Exception as e:
+        raise Exception("Daemon idle backoff not a number") from e
+
+    if value < DAEMON_MIN_IDLE_BACKOFF:
+        raise Exception(
+            f"Daemon idle backoff must be at least {DAEMON_MIN_IDLE_BACKOFF} seconds"
+        )
+    return value
+
+
+def parse_backfill_slices(values: Mapping[str, str]) -> int:
+    backfill_slices = values.get(PasswordKeys.BACKFILL_SLICES.value)
+
+    try:
+        value = int(backfill_slices) if backfill_slices else DEFAULT_BACKFILL_SLICES
+    except Exception as e:
+        raise Exception("Backfill slices not a number") from e
+
+    if value < 1:
+        raise Exception("Backfill slices must be at least 1")
+    return value
+
+
+def parse_page_size(values: Mapping[str, str]) -> Optional[int]:
+    page_size = values.get(PasswordKeys.PAGE_SIZE.value)
+    if not page_size or page_size == ADAPTIVE_PAGE_SIZE:
+        return None
+
+    try:
+        value = int(page_size)
+    except Exception as e:
+        raise Exception("Page size not a number") from e
+
+    if not 1 <= value <= MAX_PAGE_SIZE:
+        raise Exception(f"Page size must be between 1 and {MAX_PAGE_SIZE}")
+    return value
+
+
+def parse_data_store_backend(values: Mapping[str, str]) -> DataStoreBackend:
+    data_store_backend = values.get(PasswordKeys.DATA_STORE_BACKEND.value)
+    if not data_store_backend:
+        return DataStoreBackend.CONFIG
+
+    try:
+        return DataStoreBackend(data_store_backend)
+    except Exception as e:
+        raise Exception(f"Data store backend {data_store_backend} not supported") from e
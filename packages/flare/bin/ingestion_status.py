@@ -0,0 +1,65 @@
+import json
+import os
+
+from datetime import datetime
+from datetime import timezone
+from files import get_state_directory
+from files import write_atomically
+from typing import Optional
+
+
+def get_ingestion_status_path() -> str:
+    return os.path.join(get_state_directory(), "ingestion_status.json")
+
+
+def read_ingestion_status(*, path: Optional[str] = None) -> Optional[dict]:
+    try:
+        with os.fdopen(
+            os.open(path or get_ingestion_status_path(), os.O_RDONLY)
+        ) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_ingestion_status(status: dict, *, path: Optional[str] = None) -> None:
+    """
+    Replaces the status record written by the previous run. Tenants that were
+    not part of this run, e.g. leased by another process, keep their previous
+    status, as do the values this run has nothing new about.
+    """
+    path = path or get_ingestion_status_path()
+    previous_status = read_ingestion_status(path=path) or {}
+    tenants: dict[str, dict] = previous_status.get("tenants", {})
+    for tenant_id, tenant_status in status.get("tenants", {}).items():
+        tenants[tenant_id] = {
+            **tenants.get(tenant_id, {}),
+            **{key: value for key, value in tenant_status.items() if value is not None},
+        }
+
+    with write_atomically(path) as file:
+        json.dump({**status, "tenants": tenants}, file)
+
+
+def get_ingestion_status(*, path: Optional[str] = None) -> Optional[dict]:
+    """
+    Returns the status record with every tenant's backlog, the time between
+    now and the newest event it ingested. Tenants whose last run read their
+    feed to its end have no backlog, however old their newest event is.
+    """
+    status = read_ingestion_status(path=path)
+    if status is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    for tenant_status in status.get("tenants", {}).values():
+        tenant_status["backlog_seconds"] = None
+        newest_materialized_at = tenant_status.get("newest_materialized_at")
+        if tenant_status.get("caught_up"):
+            tenant_status["backlog_seconds"] = 0.0
+        elif newest_materialized_at:
+            newest = datetime.fromisoformat(
+                newest_materialized_at.replace("Z", "+00:00")
+            )
+            tenant_status["backlog_seconds"] = max(0.0, (now - newest).total_seconds())
+    return status
@@ -0,0 +1,109 @@
+import os
+import socket
+import threading
+import uuid
+
+from constants import LEASE_HEARTBEAT_INTERVAL
+from constants import LEASE_TTL
+from data_store import DataStore
+from datetime import timedelta
+from logger import Logger
+from types import TracebackType
+from typing import Optional
+
+
+class LeaseKeeper:
+    """
+    Holds leases in the data store on behalf of this process. A heartbeat
+    thread renews them until they are released, so that a crashed process
+    only blocks others until its leases expire.
+
+    A lease that was taken over by another process, e.g. after this one stalled
+    for longer than the TTL, is dropped and reported as no longer held.
+    """
+
+    def __init__(
+        self,
+        *,
+        data_store: DataStore,
+        logger: Logger,
+        owner: Optional[str] = None,
+        ttl: timedelta = LEASE_TTL,
+        heartbeat_interval: float = LEASE_HEARTBEAT_INTERVAL,
+    ) -> None:
+        self._data_store = data_store
+        self._logger = logger
+        self.owner = (
+            owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self._ttl = ttl
+        self._heartbeat_interval = heartbeat_interval
+
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._stop_event.clear()
+        self._heartbeat = threading.Thread(
+            target=self._run_heartbeat, name="flare-lease-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self._stop_event.set()
+        if self._heartbeat:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self.release_all()
+
+    def acquire(self, name: str) -> bool:
+        with self._lock:
+            if not self._data_store.try_acquire_lease(name, self.owner, self._ttl):
+                return False
+            self._held.add(name)
+            return True
+
+    def is_held(self, name: str) -> bool:
+        with self._lock:
+            return name in self._held
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            if name in self._held:
+                self._held.discard(name)
+                self._data_store.release_lease(name, self.owner)
+
+    def release_all(self) -> None:
+        with self._lock:
+            for name in self._held:
+                self._data_store.release_lease(name, self.owner)
+            self._held = set()
+
+    def renew(self) -> None:
+        with self._lock:
+            for name in sorted(self._held):
+                try:
+                    renewed = self._data_store.try_acquire_lease(
+                        name, self.owner, self._ttl
+                    )
+                except Exception as e:
+                    # The lease is still ours until it expires, the next
+                    # heartbeat will try again.
+                    self._logger.error(f"Failed to renew the lease {name}: {e}")
+                    continue
+
+                if not renewed:
+                    self._logger.error(f"Lost the lease {name} to another process")
+                    self._held.discard(name)
+
+    def _run_heartbeat(self) -> None:
+        while not self._stop_event.wait(self._heartbeat_interval):
+            self.renew()
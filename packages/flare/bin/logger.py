@@ -1,51 +1,167 @@
+import atexit
+import json
 import logging
 import os
-import tempfile
+import queue
+import threading
 
 from constants import APP_NAME
-from logging.handlers import TimedRotatingFileHandler
+from typing import TYPE_CHECKING
 from typing import Any
+from typing import Optional
+
+
+if TYPE_CHECKING:
+    from logging.handlers import QueueListener
+
+
+def get_log_directory() -> str:
+    splunk_home = os.environ.get("SPLUNK_HOME")
+    if splunk_home:
+        return os.path.join(splunk_home, "var", "log", "splunk")
+
+    import tempfile
+
+    return tempfile.gettempdir()
+
+
+def is_profiling_enabled() -> bool:
+    """
+    Profiling is opt-in, through the FLARE_PROFILE environment variable.
+    """
+    return os.environ.get("FLARE_PROFILE") == "true"
+
+
+_handler_lock = threading.Lock()
+_listener: Optional["QueueListener"] = None
+
+
+def _install_handlers() -> None:
+    """
+    Sends every Flare logger through a single queue, whose records are written
+    to the rotating log file by a background thread. Only the first call of
+    the process installs anything.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    # Imported with the first record that is logged, as a status request that
+    # logs nothing should not pay for it.
+    from logging.handlers import QueueHandler
+    from logging.handlers import QueueListener
+    from logging.handlers import TimedRotatingFileHandler
+
+    with _handler_lock:
+        if _listener is not None:
+            return
+
+        file_handler = TimedRotatingFileHandler(
+            os.path.join(get_log_directory(), f"{APP_NAME}.log"),
+            when="d",
+            interval=1,
+            backupCount=5,
+        )
+        file_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)-5s %(message)s")
+        )
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, file_handler)
+        _listener.start()
+        # Writes the records still queued when the process exits.
+        atexit.register(_listener.stop)
+
+        app_logger = logging.getLogger(APP_NAME)
+        app_logger.addHandler(QueueHandler(log_queue))
+        app_logger.propagate = False
+
+
+def format_fields(fields: dict[str, Any]) -> str:
+    """
+    Formats structured fields as `key=value` pairs, quoting the values that
+    contain spaces, quotes or equal signs.
+    """
+    pairs = []
+    for key, value in fields.items():
+        text = str(value)
+        if not text or any(character in text for character in ' "='):
+            text = json.dumps(text)
+        pairs.append(f"{key}={text}")
+    return " ".join(pairs)
+
+
+def format_message(msg: Any, args: tuple, fields: dict[str, Any]) -> str:
+    message = str(msg) % args if args else str(msg)
+    if fields:
+        message = f"{message} {format_fields(fields)}"
+    return message
+
+
+class _Message:
+    """
+    Defers the formatting of a message until a handler actually needs it.
+    """
+
+    def __init__(self, tag_name: str, msg: Any, args: tuple, fields: dict) -> None:
+        self._tag_name = tag_name
+        self._msg = msg
+        self._args = args
+        self._fields = fields
+
+    def __str__(self) -> str:
+        return (
+            f"{self._tag_name}: {format_message(self._msg, self._args, self._fields)}"
+        )
 
 
 class Logger:
+    """
+    Messages are %-formatted with `args` and followed by `fields` as
+    `key=value` pairs, only once their level is enabled:
+
+        logger.debug("Fetched %d events", count, tenant_id=tenant_id)
+    """
+
     def __init__(self, *, class_name: str) -> None:
-        splunk_home = os.environ.get("SPLUNK_HOME")
-        log_filepath = ""
-        if splunk_home:
-            log_filepath = os.path.join(
-                splunk_home, "var", "log", "splunk", f"{APP_NAME}.log"
+        app_logger = logging.getLogger(APP_NAME)
+        if app_logger.level == logging.NOTSET:
+            app_logger.setLevel(
+                logging.DEBUG if os.environ.get("FLARE_ENV") == "dev" else logging.INFO
             )
-        else:
-            log_filepath = os.path.join(tempfile.gettempdir(), f"{APP_NAME}.log")
-
         self.tag_name = os.path.splitext(os.path.basename(class_name))[0]
-        self._logger = logging.getLogger(f"flare-{self.tag_name}")
-
-        if os.environ.get("FLARE_ENV") == "dev":
-            self._logger.setLevel(logging.DEBUG)
-        else:
-            self._logger.setLevel(logging.INFO)
-        formatter = logging.Formatter("%(asctime)s %(levelname)-5s %(message)s")
-        handler = TimedRotatingFileHandler(
-            log_filepath, when="d", interval=1, backupCount=5
-        )
-        handler.setFormatter(formatter)
-        self._logger.addHandler(handler)
+        self._logger = logging.getLogger(f"{APP_NAME}.{self.tag_name}")
+
+    def _log(
+        self,
+        level: int,
+        msg: Any,
+        args: tuple,
+        fields: dict[str, Any],
+        exc_info: bool = False,
+    ) -> None:
+        if self._logger.isEnabledFor(level):
+            _install_handlers()
+            self._logger.log(
+                level,
+                _Message(self.tag_name, msg, args, fields),
+                exc_info=exc_info,
+                stacklevel=3,
+            )
 
-    def debug(self, msg: Any) -> None:
-        self._logger.debug(msg=f"{self.tag_name}: {msg}")
+    def debug(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.DEBUG, msg, args, fields)
 
-    def info(self, msg: Any) -> None:
-        self._logger.info(msg=f"{self.tag_name}: {msg}")
+    def info(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.INFO, msg, args, fields)
 
-    def warning(self, msg: Any) -> None:
-        self._logger.warning(msg=f"{self.tag_name}: {msg}")
+    def warning(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.WARNING, msg, args, fields)
 
-    def error(self, msg: Any) -> None:
-        self._logger.error(msg=f"{self.tag_name}: {msg}")
+    def error(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, args, fields)
 
-    def exception(self, msg: Any) -> None:
-        self._logger.exception(msg=f"{self.tag_name}: {msg}")
+    def exception(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, args, fields, exc_info=True)
 
-    def critical(self, msg: Any) -> None:
-        self._logger.critical(msg=f"{self.tag_name}: {msg}")
+    def critical(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.CRITICAL, msg, args, fields)
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+from constants import LOOKUP_CACHE_TTL
+from files import get_state_directory
+from files import write_atomically
+from token_cache import get_api_key_fingerprint
+from typing import Any
+from typing import Optional
+
+
+class LookupCache:
+    """
+    Keeps the tenants and filters fetched for the configuration page, which
+    fetches all of them whenever it is opened. Every REST request is handled
+    by a new process, so the entries are kept on disk, keyed by a fingerprint
+    of the API key and the endpoint, until they expire or are invalidated.
+    """
+
+    def __init__(
+        self, *, path: Optional[str] = None, ttl: float = LOOKUP_CACHE_TTL
+    ) -> None:
+        self._path = path or os.path.join(get_state_directory(), "lookup_cache.json")
+        self._ttl = ttl
+
+    @staticmethod
+    def _get_key(api_key: str, endpoint: str) -> str:
+        return f"{get_api_key_fingerprint(api_key)}:{endpoint}"
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            with os.fdopen(os.open(self._path, os.O_RDONLY)) as lookup_file:
+                return json.load(lookup_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        now = time.time()
+        data = {
+            key: entry for key, entry in entries.items() if entry["expires_at"] > now
+        }
+
+        try:
+            with write_atomically(self._path) as lookup_file:
+                json.dump(data, lookup_file)
+        except OSError:
+            # The lookups are then fetched every time.
+            pass
+
+    def get(self, *, api_key: str, endpoint: str) -> Optional[Any]:
+        entry = self._load().get(self._get_key(api_key, endpoint))
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        return entry["value"]
+
+    def set(self, *, api_key: str, endpoint: str, value: Any) -> None:
+        entries = self._load()
+        entries[self._get_key(api_key, endpoint)] = {
+            "value": value,
+            "expires_at": time.time() + self._ttl,
+        }
+        self._save(entries)
+
+    def invalidate(self, *, api_key: str, endpoint: Optional[str] = None) -> None:
+        """
+        Removes the entry of the endpoint, or every entry of the API key.
+        """
+        prefix = self._get_key(api_key, endpoint or "")
+        entries = self._load()
+        self._save(
+            {
+                key: entry
+                for key, entry in entries.items()
+                if not (key == prefix if endpoint else key.startswith(prefix))
+            }
+        )
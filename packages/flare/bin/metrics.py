@@ -0,0 +1,138 @@
+import bisect
+import os
+import threading
+import time
+
+from constants import APP_NAME
+from constants import METRICS_HISTOGRAM_BUCKETS
+from constants import METRICS_LOG_MAX_SIZE
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timezone
+from event_emitter import dumps
+from files import get_state_directory
+from typing import Iterator
+from typing import Optional
+
+
+class Histogram:
+    """
+    Counts observations in fixed exponential buckets, which keeps recording
+    cheap and the memory constant no matter how many values are observed.
+    """
+
+    def __init__(
+        self, *, buckets: tuple[float, ...] = METRICS_HISTOGRAM_BUCKETS
+    ) -> None:
+        self._buckets = buckets
+        # The last count is for the values above the largest bucket.
+        self._counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the `q` quantile.
+        """
+        rank = q * self.count
+        cumulative_count = 0
+        for bucket, count in zip(self._buckets, self._counts):
+            cumulative_count += count
+            if count and cumulative_count >= rank:
+                return min(bucket, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Thread-safe timing histograms and counters of an ingestion run, e.g. the
+    latency of the search pages or the time spent waiting on the rate limiter.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+        self._counters: dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started_at)
+
+    def increment(self, counter: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def get_counter(self, counter: str) -> float:
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def summary(self) -> dict[str, float]:
+        """
+        Returns the counters and the count, sum, p50, p95 and max of every
+        stage, as flat numeric fields named after them.
+        """
+        with self._lock:
+            summary = {
+                f"{APP_NAME}.{counter}": value
+                for counter, value in self._counters.items()
+            }
+            for stage, histogram in self._histograms.items():
+                summary[f"{APP_NAME}.{stage}.count"] = histogram.count
+                summary[f"{APP_NAME}.{stage}.sum"] = histogram.sum
+                summary[f"{APP_NAME}.{stage}.p50"] = histogram.quantile(0.5)
+                summary[f"{APP_NAME}.{stage}.p95"] = histogram.quantile(0.95)
+                summary[f"{APP_NAME}.{stage}.max"] = histogram.max
+            return summary
+
+
+def write_metrics(
+    *,
+    metrics: Metrics,
+    tenant_id: Optional[int] = None,
+    path: Optional[str] = None,
+) -> None:
+    """
+    Appends the summary of a run as one JSON line to the metrics log, which
+    the `flare_metrics` input, once enabled, turns into measurements of a
+    metrics index. Records without a tenant hold the stages shared by every
+    tenant.
+    """
+    # Kept out of var/log/splunk, which Splunk indexes in _internal.
+    path = path or os.path.join(get_state_directory(), f"{APP_NAME}_metrics.log")
+    record: dict = {"timestamp": datetime.now(timezone.utc).isoformat()}
+    if tenant_id is not None:
+        record["tenant_id"] = tenant_id
+    record.update(metrics.summary())
+
+    try:
+        # Splunk follows the rotated file until it is read completely.
+        if os.path.getsize(path) >= METRICS_LOG_MAX_SIZE:
+            os.replace(path, f"{path}.1")
+    except OSError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        # A single append keeps the records of concurrent runs whole.
+        os.write(fd, (dumps(record) + "\n").encode("utf8"))
+    finally:
+        os.close(fd)
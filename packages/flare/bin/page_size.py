@@ -0,0 +1,57 @@
+from constants import MAX_PAGE_BYTES
+from constants import MAX_PAGE_SIZE
+from constants import MIN_PAGE_SIZE
+from constants import PAGE_TARGET_LATENCY
+
+
+class PageSizeTuner:
+    """
+    Adapts the page size of the feed's search scroll: the size doubles while
+    full pages come back within the target latency and byte size, and is
+    halved when a page goes over them or times out.
+    """
+
+    def __init__(
+        self,
+        *,
+        page_size: int,
+        min_page_size: int = MIN_PAGE_SIZE,
+        max_page_size: int = MAX_PAGE_SIZE,
+        target_latency: float = PAGE_TARGET_LATENCY,
+        max_page_bytes: int = MAX_PAGE_BYTES,
+    ) -> None:
+        if not 0 < min_page_size <= page_size <= max_page_size:
+            raise Exception(
+                "Page size must be between the min page size and the max page size"
+            )
+
+        self._page_size = page_size
+        self._min_page_size = min_page_size
+        self._max_page_size = max_page_size
+        self._target_latency = target_latency
+        self._max_page_bytes = max_page_bytes
+
+    @property
+    def page_size(self) -> int:
+        return self._page_size
+
+    @property
+    def can_shrink(self) -> bool:
+        return self._page_size > self._min_page_size
+
+    def _shrink(self) -> None:
+        self._page_size = max(self._min_page_size, self._page_size // 2)
+
+    def on_page(self, *, latency: float, size: int, item_count: int) -> None:
+        """
+        Adjusts the page size from the time the API took to answer and the
+        number of bytes and items of the page.
+        """
+        if latency > self._target_latency or size > self._max_page_bytes:
+            self._shrink()
+        elif item_count >= self._page_size:
+            # Partial pages are the end of the feed, growing wouldn't help.
+            self._page_size = min(self._max_page_size, self._page_size * 2)
+
+    def on_timeout(self) -> None:
+        self._shrink()
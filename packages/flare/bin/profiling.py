@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+
+from collections import Counter
+from constants import APP_NAME
+from constants import PROFILE_SAMPLE_INTERVAL
+from constants import PROFILE_TOP_FUNCTIONS
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timezone
+from files import get_state_directory
+from logger import Logger
+from types import FrameType
+from typing import Iterator
+from typing import Optional
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread at a fixed interval. Unlike cProfile,
+    which only follows the thread it was enabled in, this sees the tenants'
+    and the emitter's threads, including the time they spend waiting.
+    """
+
+    def __init__(self, *, interval: float = PROFILE_SAMPLE_INTERVAL) -> None:
+        self._interval = interval
+        self._stacks: Counter[tuple[str, ...]] = Counter()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self._stacks.values())
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="flare-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        profiler_thread_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == profiler_thread_id:
+                continue
+
+            stack: list[str] = []
+            current_frame: Optional[FrameType] = frame
+            while current_frame is not None:
+                code = current_frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                current_frame = current_frame.f_back
+            self._stacks[tuple(reversed(stack))] += 1
+
+    def write_folded_stacks(self, path: str) -> None:
+        """
+        Writes the samples in the folded format read by flame graph tools,
+        e.g. speedscope or flamegraph.pl.
+        """
+        with open(path, "w") as profile_file:
+            for stack, count in self._stacks.most_common():
+                profile_file.write(f"{';'.join(stack)} {count}\n")
+
+    def get_top_functions(self, count: int) -> list[tuple[str, int, int]]:
+        """
+        Returns the functions found in the most samples, with how many samples
+        they were running in themselves and in total.
+        """
+        self_counts: Counter[str] = Counter()
+        total_counts: Counter[str] = Counter()
+        for stack, stack_count in self._stacks.items():
+            self_counts[stack[-1]] += stack_count
+            # Recursive functions only count once per sample.
+            for function in set(stack):
+                total_counts[function] += stack_count
+        return [
+            (function, self_counts[function], total_count)
+            for function, total_count in total_counts.most_common(count)
+        ]
+
+
+@contextmanager
+def profile(
+    *, logger: Logger, name: str, directory: Optional[str] = None
+) -> Iterator[None]:
+    """
+    Profiles the block, then writes the folded stacks to the state directory and
+    logs the hottest functions.
+    """
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        # Kept out of var/log/splunk, which Splunk indexes in _internal.
+        directory = directory or os.path.join(get_state_directory(), "profiles")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{APP_NAME}_{name}_{timestamp}.folded")
+        profiler.write_folded_stacks(path)
+
+        sample_count = max(profiler.sample_count, 1)
+        lines = [
+            f"{100 * total_count / sample_count:6.1f}% {100 * self_count / sample_count:6.1f}% {function}"
+            for function, self_count, total_count in profiler.get_top_functions(
+                PROFILE_TOP_FUNCTIONS
+            )
+        ]
+        logger.info(
+            f"Profiled {profiler.sample_count} samples, saved to {path}. Hottest functions (total, self):\n"
+            + "\n".join(lines)
+        )
@@ -0,0 +1,197 @@
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller hitting the same API.
+
+    Tokens refill continuously at `rate` per second, up to `capacity`. Setting
+    `stop_event` wakes up the callers waiting for a token.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float,
+        capacity: float = 1.0,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        if rate <= 0:
+            raise Exception("Rate must be greater than 0")
+        if capacity < 1:
+            raise Exception("Capacity must be at least 1")
+
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._stop_event = stop_event
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds every caller back for at least `seconds`, e.g. until a rate limit resets.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            # The paused time must not turn into a burst once the pause is over.
+            self._tokens = min(self._tokens, 0.0)
+
+    def acquire(self) -> float:
+        """
+        Blocks until a token is available and returns the time waited, in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token right away so that concurrent callers queue up
+            # behind each other instead of all waking up at the same time.
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+            wait = max(wait, self._blocked_until - now)
+
+        if wait > 0:
+            if self._stop_event:
+                # A pause until the rate limit resets can last minutes.
+                self._stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+        return wait
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket whose rate follows the server's feedback: the rate grows
+    additively after every successful call and is cut multiplicatively when
+    the API throttles us. `Retry-After` and rate limit headers pause all callers
+    until the server is ready to accept requests again.
+
+    The calls in flight when the rate is cut are often throttled as well, so
+    the rate is cut at most once every `decrease_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: float = 0.2,
+        max_rate: float = 25.0,
+        increase: float = 0.1,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        if not 0 < min_rate <= rate <= max_rate:
+            raise Exception("Rate must be between the min rate and the max rate")
+        if not 0 < decrease_factor < 1:
+            raise Exception("Decrease factor must be between 0 and 1")
+
+        super().__init__(rate=rate, capacity=capacity, stop_event=stop_event)
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._increase = increase
+        self._decrease_factor = decrease_factor
+        self._decrease_interval = decrease_interval
+        self._decreased_at = -decrease_interval
+        self.throttled_count = 0
+
+    def on_success(self) -> None:
+        with self._lock:
+            # Tokens accumulated so far were earned at the previous rate.
+            self._refill(time.monotonic())
+            self._rate = min(self._max_rate, self._rate + self._increase)
+
+    def on_throttled(self, *, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.throttled_count += 1
+            now = time.monotonic()
+            if now - self._decreased_at >= self._decrease_interval:
+                self._refill(now)
+                self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+                self._decreased_at = now
+
+        if retry_after:
+            self.pause(retry_after)
+
+    def observe(self, *, status_code: int, headers: Mapping[str, str]) -> bool:
+        """
+        Adjusts the rate from an API response. Returns True if the call was throttled.
+        """
+        if status_code == 429:
+            self.on_throttled(retry_after=get_retry_after(headers))
+            return True
+
+        if status_code < 500:
+            self.on_success()
+
+        # The quota can be exhausted without being throttled yet, in which case
+        # we wait for it to reset instead of spending a call on a 429.
+        remaining = _parse_float(
+            headers.get("X-RateLimit-Remaining") or headers.get("RateLimit-Remaining")
+        )
+        if remaining is not None and remaining <= 0:
+            reset = get_rate_limit_reset(headers)
+            if reset:
+                self.pause(reset)
+        return False
+
+
+def get_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Parses `Retry-After` as either a number of seconds or an HTTP date.
+    """
+    retry_after = headers.get("Retry-After")
+    if not retry_after:
+        return None
+
+    seconds = _parse_float(retry_after)
+    if seconds is not None:
+        return max(seconds, 0.0)
+
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except Exception:
+        return None
+
+
+def get_rate_limit_reset(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Parses the rate limit reset header, either a number of seconds or an epoch timestamp.
+    """
+    reset = _parse_float(
+        headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+    )
+    if reset is None:
+        return None
+
+    # Values larger than a day can only be epoch timestamps.
+    if reset > 86400:
+        reset -= time.time()
+    return max(reset, 0.0)
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+
+from constants import EMITTER_MAX_BUFFER_AGE
+from constants import EMITTER_MAX_BUFFER_SIZE
+from constants import SPOOL_READ_SIZE
+from constants import SPOOL_SEGMENT_SIZE
+from event_emitter import EventSink
+from event_emitter import dumps
+from types import TracebackType
+from typing import BinaryIO
+from typing import Optional
+
+
+# Segment number and position within the segment.
+SpoolOffset = tuple[int, int]
+
+# Keeps Windows from translating the line endings.
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
+
+class Spool(EventSink):
+    """
+    Append-only log of the fetched events, one JSON document per line, split
+    in segment files of about `segment_size` bytes.
+
+    Events are written as they are emitted, so that the consumer can read them
+    right away, but only `flush` syncs them to disk. Checkpoints of the feed
+    must only move forward after a flush.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str,
+        segment_size: int = SPOOL_SEGMENT_SIZE,
+        max_buffer_size: int = EMITTER_MAX_BUFFER_SIZE,
+        max_buffer_age: float = EMITTER_MAX_BUFFER_AGE,
+    ) -> None:
+        super().__init__(max_buffer_size=max_buffer_size, max_buffer_age=max_buffer_age)
+        self._path = path
+        self._segment_size = segment_size
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        os.makedirs(path, exist_ok=True)
+        segments = self._list_segments()
+        self._first_segment = segments[0] if segments else 0
+        self._segment = segments[-1] if segments else 0
+        self._size = sum(
+            os.path.getsize(self._get_segment_path(segment)) for segment in segments
+        )
+        self._fd = self._open_segment(self._segment)
+        self._position = self._recover()
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _get_segment_path(self, segment: int) -> str:
+        return os.path.join(self._path, f"{segment:010d}.seg")
+
+    def _list_segments(self) -> list[int]:
+        return sorted(
+            int(name[: -len(".seg")])
+            for name in os.listdir(self._path)
+            if name.endswith(".seg") and name[: -len(".seg")].isdigit()
+        )
+
+    def _open_segment(self, segment: int) -> int:
+        fd = os.open(
+            self._get_segment_path(segment),
+            os.O_RDWR | os.O_CREAT | os.O_APPEND | _O_BINARY,
+            0o600,
+        )
+        try:
+            # Makes the new segment itself durable, not only its content.
+            dir_fd = os.open(self._path, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        return fd
+
+    def _open_reader(self, segment: int) -> BinaryIO:
+        # Files are read with seek and read rather than os.pread, which only
+        # exists on POSIX.
+        return os.fdopen(
+            os.open(self._get_segment_path(segment), os.O_RDONLY | _O_BINARY), "rb"
+        )
+
+    def _recover(self) -> int:
+        """
+        Truncates the last segment after its last complete event, which drops
+        a write torn by a crash. Returns the size of the segment.
+        """
+        size = os.fstat(self._fd).st_size
+        end = size
+        with self._open_reader(self._segment) as segment_file:
+            while end > 0:
+                start = max(0, end - SPOOL_READ_SIZE)
+                segment_file.seek(start)
+                newline = segment_file.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+
+        if end != size:
+            os.ftruncate(self._fd, end)
+            self._size -= size - end
+        return end
+
+    @property
+    def start(self) -> SpoolOffset:
+        with self._lock:
+            return (self._first_segment, 0)
+
+    @property
+    def end(self) -> SpoolOffset:
+        with self._lock:
+            return (self._segment, self._position)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of bytes of the segments that were not removed yet.
+        """
+        with self._lock:
+            return self._size
+
+    def _serialize(self, event: dict) -> str:
+        return dumps(event) + "\n"
+
+    def _write(self, data: str) -> None:
+        encoded_data = memoryview(data.encode("utf8"))
+        with self._lock:
+            while encoded_data:
+                written = os.write(self._fd, encoded_data)
+                encoded_data = encoded_data[written:]
+                self._position += written
+                self._size += written
+            self._dirty = True
+
+            if self._position >= self._segment_size:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._segment += 1
+                self._position = 0
+                self._fd = self._open_segment(self._segment)
+                self._dirty = False
+
+    def flush(self) -> None:
+        super().flush()
+        with self._lock:
+            if self._dirty:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            os.close(self._fd)
+
+    def read(
+        self, offset: SpoolOffset, *, max_size: int = SPOOL_READ_SIZE
+    ) -> tuple[list[dict], SpoolOffset]:
+        """
+        Reads the events written after `offset`, about `max_size` bytes at a
+        time, and returns them with the offset to read from next.
+        """
+        segment, position = max(offset, self.start)
+        end_segment, end_position = self.end
+        if (segment, position) >= (end_segment, end_position):
+            return [], (segment, position)
+
+        with self._open_reader(segment) as segment_file:
+            limit = (
+                end_position
+                if segment == end_segment
+                else os.fstat(segment_file.fileno()).st_size
+            )
+            size = max_size
+            while True:
+                segment_file.seek(position)
+                data = segment_file.read(min(size, limit - position))
+                newline = data.rfind(b"\n")
+                if newline != -1 or position + len(data) >= limit:
+                    break
+                # An event larger than the read size.
+                size *= 2
+
+        data = data[: newline + 1]
+        events: list[dict] = []
+        for line in data.splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # Garbage left by a crash before the segment was synced.
+                pass
+
+        position += len(data)
+        if segment < end_segment and position >= limit:
+            return events, (segment + 1, 0)
+        return events, (segment, position)
+
+    def remove_before(self, offset: SpoolOffset) -> None:
+        """
+        Deletes the segments that were completely consumed.
+        """
+        with self._lock:
+            while self._first_segment < min(offset[0], self._segment):
+                segment_path = self._get_segment_path(self._first_segment)
+                try:
+                    self._size -= os.path.getsize(segment_path)
+                    os.unlink(segment_path)
+                except FileNotFoundError:
+                    pass
+                self._first_segment += 1
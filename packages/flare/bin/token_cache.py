@@ -0,0 +1,68 @@
+import hashlib
+import threading
+
+from constants import TOKEN_EXPIRY_MARGIN
+from datetime import datetime
+from datetime import timezone
+from typing import Optional
+
+
+def get_api_key_fingerprint(api_key: str) -> str:
+    """
+    Identifies an API key without keeping it around.
+    """
+    return hashlib.sha256(api_key.encode("utf8")).hexdigest()
+
+
+class TokenCache:
+    """
+    Keeps the short-lived API tokens, which are bound to a tenant, so that they
+    are reused across the tenants and the runs of the process until they
+    expire.
+
+    The tokens are bearer credentials and are only kept in memory, never
+    written to disk.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: dict[str, tuple[str, datetime]] = {}
+
+    @staticmethod
+    def _get_key(api_key: str, tenant_id: Optional[int]) -> str:
+        return f"{get_api_key_fingerprint(api_key)}:{tenant_id or ''}"
+
+    def get(
+        self, *, api_key: str, tenant_id: Optional[int]
+    ) -> Optional[tuple[str, datetime]]:
+        """
+        Returns the token and its expiration date, unless it expires soon.
+        """
+        with self._lock:
+            entry = self._tokens.get(self._get_key(api_key, tenant_id))
+
+        if entry is None or entry[1] - TOKEN_EXPIRY_MARGIN <= datetime.now(
+            timezone.utc
+        ):
+            return None
+        return entry
+
+    def set(
+        self,
+        *,
+        api_key: str,
+        tenant_id: Optional[int],
+        token: str,
+        expires_at: datetime,
+    ) -> None:
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            # Expired tokens of tenants that are no longer ingested are dropped.
+            self._tokens = {
+                key: entry for key, entry in self._tokens.items() if entry[1] > now
+            }
+            self._tokens[self._get_key(api_key, tenant_id)] = (token, expires_at)
+
+    def invalidate(self, *, api_key: str, tenant_id: Optional[int]) -> None:
+        with self._lock:
+            self._tokens.pop(self._get_key(api_key, tenant_id), None)
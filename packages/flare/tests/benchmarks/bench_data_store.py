@@ -0,0 +1,81 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+from datetime import timezone
+from typing import Callable
+from unittest import mock
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+
+from data_store import ConfigDataStore
+from data_store import DataStore
+from data_store import SqliteDataStore
+
+
+def measure(operation: Callable[[int], None], iterations: int) -> float:
+    """
+    Returns the median latency of the operation, in microseconds.
+    """
+    durations = []
+    for i in range(iterations):
+        started_at = time.perf_counter()
+        operation(i)
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations) * 1_000_000
+
+
+def populate(store: DataStore, number_of_tenants: int) -> None:
+    with store.transaction():
+        for tenant_id in range(number_of_tenants):
+            store.set_next_by_tenant(tenant_id, f"next_{tenant_id}")
+            store.set_earliest_ingested_by_tenant(tenant_id, datetime.now(timezone.utc))
+
+
+def run(number_of_tenants: int, iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        # Nothing is migrated from the actual app.
+        with mock.patch.dict(os.environ, {"SPLUNK_HOME": directory}):
+            stores: dict[str, DataStore] = {
+                "sqlite": SqliteDataStore(path=os.path.join(directory, "bench.db")),
+                "config": ConfigDataStore(path=os.path.join(directory, "bench.conf")),
+            }
+
+        for name, store in stores.items():
+            populate(store, number_of_tenants)
+            get_latency = measure(
+                lambda i: store.get_next_by_tenant(i % number_of_tenants),
+                iterations,
+            )
+            set_latency = measure(
+                lambda i: store.set_next_by_tenant(
+                    i % number_of_tenants, f"updated_next_{i}"
+                ),
+                iterations,
+            )
+            print(
+                f"{name:>8} {number_of_tenants:>8} {get_latency:>10.1f} {set_latency:>10.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compares the get and set latency of the data stores."
+    )
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'store':>8} {'tenants':>8} {'get (us)':>10} {'set (us)':>10}")
+    for number_of_tenants in args.tenants:
+        run(number_of_tenants, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+from dedup import DedupIndex
+
+
+def run(number_of_uids: int, capacity: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "dedup_index.bin")
+        dedup_index = DedupIndex(path=path, capacity=capacity)
+        uids = [f"01HQ{i:022d}" for i in range(number_of_uids)]
+
+        started_at = time.perf_counter()
+        for uid in uids:
+            dedup_index.check_and_add(uid)
+        insert_rate = number_of_uids / (time.perf_counter() - started_at)
+
+        # Every lookup hits a UID seen in the current or previous generation.
+        started_at = time.perf_counter()
+        for uid in uids[-min(number_of_uids, capacity) :]:
+            dedup_index.check_and_add(uid)
+        lookup_rate = min(number_of_uids, capacity) / (time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        dedup_index.save(force=True)
+        save_duration = (time.perf_counter() - started_at) * 1000
+
+        started_at = time.perf_counter()
+        DedupIndex(path=path, capacity=capacity)
+        load_duration = (time.perf_counter() - started_at) * 1000
+
+        print(
+            f"{number_of_uids:>10} {capacity:>10} {insert_rate:>12,.0f} {lookup_rate:>12,.0f}"
+            f" {os.path.getsize(path) / 1024 / 1024:>8.1f} {save_duration:>8.1f} {load_duration:>8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measures the lookups per second and the footprint of the dedup index."
+    )
+    parser.add_argument("--uids", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--capacity", type=int, default=500_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'uids':>10} {'capacity':>10} {'inserts/s':>12} {'lookups/s':>12}"
+        f" {'MiB':>8} {'save ms':>8} {'load ms':>8}"
+    )
+    for number_of_uids in args.uids:
+        run(number_of_uids, args.capacity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from typing import IO
+from typing import Callable
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+
+from event_emitter import EventEmitter
+
+
+def make_event(i: int) -> dict:
+    return {
+        "metadata": {
+            "uid": f"uid_{i}",
+            "severity": "medium",
+            "type": "leak",
+            "estimated_created_at": "2024-03-06T14:00:00+00:00",
+        },
+        "tenant_metadata": {"severity": {"original": "medium"}, "tags": []},
+        "data": {"content": "x" * 512},
+        "tenant_id": 11111,
+    }
+
+
+def print_path(events: list[dict], output: IO[str]) -> None:
+    for event in events:
+        print(json.dumps(event), file=output, flush=True)
+
+
+def emitter_path(events: list[dict], output: IO[str]) -> None:
+    with EventEmitter(stream=output) as emitter:
+        for event in events:
+            emitter.emit(event)
+
+
+def drain(read_fd: int) -> None:
+    while os.read(read_fd, 1024 * 1024):
+        pass
+
+
+def measure(emit: Callable[[list[dict], IO[str]], None], events: list[dict]) -> float:
+    # Splunk reads the scripted input's stdout through a pipe.
+    read_fd, write_fd = os.pipe()
+    reader = threading.Thread(target=drain, args=(read_fd,))
+    reader.start()
+
+    with open(write_fd, "w") as output:
+        started_at = time.perf_counter()
+        emit(events, output)
+        elapsed = time.perf_counter() - started_at
+
+    reader.join()
+    os.close(read_fd)
+    return len(events) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compares the buffered event emitter with printing every event."
+    )
+    parser.add_argument("--events", type=int, default=100_000)
+    args = parser.parse_args()
+
+    events = [make_event(i) for i in range(args.events)]
+
+    print(f"{'path':>20} {'events/s':>12}")
+    print(f"{'print + flush':>20} {measure(print_path, events):>12.0f}")
+    print(f"{'emitter':>20} {measure(emitter_path, events):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
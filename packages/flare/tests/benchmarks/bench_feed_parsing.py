@@ -0,0 +1,98 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import Callable
+from typing import Iterator
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+from constants import FEED_PAGE_CHUNK_SIZE
+from feed_page import FeedPage
+
+
+def make_page(number_of_events: int, payload_size: int, *, next_last: bool) -> bytes:
+    items = [
+        {
+            "metadata": {
+                "uid": f"uid_{i}",
+                "severity": "medium",
+                "estimated_created_at": "2024-03-06T14:00:00+00:00",
+            },
+            "data": {"content": "x" * payload_size},
+        }
+        for i in range(number_of_events)
+    ]
+    page = (
+        {"items": items, "next": "some_next_token"}
+        if next_last
+        else {"next": "some_next_token", "items": items}
+    )
+    return json.dumps(page).encode("utf8")
+
+
+def iter_chunks(body: bytes) -> Iterator[bytes]:
+    # Reads the body like `iter_content` does on a streamed response.
+    stream = io.BytesIO(body)
+    while chunk := stream.read(FEED_PAGE_CHUNK_SIZE):
+        yield chunk
+
+
+def whole_page(body: bytes) -> int:
+    # Like `response.json()`, the whole body is read before being decoded.
+    event_feed = json.loads(b"".join(iter_chunks(body)))
+    return sum(1 for _ in event_feed["items"])
+
+
+def streamed_page(body: bytes) -> int:
+    # Like the client, the next token is read once the items were consumed.
+    feed_page = FeedPage(iter_chunks(body))
+    count = sum(1 for _ in feed_page.items())
+    assert feed_page.next == "some_next_token"
+    return count
+
+
+def measure(parse: Callable[[bytes], int], body: bytes) -> tuple[float, float]:
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    parse(body)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compares the peak memory of parsing whole feed pages with streaming their items."
+    )
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument(
+        "--payload-sizes", type=int, nargs="+", default=[1024, 64 * 1024, 512 * 1024]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'next':>6} {'payload':>10} {'page MiB':>10} {'whole ms':>10} {'whole MiB':>10}"
+        f" {'stream ms':>10} {'stream MiB':>10}"
+    )
+    # The API may send the next token before or after the items.
+    for next_last in [False, True]:
+        for payload_size in args.payload_sizes:
+            body = make_page(args.events, payload_size, next_last=next_last)
+            whole_duration, whole_peak = measure(whole_page, body)
+            streamed_duration, streamed_peak = measure(streamed_page, body)
+            print(
+                f"{'last' if next_last else 'first':>6} {payload_size:>10}"
+                f" {len(body) / 1024 / 1024:>10.1f} {whole_duration:>10.1f}"
+                f" {whole_peak:>10.1f} {streamed_duration:>10.1f} {streamed_peak:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
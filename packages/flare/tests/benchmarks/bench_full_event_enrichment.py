@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+from fake_flare_api import FakeFlareApi
+from flare import FlareAPI
+from logger import Logger
+from rate_limiter import AdaptiveRateLimiter
+
+
+def run(
+    *,
+    number_of_events: int,
+    page_size: int,
+    latency: float,
+    requests_per_second: float,
+    max_workers: int,
+) -> float:
+    with FakeFlareApi(
+        number_of_events=number_of_events,
+        page_size=page_size,
+        latency=latency,
+    ) as fake_api:
+        flare_api = FlareAPI(
+            api_key="some_key",
+            tenant_id=111,
+            logger=Logger(class_name=__file__),
+            # No burst so that the measured rate is the sustained rate.
+            rate_limiter=AdaptiveRateLimiter(
+                rate=requests_per_second,
+                capacity=1,
+                max_rate=requests_per_second,
+            ),
+            max_workers=max_workers,
+        )
+        fake_api.mount(flare_api.flare_client._session)
+
+        started_at = time.monotonic()
+        count = sum(
+            1
+            for _ in flare_api.fetch_feed_events(
+                next=None,
+                start_date=None,
+                ingest_full_event_data=True,
+                severities=[],
+                source_types=[],
+            )
+        )
+        elapsed = time.monotonic() - started_at
+
+    if count != number_of_events:
+        raise Exception(f"Expected {number_of_events} events, got {count}")
+    return count / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measures full event enrichment throughput against a fake Flare API."
+    )
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--rates", type=float, nargs="+", default=[5.0, 10.0, 20.0, 40.0]
+    )
+    args = parser.parse_args()
+
+    print(f"{'rate limit':>12} {'events/s':>10} {'of limit':>9}")
+    for rate in args.rates:
+        events_per_second = run(
+            number_of_events=args.events,
+            page_size=args.page_size,
+            latency=args.latency,
+            requests_per_second=rate,
+            max_workers=args.workers,
+        )
+        print(
+            f"{rate:>12.1f} {events_per_second:>10.1f} {events_per_second / rate:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+BIN_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../bin"))
+
+# The `splunk` package is only available within splunkd, the REST handlers
+# are imported against a stand-in of the part they use.
+SPLUNK_STAND_IN = {
+    "splunk/__init__.py": "from . import rest\n",
+    "splunk/rest.py": "class BaseRestHandler:\n    pass\n",
+}
+
+
+def import_time(
+    module: str, python_path: str
+) -> tuple[int, dict[str, tuple[int, int]]]:
+    """
+    Imports the module in a new interpreter and returns its cumulative import
+    time along with the self and cumulative time of every module it imported,
+    in microseconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+        cwd=BIN_PATH,
+        env={**os.environ, "PYTHONPATH": python_path},
+    )
+    modules: dict[str, tuple[int, int]] = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_time), int(cumulative_time))
+
+    splunk_time = modules.get("splunk", (0, 0))[1]
+    return modules[module][1] - splunk_time, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Reports the import time of the entry points, like python -X importtime."
+    )
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["flare_external_requests", "cron_job_ingest_events"],
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for path, content in SPLUNK_STAND_IN.items():
+            os.makedirs(os.path.join(directory, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(directory, path), "w") as stand_in_file:
+                stand_in_file.write(content)
+        python_path = os.pathsep.join([directory, BIN_PATH])
+
+        for module in args.modules:
+            # The first import compiles the bytecode, which is not measured.
+            import_time(module, python_path)
+            timings = [import_time(module, python_path) for _ in range(args.runs)]
+            median_time = statistics.median(total for total, _ in timings)
+            print(f"{module}: {median_time / 1000:.1f} ms")
+
+            _, modules = timings[-1]
+            slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+            print(f"{'self ms':>10} {'cumulative ms':>14} module")
+            for name, (self_time, cumulative_time) in slowest[: args.top]:
+                print(
+                    f"{self_time / 1000:>10.1f} {cumulative_time / 1000:>14.1f} {name}"
+                )
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import ExitStack
+from contextlib import redirect_stdout
+from datetime import datetime
+from datetime import timezone
+from types import SimpleNamespace
+from typing import Any
+from typing import Optional
+from typing import cast
+from unittest import mock
+
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+import flare
+
+from constants import PasswordKeys
+from cron_job_ingest_events import main as ingest_main
+from data_store import ConfigDataStore
+from data_store import DataStore
+from data_store import SqliteDataStore
+from fake_flare_api import FakeFlareApi
+from files import get_state_directory
+from logger import Logger
+from vendor.splunklib.client import StoragePasswords
+
+
+RESULTS_PATH = os.path.join(
+    os.path.dirname(__file__), "results", "bench_ingestion.jsonl"
+)
+
+
+class CountingStream(io.StringIO):
+    # Stands in for stdout, counting the events instead of keeping them.
+    def __init__(self) -> None:
+        super().__init__()
+        self.events = 0
+
+    def write(self, data: str) -> int:
+        self.events += data.count("\n")
+        return len(data)
+
+
+class FakeStoragePasswords:
+    def __init__(self, passwords: dict[str, str]) -> None:
+        self._passwords = [
+            SimpleNamespace(content=SimpleNamespace(username=key), clear_password=value)
+            for key, value in passwords.items()
+        ]
+
+    def list(self) -> list[SimpleNamespace]:
+        return self._passwords
+
+
+def run_scenario(scenario: dict[str, Any]) -> dict[str, Any]:
+    """
+    Ingests every tenant's events from a fake Flare API, running the ingestion
+    again, like the scheduled input would, until the feeds are drained.
+    """
+    with ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        # Nothing is read from or written to the actual app.
+        stack.enter_context(mock.patch.dict(os.environ, {"SPLUNK_HOME": directory}))
+        os.makedirs(os.path.join(directory, "var", "log", "splunk"))
+        os.makedirs(os.path.join(directory, "etc", "apps", "flare", "local"))
+
+        fake_api = stack.enter_context(
+            FakeFlareApi(
+                number_of_events=scenario["events"],
+                page_size=scenario["page_size"],
+                latency=scenario["latency"],
+                payload_size=scenario["payload_size"],
+                error_rate=scenario["error_rate"],
+                throttle_rate=scenario["throttle_rate"],
+                next_last=scenario["next_last"],
+            )
+        )
+        fake_api.mount(flare.get_flare_session())
+
+        tenant_ids = list(range(1, scenario["tenants"] + 1))
+        storage_passwords = cast(
+            StoragePasswords,
+            FakeStoragePasswords(
+                {
+                    PasswordKeys.API_KEY.value: "some_api_key",
+                    PasswordKeys.TENANT_IDS.value: json.dumps(tenant_ids),
+                    PasswordKeys.INGEST_FULL_EVENT_DATA.value: "true"
+                    if scenario["full_event_data"]
+                    else "false",
+                    PasswordKeys.BACKFILL_SLICES.value: "1",
+                    PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value: str(
+                        scenario["requests_per_second"]
+                    ),
+                }
+            ),
+        )
+        data_store: DataStore = (
+            SqliteDataStore(path=os.path.join(directory, "data_store.db"))
+            if scenario["data_store"] == "sqlite"
+            else ConfigDataStore()
+        )
+
+        expected_events = scenario["events"] * scenario["tenants"]
+        stream = CountingStream()
+        runs = 0
+        started_at = time.monotonic()
+        with redirect_stdout(stream):
+            while stream.events < expected_events and runs < scenario["max_runs"]:
+                ingest_main(
+                    logger=Logger(class_name=__file__),
+                    storage_passwords=storage_passwords,
+                    flare_api_cls=flare.FlareAPI,
+                    data_store=data_store,
+                )
+                runs += 1
+        elapsed = time.monotonic() - started_at
+
+        # Every run writes its timings, checkpoint commits included.
+        checkpoint_writes = 0
+        with open(
+            os.path.join(get_state_directory(), "flare_metrics.log")
+        ) as metrics_log:
+            for line in metrics_log:
+                checkpoint_writes += json.loads(line).get("flare.checkpoint.count", 0)
+
+    return {
+        "events": stream.events,
+        "runs": runs,
+        "seconds": elapsed,
+        "events_per_second": stream.events / elapsed,
+        # Kilobytes on Linux, bytes on macOS.
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "checkpoint_writes": checkpoint_writes,
+        "api_calls_per_event": fake_api.api_calls / max(stream.events, 1),
+        "throttled": fake_api.calls.get("throttled", 0),
+        "errors": fake_api.calls.get("error", 0),
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_previous_result(path: str, scenario: dict[str, Any]) -> Optional[dict]:
+    """
+    Returns the last saved result of the same scenario.
+    """
+    previous_result = None
+    try:
+        with open(path) as results_file:
+            for line in results_file:
+                result = json.loads(line)
+                if result["scenario"] == scenario:
+                    previous_result = result
+    except (OSError, ValueError):
+        pass
+    return previous_result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measures the end to end ingestion against a fake Flare API."
+    )
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--tenants", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--payload-size", type=int, default=512)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-second", type=float, default=25.0)
+    parser.add_argument("--full-event-data", action="store_true")
+    parser.add_argument(
+        "--next-last",
+        action="store_true",
+        help="Sends the next token after the items of the pages.",
+    )
+    parser.add_argument("--data-store", choices=["config", "sqlite"], default="config")
+    parser.add_argument("--max-runs", type=int, default=10)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    scenario = {
+        "events": args.events,
+        "tenants": args.tenants,
+        "page_size": args.page_size,
+        "latency": args.latency,
+        "payload_size": args.payload_size,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "requests_per_second": args.requests_per_second,
+        "full_event_data": args.full_event_data,
+        "next_last": args.next_last,
+        "data_store": args.data_store,
+        "max_runs": args.max_runs,
+    }
+    # A fresh process per scenario, so that the peak RSS is its own.
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        result = pool.apply(run_scenario, (scenario,))
+
+    previous_result = load_previous_result(args.output, scenario)
+    print(f"{'metric':>20} {'value':>12} {'previous':>12}")
+    for name, value in result.items():
+        previous_value = (
+            previous_result["result"].get(name) if previous_result else None
+        )
+        print(
+            f"{name:>20} {value:>12.2f} "
+            + (
+                f"{previous_value:>12.2f}"
+                if previous_value is not None
+                else f"{'-':>12}"
+            )
+        )
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "a") as results_file:
+        results_file.write(
+            json.dumps(
+                {
+                    "commit": get_commit(),
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "scenario": scenario,
+                    "result": result,
+                }
+            )
+            + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Optional
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+from vendor.requests import PreparedRequest
+from vendor.requests import Response
+from vendor.requests import Session
+from vendor.requests.adapters import HTTPAdapter
+
+
+FLARE_API_URL = "https://api.flare.io"
+
+
+class FakeFlareApi:
+    """
+    Local stand-in for the Flare API, serving the token, event search and
+    activity endpoints with a configurable latency, page size and payload size.
+
+    A share of the search and activity requests fails, either with a 500 or
+    with a 429 asking to retry after `retry_after` seconds. Every tenant has
+    its own events, told apart by the token it was given.
+    """
+
+    def __init__(
+        self,
+        *,
+        number_of_events: int,
+        page_size: int = 10,
+        latency: float = 0.0,
+        payload_size: int = 512,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: int = 0,
+        next_last: bool = False,
+    ) -> None:
+        self.number_of_events = number_of_events
+        self.page_size = page_size
+        self.latency = latency
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.next_last = next_last
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        if not self._server:
+            raise Exception("Fake Flare API is not started")
+        host, port = self._server.server_address[:2]
+        return f"http://{str(host)}:{port}"
+
+    def __enter__(self) -> "FakeFlareApi":
+        fake_api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                fake_api._handle(self)
+
+            def do_GET(self) -> None:
+                fake_api._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def api_calls(self) -> int:
+        with self._lock:
+            return sum(
+                count
+                for name, count in self.calls.items()
+                if name in ("token", "search", "activity")
+            )
+
+    def mount(self, session: Session) -> None:
+        """
+        Redirects every request made to the Flare API by this session to the
+        fake, keeping the retries of the session.
+        """
+        session.mount(
+            FLARE_API_URL,
+            _RedirectAdapter(
+                base_url=self.base_url,
+                max_retries=session.get_adapter(FLARE_API_URL).max_retries,
+            ),
+        )
+
+    def _record_call(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _get_failure(self) -> Optional[int]:
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        body: Any = json.loads(request.rfile.read(length) or b"null")
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = request.path.split("?")[0]
+        # Tokens are handed out per tenant, like the real API does.
+        tenant_id = (request.headers.get("Authorization") or "").rsplit("_", 1)[-1]
+        if path == "/tokens/generate":
+            self._record_call("token")
+            self._respond(
+                request, 200, {"token": f"fake_token_{(body or {}).get('tenant_id')}"}
+            )
+            return
+        if path == "/tokens/test":
+            self._record_call("token")
+            self._respond(request, 200, {})
+            return
+        if not path.startswith(
+            ("/firework/v4/events/tenant/_search", "/firework/v2/activities/")
+        ):
+            self._respond(request, 404, {})
+            return
+
+        failure = self._get_failure()
+        if failure == 429:
+            self._record_call("throttled")
+            self._respond(
+                request, 429, {}, headers={"Retry-After": str(self.retry_after)}
+            )
+        elif failure:
+            self._record_call("error")
+            self._respond(request, failure, {})
+        elif path == "/firework/v4/events/tenant/_search":
+            self._record_call("search")
+            self._respond(request, 200, self._search_page(tenant_id, body or {}))
+        else:
+            self._record_call("activity")
+            uid = path.rsplit("/", 1)[-1]
+            self._respond(request, 200, {"activity": self._event(uid, full=True)})
+
+    def _search_page(self, tenant_id: str, body: dict) -> dict:
+        offset = int(body.get("from") or 0)
+        end = min(offset + (body.get("size") or self.page_size), self.number_of_events)
+        next = str(end) if end < self.number_of_events else None
+        items = [
+            self._event(f"uid_{tenant_id}_{i}", full=False) for i in range(offset, end)
+        ]
+        # Nothing guarantees the order of the keys in the body.
+        if self.next_last:
+            return {"items": items, "next": next}
+        return {"next": next, "items": items}
+
+    def _event(self, uid: str, *, full: bool) -> dict:
+        event: dict = {
+            "metadata": {
+                "uid": uid,
+                "severity": "medium",
+                "estimated_created_at": "2024-03-06T14:00:00+00:00",
+                "materialized_at": "2024-03-06T14:00:00+00:00",
+            }
+        }
+        if full:
+            event["data"] = {"content": "x" * self.payload_size}
+        return event
+
+    @staticmethod
+    def _respond(
+        request: BaseHTTPRequestHandler,
+        status: int,
+        payload: Any,
+        *,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(payload).encode("utf8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+
+class _RedirectAdapter(HTTPAdapter):
+    def __init__(self, *, base_url: str, max_retries: Any = 0) -> None:
+        super().__init__(max_retries=max_retries)
+        self._base_url = base_url
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        request.url = (request.url or "").replace(FLARE_API_URL, self._base_url, 1)
+        return super().send(request, **kwargs)
@@ -4,6 +4,7 @@ import sys
 
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 from typing import Generator
 from typing import List
 from typing import Optional
@@ -12,9 +13,15 @@ from unittest import mock
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin"))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../bin/vendor"))
+import flare
+
+from activity_cache import ActivityCache
 from data_store import ConfigDataStore
 from flare import FlareAPI
 from logger import Logger
+from logger import format_message
+from metrics import Metrics
+from rate_limiter import AdaptiveRateLimiter
 from vendor.splunklib.client import StoragePasswords
 
 
@@ -53,25 +60,37 @@ class FakeLogger(Logger):
 
         self._mock = mock.MagicMock(spec=Logger)
 
-    def info(self, message: str) -> None:
-        self.messages.append(f"INFO: {message}")
+    def info(self, message: Any, *args: Any, **fields: Any) -> None:
+        self.messages.append(f"INFO: {format_message(message, args, fields)}")
 
-    def error(self, message: str) -> None:
-        self.messages.append(f"ERROR: {message}")
+    def error(self, message: Any, *args: Any, **fields: Any) -> None:
+        self.messages.append(f"ERROR: {format_message(message, args, fields)}")
 
 
 class FakeFlareAPI(FlareAPI):
-    def __init__(self, api_key: str, tenant_id: int, logger: Logger) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        tenant_id: int,
+        logger: Logger,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        max_workers: int = 1,
+        activity_cache: Optional[ActivityCache] = None,
+        page_size: Optional[int] = None,
+        adaptive_page_size: bool = False,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
         pass
 
     def fetch_feed_events(
         self,
         next: Optional[str],
         start_date: Optional[datetime],
+        end_date: Optional[datetime],
         ingest_full_event_data: bool,
         severities: list[str],
         source_types: list[str],
-    ) -> List[tuple[dict, str]]:
+    ) -> List[tuple[dict, Optional[str]]]:
         return [
             (
                 {"actor": "this guy"},
@@ -113,24 +132,45 @@ def mock_config_file(tmp_path: Path) -> Path:
 
 
 @pytest.fixture
-def mock_env(mock_config_file: Path) -> Generator[None, None, None]:
-    # Mocks environment variable and file interactions.
-    with mock.patch.dict(os.environ, {"SPLUNK_HOME": str(mock_config_file.parent)}):
-        with mock.patch("builtins.open", mock.mock_open(read_data="[metadata]\n")):
-            yield
+def mock_env() -> Generator[None, None, None]:
+    # Mocks file interactions.
+    with mock.patch("builtins.open", mock.mock_open(read_data="[metadata]\n")):
+        yield
 
 
 @pytest.fixture
-def data_store(mock_env: None) -> Generator[ConfigDataStore, None, None]:
+def data_store(
+    mock_env: None, mock_config_file: Path
+) -> Generator[ConfigDataStore, None, None]:
     # Creates an instance of ConfigDataStore with mocked dependencies.
     with mock.patch("configparser.RawConfigParser.read") as mock_read:
         mock_read.return_value = None
-        store = ConfigDataStore()
+        store = ConfigDataStore(path=str(mock_config_file))
         store._commit = lambda: None
         yield store
 
 
+@pytest.fixture(autouse=True)
+def splunk_home(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Generator[Path, None, None]:
+    # Keeps the files written by every test in its own directory.
+    path = tmp_path_factory.mktemp("splunk")
+    (path / "var" / "log" / "splunk").mkdir(parents=True)
+    with mock.patch.dict(os.environ, {"SPLUNK_HOME": str(path)}):
+        yield path
+
+
 @pytest.fixture
 def disable_sleep() -> Generator[None, None, None]:
     with mock.patch("time.sleep", return_value=None):
         yield
+
+
+@pytest.fixture(autouse=True)
+def flare_shared_state() -> Generator[None, None, None]:
+    # Every test starts without a shared session nor cached tokens.
+    with mock.patch.object(flare, "_shared_session", None), mock.patch.object(
+        flare, "_shared_token_cache", None
+    ):
+        yield
@@ -0,0 +1,79 @@
+import sqlite3
+
+from activity_cache import ActivityCache
+from freezegun import freeze_time
+from pathlib import Path
+
+
+def test_get_and_set(tmp_path: Path) -> None:
+    # The state directory is created on first use.
+    path = str(tmp_path / "state" / "activity_cache.db")
+    activity_cache = ActivityCache(path=path)
+
+    assert activity_cache.get("some_uid_1") is None
+    activity_cache.set("some_uid_1", {"metadata": {"uid": "some_uid_1"}})
+    assert activity_cache.get("some_uid_1") == {"metadata": {"uid": "some_uid_1"}}
+    assert (activity_cache.hits, activity_cache.misses) == (1, 1)
+
+    # The cache outlives the process.
+    activity_cache.close()
+    reopened_cache = ActivityCache(path=path)
+    assert reopened_cache.get("some_uid_1") == {"metadata": {"uid": "some_uid_1"}}
+
+
+def test_entries_expire(tmp_path: Path) -> None:
+    activity_cache = ActivityCache(path=str(tmp_path / "activity_cache.db"), ttl=60)
+
+    with freeze_time("2024-03-06 12:00:00"):
+        activity_cache.set("some_uid_1", {"metadata": {"uid": "some_uid_1"}})
+
+    with freeze_time("2024-03-06 12:00:59"):
+        assert activity_cache.get("some_uid_1") is not None
+
+    with freeze_time("2024-03-06 12:01:00"):
+        assert activity_cache.get("some_uid_1") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    activity_cache = ActivityCache(
+        path=str(tmp_path / "activity_cache.db"), max_size=1000, compress=False
+    )
+
+    activity = {"data": "x" * 190}
+    with freeze_time("2024-03-06 12:00:00") as frozen_time:
+        for i in range(4):
+            activity_cache.set(f"some_uid_{i}", activity)
+            frozen_time.tick()
+
+        # Reading the oldest entry keeps it around.
+        assert activity_cache.get("some_uid_0") is not None
+        frozen_time.tick()
+        activity_cache.set("some_uid_4", activity)
+        frozen_time.tick()
+        activity_cache.set("some_uid_5", activity)
+
+        assert [activity_cache.get(f"some_uid_{i}") is not None for i in range(6)] == [
+            True,
+            False,
+            False,
+            True,
+            True,
+            True,
+        ]
+
+
+def test_payloads_are_compressed(tmp_path: Path) -> None:
+    path = str(tmp_path / "activity_cache.db")
+    activity = {"data": "x" * 10_000}
+
+    ActivityCache(path=path).set("some_uid_1", activity)
+    ActivityCache(path=path, compress=False).set("some_uid_2", activity)
+
+    sizes = dict(
+        sqlite3.connect(path).execute("SELECT uid, size FROM activities").fetchall()
+    )
+    assert sizes["some_uid_1"] < sizes["some_uid_2"] / 10
+
+    # Entries stay readable whatever the current setting.
+    assert ActivityCache(path=path, compress=False).get("some_uid_1") == activity
+    assert ActivityCache(path=path).get("some_uid_2") == activity
@@ -0,0 +1,48 @@
+from backfill import BackfillSlice
+from backfill import plan_backfill
+from data_store import ConfigDataStore
+from datetime import datetime
+from datetime import timezone
+
+
+def test_plan_backfill_splits_time_range() -> None:
+    plan = plan_backfill(
+        start=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        end=datetime(2024, 3, 5, tzinfo=timezone.utc),
+        slice_count=4,
+    )
+
+    assert [(s.start.day, s.end.day) for s in plan.slices] == [
+        (1, 2),
+        (2, 3),
+        (3, 4),
+        (4, 5),
+    ]
+    assert plan.progress == 0.0
+    assert not plan.done
+
+
+def test_backfill_progress(data_store: ConfigDataStore) -> None:
+    plan = plan_backfill(
+        start=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        end=datetime(2024, 3, 9, tzinfo=timezone.utc),
+        slice_count=4,
+    )
+    data_store.set_backfill_plan(111, plan)
+    data_store.set_backfill_slice(111, plan.slices[1].advance(next="next_1", done=True))
+    data_store.set_backfill_slice(111, plan.slices[2].advance(next="next_2"))
+
+    stored_plan = data_store.get_backfill_plan(111)
+    assert stored_plan is not None
+    assert stored_plan.end == datetime(2024, 3, 9, tzinfo=timezone.utc)
+    assert stored_plan.slices[1] == BackfillSlice(
+        index=1,
+        start=datetime(2024, 3, 3, tzinfo=timezone.utc),
+        end=datetime(2024, 3, 5, tzinfo=timezone.utc),
+        next="next_1",
+        done=True,
+    )
+    assert stored_plan.slices[2].next == "next_2"
+    assert stored_plan.progress == 25.0
+    assert data_store.get_backfill_plans() == {111: stored_plan}
+    assert data_store.get_backfill_plan(222) is None
@@ -0,0 +1,70 @@
+from checkpoint import Checkpointer
+from data_store import ConfigDataStore
+from datetime import datetime
+from datetime import timezone
+from unittest import mock
+
+
+def test_checkpointer_writes_once_per_flush(data_store: ConfigDataStore) -> None:
+    with mock.patch.object(data_store, "_commit") as commit:
+        checkpointer = Checkpointer(data_store=data_store)
+        checkpointer.set_last_fetch(datetime(2024, 3, 6, tzinfo=timezone.utc))
+        checkpointer.set_next_by_tenant(111, "next_111")
+        checkpointer.set_next_by_tenant(222, "next_222")
+        commit.assert_not_called()
+
+        checkpointer.flush()
+        assert commit.call_count == 1
+
+    assert data_store.get_next_by_tenant(111) == "next_111"
+    assert data_store.get_next_by_tenant(222) == "next_222"
+    assert data_store.get_last_fetch() == datetime(2024, 3, 6, tzinfo=timezone.utc)
+
+
+def test_checkpointer_skips_unchanged_values(data_store: ConfigDataStore) -> None:
+    data_store.set_next_by_tenant(111, "next_111")
+
+    with mock.patch.object(data_store, "_commit") as commit:
+        checkpointer = Checkpointer(data_store=data_store)
+        checkpointer.set_next_by_tenant(111, "next_111")
+        checkpointer.flush()
+        checkpointer.flush()
+        commit.assert_not_called()
+
+
+def test_checkpointer_flushes_every_n_events(data_store: ConfigDataStore) -> None:
+    with mock.patch.object(data_store, "_commit") as commit:
+        checkpointer = Checkpointer(
+            data_store=data_store, max_pending_events=3, max_interval=3600
+        )
+        for i in range(7):
+            checkpointer.set_last_fetch(datetime(2024, 3, 6, 0, i, tzinfo=timezone.utc))
+            checkpointer.record_event()
+
+        assert commit.call_count == 2
+        assert data_store.get_last_fetch() == datetime(
+            2024, 3, 6, 0, 5, tzinfo=timezone.utc
+        )
+
+
+def test_checkpointer_flushes_after_interval(data_store: ConfigDataStore) -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        checkpointer = Checkpointer(
+            data_store=data_store, max_pending_events=1000, max_interval=30
+        )
+
+    with mock.patch.object(data_store, "_commit") as commit:
+        checkpointer.set_last_fetch(datetime(2024, 3, 6, tzinfo=timezone.utc))
+        with mock.patch("time.monotonic", return_value=110.0):
+            checkpointer.record_event()
+            commit.assert_not_called()
+        with mock.patch("time.monotonic", return_value=130.0):
+            checkpointer.record_event()
+            commit.assert_called_once()
+
+
+def test_checkpointer_flushes_on_exit(data_store: ConfigDataStore) -> None:
+    with mock.patch.object(data_store, "_commit") as commit:
+        with Checkpointer(data_store=data_store) as checkpointer:
+            checkpointer.set_next_by_tenant(111, "next_111")
+        commit.assert_called_once()
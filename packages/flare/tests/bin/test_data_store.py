@@ -1,6 +1,18 @@
+import data_store as data_store_module
+import multiprocessing
+import os
+import pytest
+
+from constants import DataStoreBackend
 from data_store import ConfigDataStore
+from data_store import SqliteDataStore
+from data_store import get_data_store
 from datetime import datetime
+from datetime import timedelta
 from datetime import timezone
+from pathlib import Path
+from typing import Generator
+from unittest import mock
 
 
 def test_get_and_set_last_fetch(data_store: ConfigDataStore) -> None:
@@ -21,3 +33,130 @@ def test_get_and_set_earliest_ingested_by_tenant(data_store: ConfigDataStore) ->
     date = datetime(2024, 3, 6, 14, 0, 0, tzinfo=timezone.utc)
     data_store.set_earliest_ingested_by_tenant(tenant_id, date)
     assert data_store.get_earliest_ingested_by_tenant(tenant_id) == date
+
+
+def test_commit_replaces_data_store_atomically(splunk_home: Path) -> None:
+    local_directory = splunk_home / "etc" / "apps" / "flare" / "local"
+    local_directory.mkdir(parents=True)
+    store = ConfigDataStore()
+    store.set_next_by_tenant(789, "next_token_value")
+
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            store.set_next_by_tenant(789, "other_next_token_value")
+
+    assert sorted(os.listdir(local_directory)) == [
+        "data_store.conf",
+        "data_store.conf.lock",
+    ]
+    assert ConfigDataStore().get_next_by_tenant(789) == "next_token_value"
+
+
+def test_transaction_commits_once(data_store: ConfigDataStore) -> None:
+    with mock.patch.object(data_store, "_commit") as commit:
+        with data_store.transaction():
+            data_store.set_next_by_tenant(789, "next_token_value")
+            data_store.set_last_fetch(datetime(2024, 3, 6, tzinfo=timezone.utc))
+            commit.assert_not_called()
+        commit.assert_called_once()
+
+        with data_store.transaction():
+            data_store.set_next_by_tenant(789, "next_token_value")
+        commit.assert_called_once()
+
+
+def acquire_lease(config_path: str, owner: str) -> bool:
+    return ConfigDataStore(path=config_path).try_acquire_lease(
+        "tenant_789", owner, timedelta(minutes=2)
+    )
+
+
+def test_lease_is_exclusive_between_processes(tmp_path: Path) -> None:
+    config_path = str(tmp_path / "data_store.conf")
+    with multiprocessing.get_context("fork").Pool(8) as pool:
+        acquired = pool.starmap(
+            acquire_lease, [(config_path, f"owner_{i}") for i in range(32)]
+        )
+
+    assert acquired.count(True) == 1
+
+
+@pytest.fixture
+def sqlite_data_store(tmp_path: Path) -> Generator[SqliteDataStore, None, None]:
+    store = SqliteDataStore(path=str(tmp_path / "data_store.db"))
+    yield store
+    store.close()
+
+
+def test_sqlite_get_and_set(sqlite_data_store: SqliteDataStore) -> None:
+    date = datetime(2024, 3, 6, 14, 0, 0, tzinfo=timezone.utc)
+    sqlite_data_store.set_last_fetch(date)
+    sqlite_data_store.set_next_by_tenant(789, "next_token_value")
+    sqlite_data_store.set_next_by_tenant(789, None)
+    sqlite_data_store.set_earliest_ingested_by_tenant(789, date)
+
+    assert sqlite_data_store.get_last_fetch() == date
+    assert sqlite_data_store.get_next_by_tenant(789) == "next_token_value"
+    assert sqlite_data_store.get_earliest_ingested_by_tenant(789) == date
+    assert sqlite_data_store.get_next_by_tenant(123) is None
+
+
+def test_sqlite_uses_wal(sqlite_data_store: SqliteDataStore) -> None:
+    journal_mode = sqlite_data_store._connection.execute(
+        "PRAGMA journal_mode"
+    ).fetchone()
+    assert journal_mode == ("wal",)
+
+
+def test_sqlite_transaction_rolls_back(sqlite_data_store: SqliteDataStore) -> None:
+    sqlite_data_store.set_next_by_tenant(789, "next_token_value")
+
+    with pytest.raises(Exception, match="interrupted"):
+        with sqlite_data_store.transaction():
+            sqlite_data_store.set_next_by_tenant(789, "other_next_token_value")
+            sqlite_data_store.set_next_by_tenant(123, "next_token_value")
+            raise Exception("interrupted")
+
+    assert sqlite_data_store.get_next_by_tenant(789) == "next_token_value"
+    assert sqlite_data_store.get_next_by_tenant(123) is None
+
+
+def test_sqlite_is_shared_between_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "data_store.db")
+    first = SqliteDataStore(path=path)
+    second = SqliteDataStore(path=path)
+
+    first.set_next_by_tenant(789, "next_token_value")
+    assert second.get_next_by_tenant(789) == "next_token_value"
+
+    # Leases are exclusive across connections.
+    assert first.try_acquire_lease("tenant_789", "first", timedelta(minutes=2))
+    assert not second.try_acquire_lease("tenant_789", "second", timedelta(minutes=2))
+
+
+def test_sqlite_migrates_config_data_store_once(splunk_home: Path) -> None:
+    local_directory = splunk_home / "etc" / "apps" / "flare" / "local"
+    local_directory.mkdir(parents=True)
+    (local_directory / "data_store.conf").write_text(
+        "[metadata]\n"
+        "timestamp_last_fetch = 2024-03-06T14:00:00+00:00\n"
+        "[tenant_data]\n"
+        "next_789 = next_token_value\n"
+    )
+
+    store = SqliteDataStore()
+    assert store.get_next_by_tenant(789) == "next_token_value"
+    assert store.get_last_fetch() == datetime(2024, 3, 6, 14, 0, 0, tzinfo=timezone.utc)
+
+    store.set_next_by_tenant(789, "other_next_token_value")
+    store.close()
+
+    assert SqliteDataStore().get_next_by_tenant(789) == "other_next_token_value"
+
+
+def test_get_data_store_backend() -> None:
+    with mock.patch.object(data_store_module, "SqliteDataStore") as sqlite:
+        assert get_data_store(backend=DataStoreBackend.SQLITE) == sqlite.return_value
+
+    with mock.patch.object(data_store_module, "ConfigDataStore") as config:
+        assert get_data_store(backend=DataStoreBackend.CONFIG) == config.return_value
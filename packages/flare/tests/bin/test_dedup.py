@@ -0,0 +1,66 @@
+import os
+
+from dedup import DedupIndex
+from pathlib import Path
+from unittest import mock
+
+
+def test_check_and_add(tmp_path: Path) -> None:
+    dedup_index = DedupIndex(path=str(tmp_path / "dedup_index.bin"))
+
+    assert not dedup_index.check_and_add("some_uid_1")
+    assert not dedup_index.check_and_add("some_uid_2")
+    assert dedup_index.check_and_add("some_uid_1")
+    assert dedup_index.suppressed_count == 1
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    # The state directory is created by the first save.
+    path = str(tmp_path / "state" / "dedup_index.bin")
+    dedup_index = DedupIndex(path=path, min_save_interval=3600)
+    dedup_index.check_and_add("some_uid_1")
+
+    # Saves are spaced out unless forced.
+    dedup_index.save()
+    assert not os.path.exists(path)
+    dedup_index.save(force=True)
+    size = os.path.getsize(path)
+
+    for i in range(1000):
+        dedup_index.check_and_add(f"some_uid_{i}")
+    dedup_index.save(force=True)
+    assert os.path.getsize(path) == size
+
+    loaded_index = DedupIndex(path=path)
+    assert loaded_index.check_and_add("some_uid_999")
+    assert not loaded_index.check_and_add("some_uid_1000")
+
+    # A differently sized index starts over.
+    assert not DedupIndex(path=path, capacity=10).check_and_add("some_uid_1")
+
+
+def test_rotation_forgets_oldest_generation(tmp_path: Path) -> None:
+    dedup_index = DedupIndex(path=str(tmp_path / "dedup_index.bin"), capacity=2)
+
+    for uid in ["uid_1", "uid_2", "uid_3", "uid_4"]:
+        assert not dedup_index.check_and_add(uid)
+    # The first generation is now the previous one.
+    assert dedup_index.check_and_add("uid_1")
+
+    assert not dedup_index.check_and_add("uid_5")
+    assert not dedup_index.check_and_add("uid_1")
+
+
+def test_rotation_by_age(tmp_path: Path) -> None:
+    with mock.patch("time.time", return_value=1000.0):
+        dedup_index = DedupIndex(
+            path=str(tmp_path / "dedup_index.bin"), max_generation_age=60
+        )
+        dedup_index.check_and_add("uid_1")
+
+    with mock.patch("time.time", return_value=1060.0):
+        dedup_index.check_and_add("uid_2")
+    with mock.patch("time.time", return_value=1120.0):
+        dedup_index.check_and_add("uid_3")
+
+    assert not dedup_index.check_and_add("uid_1")
@@ -0,0 +1,150 @@
+import configparser
+import io
+import json
+import os
+import re
+
+from checkpoint import Checkpointer
+from data_store import ConfigDataStore
+from event_emitter import EventEmitter
+from unittest import mock
+
+
+props_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "src",
+    "main",
+    "resources",
+    "splunk",
+    "default",
+    "props.conf",
+)
+
+
+def test_emitter_buffers_until_size_limit() -> None:
+    stream = io.StringIO()
+    emitter = EventEmitter(stream=stream, max_buffer_size=50, max_buffer_age=3600)
+
+    emitter.emit({"actor": "this guy"})
+    assert stream.getvalue() == ""
+
+    emitter.emit({"actor": "some other guy", "data": "x" * 20})
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {"actor": "this guy"},
+        {"actor": "some other guy", "data": "x" * 20},
+    ]
+
+
+def test_emitter_flushes_old_buffer() -> None:
+    stream = io.StringIO()
+    emitter = EventEmitter(stream=stream, max_buffer_size=1024, max_buffer_age=1)
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        emitter.emit({"actor": "this guy"})
+    assert stream.getvalue() == ""
+
+    with mock.patch("time.monotonic", return_value=101.0):
+        emitter.emit({"actor": "some other guy"})
+    assert len(stream.getvalue().splitlines()) == 2
+
+
+def test_emitter_writes_one_compact_line_per_event() -> None:
+    stream = io.StringIO()
+    with EventEmitter(stream=stream) as emitter:
+        emitter.emit({"actor": "this guy", "content": "multi\nline"})
+
+    assert stream.getvalue().count("\n") == 1
+    assert json.loads(stream.getvalue()) == {
+        "actor": "this guy",
+        "content": "multi\nline",
+    }
+    assert ", " not in stream.getvalue()
+
+
+def test_checkpointer_flushes_emitter_before_commit(
+    data_store: ConfigDataStore,
+) -> None:
+    stream = io.StringIO()
+    emitter = EventEmitter(stream=stream)
+
+    def commit() -> None:
+        assert stream.getvalue() == '{"actor":"this guy"}\n'
+
+    with mock.patch.object(data_store, "_commit", side_effect=commit) as mock_commit:
+        checkpointer = Checkpointer(data_store=data_store, emitter=emitter)
+        emitter.emit({"actor": "this guy"})
+        checkpointer.set_next_by_tenant(111, "next_111")
+        checkpointer.flush()
+        mock_commit.assert_called_once()
+
+
+def get_props(sourcetype: str) -> configparser.SectionProxy:
+    props = configparser.RawConfigParser()
+    props.optionxform = str  # type: ignore[assignment,method-assign]
+    props.read(props_path)
+    return props[sourcetype]
+
+
+def break_events_with_line_merge(data: str, break_only_before: str) -> list[str]:
+    events: list[str] = []
+    for line in data.splitlines():
+        if events and not re.match(break_only_before, line):
+            events[-1] += "\n" + line
+        else:
+            events.append(line)
+    return events
+
+
+def break_events_with_line_breaker(data: str, line_breaker: str) -> list[str]:
+    # The first capture group is the delimiter, which is dropped.
+    return [event for event in re.split(line_breaker, data)[::2] if event]
+
+
+def test_events_parse_identically_with_both_sourcetypes() -> None:
+    events = [
+        {"metadata": {"uid": "some_uid_1"}, "content": "multi\nline\r\n{json}"},
+        {"metadata": {"uid": "some_uid_2"}, "content": "\n{\n"},
+        {"metadata": {"uid": "some_uid_3"}, "nested": [{"a": 1}, {"b": "\u00e9"}]},
+    ]
+    stream = io.StringIO()
+    with EventEmitter(stream=stream) as emitter:
+        for event in events:
+            emitter.emit(event)
+
+    flare_json = get_props("flare_json")
+    flare_ndjson = get_props("flare_ndjson")
+    assert flare_json["SHOULD_LINEMERGE"] == "true"
+    assert flare_ndjson["SHOULD_LINEMERGE"] == "false"
+
+    line_merged_events = break_events_with_line_merge(
+        stream.getvalue(), flare_json["BREAK_ONLY_BEFORE"]
+    )
+    line_broken_events = break_events_with_line_breaker(
+        stream.getvalue(), flare_ndjson["LINE_BREAKER"]
+    )
+
+    assert line_merged_events == line_broken_events
+    assert [json.loads(event) for event in line_broken_events] == events
+
+
+def test_ndjson_sourcetype_finds_event_timestamp() -> None:
+    stream = io.StringIO()
+    with EventEmitter(stream=stream) as emitter:
+        emitter.emit(
+            {
+                "metadata": {
+                    "uid": "some_uid_1",
+                    "estimated_created_at": "2024-03-06T14:00:00.123456+00:00",
+                },
+            }
+        )
+
+    flare_ndjson = get_props("flare_ndjson")
+    match = re.search(flare_ndjson["TIME_PREFIX"], stream.getvalue())
+    assert match
+    lookahead = stream.getvalue()[
+        match.end() : match.end() + int(flare_ndjson["MAX_TIMESTAMP_LOOKAHEAD"])
+    ]
+    assert lookahead.startswith("2024-03-06T14:00:00.123456+00:00")
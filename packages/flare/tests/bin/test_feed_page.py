@@ -0,0 +1,74 @@
+import json
+import pytest
+
+from feed_page import FeedPage
+from typing import Iterator
+from unittest import mock
+
+
+def get_chunks(document: str, chunk_size: int = 1) -> Iterator[bytes]:
+    data = document.encode("utf8")
+    for start in range(0, len(data), chunk_size):
+        yield data[start : start + chunk_size]
+
+
+ITEMS = [
+    {"metadata": {"uid": "some_uid_1", "score": 12345}, "data": "café ☕"},
+    {"metadata": {"uid": "some_uid_2", "score": 1.5e-3}, "data": None},
+    {"metadata": {"uid": "some_uid_3"}, "tags": ["a", "b"], "flagged": True},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_items_are_streamed(chunk_size: int) -> None:
+    document = json.dumps({"next": "some_next_token", "items": ITEMS}, indent=2)
+    feed_page = FeedPage(get_chunks(document, chunk_size))
+
+    assert feed_page.next == "some_next_token"
+    assert list(feed_page.items()) == ITEMS
+
+
+def test_next_after_items() -> None:
+    document = json.dumps({"items": ITEMS, "total": 3, "next": "some_next_token"})
+    feed_page = FeedPage(get_chunks(document))
+
+    assert feed_page.next == "some_next_token"
+    assert list(feed_page.items()) == ITEMS
+
+    feed_page = FeedPage(get_chunks(document))
+    assert list(feed_page.items()) == ITEMS
+    assert feed_page.next == "some_next_token"
+
+
+def test_last_page() -> None:
+    feed_page = FeedPage(get_chunks('{"next": null, "items": []}'))
+    assert feed_page.next is None
+    assert list(feed_page.items()) == []
+
+    assert FeedPage(get_chunks("{}")).next is None
+
+
+def test_invalid_document() -> None:
+    with pytest.raises(ValueError, match="Expected one of"):
+        list(FeedPage(get_chunks('{"items": [{"uid": 1} {"uid": 2}]}')).items())
+
+    with pytest.raises(ValueError, match="Unexpected end of the JSON document"):
+        list(FeedPage(get_chunks('{"items": [{"uid": 1},')).items())
+
+
+def test_read_time_leaves_out_the_caller() -> None:
+    document = '{"items": [{"uid": 1}, {"uid": 2}], "next": "some_next_token"}'
+    clock = [0.0]
+
+    def get_slow_chunks() -> Iterator[bytes]:
+        for chunk in get_chunks(document, chunk_size=16):
+            clock[0] += 1.0
+            yield chunk
+
+    with mock.patch("time.monotonic", side_effect=lambda: clock[0]):
+        feed_page = FeedPage(get_slow_chunks())
+        for _ in feed_page.items():
+            clock[0] += 100.0
+        assert feed_page.next == "some_next_token"
+
+    assert feed_page.read_time == 4.0
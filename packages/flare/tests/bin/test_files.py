@@ -0,0 +1,50 @@
+import os
+import pytest
+import stat
+import sys
+
+from files import get_app_local_directory
+from files import get_state_directory
+from files import lock_file
+from files import write_atomically
+from pathlib import Path
+from unittest import mock
+
+
+def test_directories() -> None:
+    with mock.patch.dict(os.environ, {"SPLUNK_HOME": "/opt/some_splunk"}):
+        assert get_app_local_directory() == "/opt/some_splunk/etc/apps/flare/local"
+        assert (
+            get_state_directory() == "/opt/some_splunk/var/lib/splunk/modinputs/flare"
+        )
+
+
+def test_write_atomically(tmp_path: Path) -> None:
+    path = tmp_path / "some_directory" / "some_file.json"
+    with write_atomically(str(path)) as file:
+        file.write("first")
+    assert path.read_text() == "first"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    with pytest.raises(Exception, match="interrupted"):
+        with write_atomically(str(path)) as file:
+            file.write("second")
+            raise Exception("interrupted")
+
+    assert path.read_text() == "first"
+    assert os.listdir(path.parent) == ["some_file.json"]
+
+
+def test_lock_file_on_windows(tmp_path: Path) -> None:
+    msvcrt = mock.Mock(LK_LOCK=1, LK_UNLCK=0)
+    # The lock is still held by another process after the first 10 tries.
+    msvcrt.locking.side_effect = [OSError("deadlock"), None, None]
+    path = str(tmp_path / "some_file.lock")
+    with mock.patch.object(sys, "platform", "win32"), mock.patch.dict(
+        sys.modules, {"msvcrt": msvcrt}
+    ):
+        with lock_file(path):
+            assert msvcrt.locking.call_count == 2
+
+    assert msvcrt.locking.call_args.args[1:] == (msvcrt.LK_UNLCK, 1)
+    assert os.path.exists(path)
@@ -1,8 +1,15 @@
+import requests
 import requests_mock
 
+from activity_cache import ActivityCache
 from conftest import FakeLogger
+from constants import ACTIVITY_REQUEST_TIMEOUT
 from flare import FlareAPI
+from pathlib import Path
+from rate_limiter import AdaptiveRateLimiter
 from typing import Any
+from typing import Optional
+from unittest import mock
 
 
 def test_flare_full_data_without_metadata(
@@ -56,6 +63,7 @@ def test_flare_full_data_without_metadata(
         flare_api = FlareAPI(api_key="some_key", tenant_id=111, logger=logger)
 
         events: list[dict] = []
+        next_tokens: list[Optional[str]] = []
         for event, next_token in flare_api.fetch_feed_events(
             next=None,
             start_date=None,
@@ -63,8 +71,11 @@ def test_flare_full_data_without_metadata(
             severities=[],
             source_types=[],
         ):
-            assert next_token == tenant_resp_page_1["next"]
             events.append(event)
+            next_tokens.append(next_token)
+
+        # Only the last event of the page comes with its next token.
+        assert next_tokens == [None, tenant_resp_page_1["next"]]
 
         assert events == tenant_resp_page_1["items"]
         assert not mock_full_event.called
@@ -141,6 +152,7 @@ def test_flare_full_data_with_metadata(
         flare_api = FlareAPI(api_key="some_key", tenant_id=111, logger=logger)
 
         events: list[dict] = []
+        next_tokens: list[Optional[str]] = []
         for event, next_token in flare_api.fetch_feed_events(
             next=None,
             start_date=None,
@@ -148,14 +160,17 @@ def test_flare_full_data_with_metadata(
             severities=[],
             source_types=[],
         ):
-            assert next_token == tenant_resp_page_1["next"]
             events.append(event)
+            next_tokens.append(next_token)
+
+        # Only the last event of the page comes with its next token.
+        assert next_tokens == [None, tenant_resp_page_1["next"]]
 
         for i in range(len(events)):
             assert events[i] == expected_full_event_resp[i]
 
-        assert mock_full_event_1.called
-        assert mock_full_event_2.called
+        assert mock_full_event_1.last_request.timeout == ACTIVITY_REQUEST_TIMEOUT
+        assert mock_full_event_2.last_request.timeout == ACTIVITY_REQUEST_TIMEOUT
 
 
 def test_flare_full_data_retry_errors(
@@ -191,20 +206,341 @@ def test_flare_full_data_retry_errors(
             status_code=500,
         )
 
+        mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/activities/some_uid_2",
+            status_code=200,
+            json={"activity": {"metadata": {"uid": "some_uid_2"}}},
+        )
+
         flare_api = FlareAPI(api_key="some_key", tenant_id=111, logger=logger)
 
-        next(
-            flare_api.fetch_feed_events(
+        with mock.patch(
+            "random.uniform", side_effect=lambda low, high: high
+        ) as uniform:
+            next(
+                flare_api.fetch_feed_events(
+                    next=None,
+                    start_date=None,
+                    ingest_full_event_data=True,
+                    severities=[],
+                    source_types=[],
+                )
+            )
+
+        # No backoff after the last try.
+        assert uniform.call_args_list == [mock.call(0.5, 1.0), mock.call(1.0, 2.0)]
+        assert logger.messages == [
+            "INFO: Failed to fetch event 1/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
+            "INFO: Failed to fetch event 2/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
+            "INFO: Failed to fetch event 3/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
+        ]
+
+
+def test_flare_full_data_keeps_feed_order(
+    logger: FakeLogger,
+    disable_sleep: Any,
+) -> None:
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            status_code=200,
+            json={"token": "access_token"},
+        )
+
+        uids = [f"some_uid_{i}" for i in range(10)]
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/firework/v4/events/tenant/_search",
+            status_code=200,
+            json={
+                "next": None,
+                "items": [{"metadata": {"uid": uid}} for uid in uids],
+            },
+        )
+
+        for uid in uids:
+            mocker.register_uri(
+                "GET",
+                f"https://api.flare.io/firework/v2/activities/{uid}",
+                status_code=500 if uid == "some_uid_3" else 200,
+                json={"activity": {"metadata": {"uid": uid}, "full": True}},
+            )
+
+        flare_api = FlareAPI(
+            api_key="some_key",
+            tenant_id=111,
+            logger=logger,
+            rate_limiter=AdaptiveRateLimiter(rate=1000, capacity=1000, max_rate=1000),
+            max_workers=4,
+        )
+
+        events = [
+            event
+            for event, _ in flare_api.fetch_feed_events(
                 next=None,
                 start_date=None,
                 ingest_full_event_data=True,
                 severities=[],
                 source_types=[],
             )
+        ]
+
+        assert [event["metadata"]["uid"] for event in events] == uids
+        assert [event.get("full", False) for event in events] == [
+            uid != "some_uid_3" for uid in uids
+        ]
+
+
+def test_flare_full_data_throttled_request_is_retried(
+    logger: FakeLogger,
+    disable_sleep: Any,
+) -> None:
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            status_code=200,
+            json={"token": "access_token"},
         )
 
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/firework/v4/events/tenant/_search",
+            status_code=200,
+            json={
+                "next": None,
+                "items": [{"metadata": {"uid": "some_uid_1"}}],
+            },
+        )
+
+        mock_full_event = mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/activities/some_uid_1",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "0"}},
+                {
+                    "status_code": 200,
+                    "json": {"activity": {"metadata": {"uid": "some_uid_1"}}},
+                },
+            ],
+        )
+
+        rate_limiter = AdaptiveRateLimiter(rate=4, capacity=4, increase=0.5)
+        flare_api = FlareAPI(
+            api_key="some_key",
+            tenant_id=111,
+            logger=logger,
+            rate_limiter=rate_limiter,
+        )
+
+        events = [
+            event
+            for event, _ in flare_api.fetch_feed_events(
+                next=None,
+                start_date=None,
+                ingest_full_event_data=True,
+                severities=[],
+                source_types=[],
+            )
+        ]
+
+        assert events == [{"metadata": {"uid": "some_uid_1"}}]
+        assert mock_full_event.call_count == 2
+        assert rate_limiter.throttled_count == 1
+        # +0.5 for the search page, halved by the 429 then +0.5 for the retry.
+        assert rate_limiter.rate == 2.75
         assert logger.messages == [
-            "INFO: Failed to fetch event 1/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
-            "INFO: Failed to fetch event 2/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
-            "INFO: Failed to fetch event 3/3 retries: 500 Server Error: None for url: https://api.flare.io/firework/v2/activities/some_uid_1",
+            "INFO: Throttled on /firework/v2/activities/some_uid_1, lowering the request rate to 2.25/s"
+        ]
+
+
+def test_flare_full_data_uses_activity_cache(
+    logger: FakeLogger,
+    disable_sleep: Any,
+    tmp_path: Path,
+) -> None:
+    activity_cache = ActivityCache(path=str(tmp_path / "activity_cache.db"))
+    activity_cache.set("some_uid_1", {"metadata": {"uid": "some_uid_1"}, "full": True})
+
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            status_code=200,
+            json={"token": "access_token"},
+        )
+
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/firework/v4/events/tenant/_search",
+            status_code=200,
+            json={
+                "next": None,
+                "items": [
+                    {"metadata": {"uid": "some_uid_1"}},
+                    {"metadata": {"uid": "some_uid_2"}},
+                ],
+            },
+        )
+
+        mock_cached_event = mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/activities/some_uid_1",
+            status_code=200,
+            json={"activity": {"metadata": {"uid": "some_uid_1"}, "full": True}},
+        )
+        mock_full_event = mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/activities/some_uid_2",
+            status_code=200,
+            json={"activity": {"metadata": {"uid": "some_uid_2"}, "full": True}},
+        )
+
+        flare_api = FlareAPI(
+            api_key="some_key",
+            tenant_id=111,
+            logger=logger,
+            activity_cache=activity_cache,
+        )
+
+        def fetch_events() -> list[dict]:
+            return [
+                event
+                for event, _ in flare_api.fetch_feed_events(
+                    next=None,
+                    start_date=None,
+                    ingest_full_event_data=True,
+                    severities=[],
+                    source_types=[],
+                )
+            ]
+
+        expected_events = [
+            {"metadata": {"uid": "some_uid_1"}, "full": True},
+            {"metadata": {"uid": "some_uid_2"}, "full": True},
+        ]
+        assert fetch_events() == expected_events
+        assert mock_cached_event.call_count == 0
+        assert mock_full_event.call_count == 1
+
+        # The second run is served by the cache alone.
+        assert fetch_events() == expected_events
+        assert mock_full_event.call_count == 1
+        assert (activity_cache.hits, activity_cache.misses) == (3, 1)
+
+
+def test_flare_clients_share_session_and_tokens(logger: FakeLogger) -> None:
+    with requests_mock.Mocker() as mocker:
+        mock_generate_token = mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            status_code=200,
+            json={"token": "access_token"},
+        )
+        mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/me/tenants",
+            status_code=200,
+            json={},
+        )
+
+        first_api = FlareAPI(api_key="some_key", tenant_id=111, logger=logger)
+        first_api.fetch_tenants()
+        other_tenant_api = FlareAPI(api_key="some_key", tenant_id=222, logger=logger)
+        other_tenant_api.fetch_tenants()
+        assert first_api.flare_client._session is other_tenant_api.flare_client._session
+        assert [request.json() for request in mock_generate_token.request_history] == [
+            {"tenant_id": 111},
+            {"tenant_id": 222},
+        ]
+
+        # The next run reuses the tenant's token.
+        FlareAPI(api_key="some_key", tenant_id=111, logger=logger).fetch_tenants()
+        assert mock_generate_token.call_count == 2
+
+
+def test_flare_client_replaces_revoked_token(logger: FakeLogger) -> None:
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            [
+                {"status_code": 200, "json": {"token": "revoked_token"}},
+                {"status_code": 200, "json": {"token": "access_token"}},
+            ],
+        )
+        mock_tenants = mocker.register_uri(
+            "GET",
+            "https://api.flare.io/firework/v2/me/tenants",
+            [
+                {"status_code": 200, "json": {}},
+                {"status_code": 401, "json": {}},
+                {"status_code": 200, "json": {}},
+            ],
+        )
+
+        FlareAPI(api_key="some_key", tenant_id=111, logger=logger).fetch_tenants()
+        response = FlareAPI(
+            api_key="some_key", tenant_id=111, logger=logger
+        ).fetch_tenants()
+
+        assert response.status_code == 200
+        assert [
+            request.headers["Authorization"] for request in mock_tenants.request_history
+        ] == ["Bearer revoked_token", "Bearer revoked_token", "Bearer access_token"]
+
+
+def test_flare_adaptive_page_size_shrinks_after_timeout(logger: FakeLogger) -> None:
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(
+            "POST",
+            "https://api.flare.io/tokens/generate",
+            status_code=200,
+            json={"token": "access_token"},
+        )
+        mock_search = mocker.register_uri(
+            "POST",
+            "https://api.flare.io/firework/v4/events/tenant/_search",
+            [
+                {"exc": requests.exceptions.ReadTimeout},
+                {
+                    "status_code": 200,
+                    "json": {
+                        "next": "some_next_value",
+                        "items": [
+                            {"metadata": {"uid": f"some_uid_{i}"}} for i in range(50)
+                        ],
+                    },
+                },
+                {"status_code": 200, "json": {"next": None, "items": []}},
+            ],
+        )
+
+        flare_api = FlareAPI(
+            api_key="some_key",
+            tenant_id=111,
+            logger=logger,
+            adaptive_page_size=True,
+        )
+        events = list(
+            flare_api.fetch_feed_events(
+                next=None,
+                start_date=None,
+                ingest_full_event_data=False,
+                severities=[],
+                source_types=[],
+            )
+        )
+
+        assert len(events) == 50
+        # The full page was fast enough to try larger pages.
+        assert [request.json()["size"] for request in mock_search.request_history] == [
+            100,
+            50,
+            100,
+        ]
+        assert logger.messages == [
+            "INFO: Timed out fetching 100 events, retrying with pages of 50"
         ]
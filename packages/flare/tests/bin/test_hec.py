@@ -0,0 +1,235 @@
+import gzip
+import json
+import pytest
+import threading
+
+from checkpoint import Checkpointer
+from constants import OutputMode
+from constants import PasswordKeys
+from constants import Sourcetype
+from data_store import ConfigDataStore
+from hec import HecEventSink
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from ingest_config import HecConfig
+from ingest_config import IngestConfig
+from typing import Any
+from typing import Iterator
+from unittest import mock
+
+
+class FakeHec:
+    """
+    Stand-in for a Splunk HTTP Event Collector, running on a local port.
+    """
+
+    def __init__(self, *, pending_ack_polls: int = 0, use_ack: bool = True) -> None:
+        self.pending_ack_polls = pending_ack_polls
+        self.use_ack = use_ack
+        self.batches: list[list[dict]] = []
+        self.headers: list[dict[str, str]] = []
+        self.ack_polls = 0
+        self._next_ack_id = 0
+
+        fake_hec = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                fake_hec.headers.append(dict(self.headers))
+                if self.path == "/services/collector/event":
+                    response = fake_hec.receive_events(gzip.decompress(body))
+                else:
+                    response = fake_hec.poll_acks(json.loads(body)["acks"])
+
+                content = json.dumps(response).encode("utf8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def receive_events(self, body: bytes) -> dict:
+        self.batches.append([json.loads(line) for line in body.splitlines()])
+        if not self.use_ack:
+            return {"text": "Success", "code": 0}
+        self._next_ack_id += 1
+        return {"text": "Success", "code": 0, "ackId": self._next_ack_id}
+
+    def poll_acks(self, ack_ids: list[int]) -> dict:
+        self.ack_polls += 1
+        acknowledged = self.ack_polls > self.pending_ack_polls
+        return {"acks": {str(ack_id): acknowledged for ack_id in ack_ids}}
+
+    def __enter__(self) -> "FakeHec":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def fake_hec() -> Iterator[FakeHec]:
+    with FakeHec(pending_ack_polls=1) as fake_hec:
+        yield fake_hec
+
+
+def get_hec_config(url: str, *, use_ack: bool = False) -> HecConfig:
+    return HecConfig(
+        url=url,
+        token="some_hec_token",
+        index="flare",
+        use_ack=use_ack,
+        verify_tls=True,
+    )
+
+
+def test_hec_sink_sends_gzip_batches(fake_hec: FakeHec) -> None:
+    sink = HecEventSink(
+        config=get_hec_config(fake_hec.url), max_batch_size=100, max_buffer_age=3600
+    )
+
+    sink.emit({"actor": "this guy"})
+    assert fake_hec.batches == []
+
+    sink.emit({"actor": "some other guy", "data": "x" * 20})
+    sink.emit({"actor": "the last guy"})
+    sink.flush()
+
+    assert [
+        [envelope["event"] for envelope in batch] for batch in fake_hec.batches
+    ] == [
+        [{"actor": "this guy"}, {"actor": "some other guy", "data": "x" * 20}],
+        [{"actor": "the last guy"}],
+    ]
+    assert fake_hec.batches[0][0] == {
+        "event": {"actor": "this guy"},
+        "sourcetype": "flare_json",
+        "source": "flare",
+        "index": "flare",
+    }
+    assert fake_hec.headers[0]["Authorization"] == "Splunk some_hec_token"
+    assert fake_hec.headers[0]["Content-Encoding"] == "gzip"
+    # Every batch goes through the same channel.
+    assert (
+        len({headers["X-Splunk-Request-Channel"] for headers in fake_hec.headers}) == 1
+    )
+    assert fake_hec.ack_polls == 0
+
+
+def test_hec_sink_sets_event_time_for_ndjson(fake_hec: FakeHec) -> None:
+    with HecEventSink(
+        config=get_hec_config(fake_hec.url), sourcetype=Sourcetype.FLARE_NDJSON
+    ) as sink:
+        sink.emit({"metadata": {"estimated_created_at": "2024-03-06T14:00:00.5+00:00"}})
+        sink.emit({"metadata": {"uid": "some_uid_1"}})
+
+    envelopes = fake_hec.batches[0]
+    assert envelopes[0]["sourcetype"] == "flare_ndjson"
+    assert envelopes[0]["time"] == 1709733600.5
+    assert "time" not in envelopes[1]
+
+
+def test_hec_sink_flush_waits_for_acks(fake_hec: FakeHec) -> None:
+    sink = HecEventSink(
+        config=get_hec_config(fake_hec.url, use_ack=True), ack_poll_interval=0
+    )
+
+    sink.emit({"actor": "this guy"})
+    sink.flush()
+
+    assert len(fake_hec.batches) == 1
+    assert fake_hec.ack_polls == 2
+
+    # Nothing is left to acknowledge.
+    sink.flush()
+    assert fake_hec.ack_polls == 2
+
+
+def test_hec_sink_requires_ack_enabled_on_token() -> None:
+    with FakeHec(use_ack=False) as fake_hec:
+        sink = HecEventSink(config=get_hec_config(fake_hec.url, use_ack=True))
+        sink.emit({"actor": "this guy"})
+
+        with pytest.raises(Exception, match="enable indexer acknowledgement"):
+            sink.flush()
+
+
+def test_checkpoint_does_not_advance_without_ack(data_store: ConfigDataStore) -> None:
+    with FakeHec(pending_ack_polls=1000) as fake_hec:
+        sink = HecEventSink(
+            config=get_hec_config(fake_hec.url, use_ack=True),
+            ack_timeout=0.05,
+            ack_poll_interval=0.01,
+        )
+        checkpointer = Checkpointer(data_store=data_store, emitter=sink)
+
+        sink.emit({"actor": "this guy"})
+        checkpointer.set_next_by_tenant(11111, "some_next_token")
+
+        with mock.patch.object(data_store, "_commit") as mock_commit:
+            with pytest.raises(Exception, match="Timed out waiting for HEC"):
+                checkpointer.flush()
+
+        mock_commit.assert_not_called()
+        assert data_store.get_next_by_tenant(11111) is None
+
+
+def test_ingest_config_hec_output_mode() -> None:
+    values = {
+        PasswordKeys.API_KEY.value: "some_api_key",
+        PasswordKeys.TENANT_IDS.value: "[11111]",
+        PasswordKeys.OUTPUT_MODE.value: "hec",
+        PasswordKeys.HEC_URL.value: "https://splunk:8088/",
+        PasswordKeys.HEC_TOKEN.value: "some_hec_token",
+        PasswordKeys.HEC_USE_ACK.value: "true",
+    }
+
+    config = IngestConfig.from_values(values)
+    assert config.output_mode == OutputMode.HEC
+    assert config.hec_config == HecConfig(
+        url="https://splunk:8088",
+        token="some_hec_token",
+        index=None,
+        use_ack=True,
+        verify_tls=True,
+    )
+
+    assert config.sourcetype == Sourcetype.FLARE_JSON
+    assert (
+        IngestConfig.from_values(
+            {**values, PasswordKeys.SOURCETYPE.value: "flare_ndjson"}
+        ).sourcetype
+        == Sourcetype.FLARE_NDJSON
+    )
+
+    with pytest.raises(Exception, match="HEC token not found"):
+        IngestConfig.from_values(
+            {
+                key: value
+                for key, value in values.items()
+                if key != PasswordKeys.HEC_TOKEN.value
+            }
+        )
+
+    with pytest.raises(Exception, match="Output mode kafka not supported"):
+        IngestConfig.from_values({**values, PasswordKeys.OUTPUT_MODE.value: "kafka"})
+
+    with pytest.raises(Exception, match="Sourcetype only applies to the HEC output"):
+        IngestConfig.from_values(
+            {
+                **values,
+                PasswordKeys.OUTPUT_MODE.value: "stdout",
+                PasswordKeys.SOURCETYPE.value: "flare_ndjson",
+            }
+        )
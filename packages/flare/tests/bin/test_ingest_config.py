@@ -0,0 +1,257 @@
+import pytest
+
+from conftest import FakeStoragePasswords
+from constants import DataStoreBackend
+from constants import PasswordKeys
+from ingest_config import IngestConfig
+from ingest_config import IngestConfigLoader
+from ingest_config import get_storage_password_values
+from ingest_config import parse_api_key
+from ingest_config import parse_data_store_backend
+from ingest_config import parse_full_event_max_workers
+from ingest_config import parse_full_event_requests_per_second
+from ingest_config import parse_ingest_full_event_data
+from ingest_config import parse_page_size
+from ingest_config import parse_tenant_concurrency
+from ingest_config import parse_tenant_ids
+from unittest import mock
+
+
+@pytest.mark.parametrize("storage_passwords", [[]], indirect=True)
+def test_get_api_key_expect_exception(storage_passwords: FakeStoragePasswords) -> None:
+    with pytest.raises(Exception, match="API key not found"):
+        parse_api_key(get_storage_password_values(storage_passwords))
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [[(PasswordKeys.API_KEY.value, "some_api_key")]],
+    indirect=True,
+)
+def test_tenant_id_expect_exception(storage_passwords: FakeStoragePasswords) -> None:
+    with pytest.raises(Exception, match="Tenant IDs not found"):
+        parse_tenant_ids(get_storage_password_values(storage_passwords))
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111,22222]"),
+        ],
+    ],
+    indirect=True,
+)
+def test_get_api_credentials_expect_api_key_and_tenant_id(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    assert (
+        parse_api_key(get_storage_password_values(storage_passwords)) == "some_api_key"
+    )
+    assert parse_tenant_ids(get_storage_password_values(storage_passwords)) == [
+        11111,
+        22222,
+    ]
+
+
+def test_get_default_ingest_full_event_data_value(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    assert (
+        parse_ingest_full_event_data(get_storage_password_values(storage_passwords))
+        is False
+    )
+
+
+def test_get_default_full_event_rate_limit_values(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    assert (
+        parse_full_event_requests_per_second(
+            get_storage_password_values(storage_passwords)
+        )
+        == 5
+    )
+    assert (
+        parse_full_event_max_workers(get_storage_password_values(storage_passwords))
+        == 4
+    )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value, "12.5"),
+            (PasswordKeys.FULL_EVENT_MAX_WORKERS.value, "8"),
+        ]
+    ],
+    indirect=True,
+)
+def test_get_full_event_rate_limit_values(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    assert (
+        parse_full_event_requests_per_second(
+            get_storage_password_values(storage_passwords)
+        )
+        == 12.5
+    )
+    assert (
+        parse_full_event_max_workers(get_storage_password_values(storage_passwords))
+        == 8
+    )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [(PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value, "0")],
+        [(PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value, "0.1")],
+        [(PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value, "100")],
+    ],
+    indirect=True,
+)
+def test_get_full_event_requests_per_second_expect_exception(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    with pytest.raises(
+        Exception,
+        match="Full event requests per second must be between 0.2 and 25.0",
+    ):
+        parse_full_event_requests_per_second(
+            get_storage_password_values(storage_passwords)
+        )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [[(PasswordKeys.TENANT_CONCURRENCY.value, "0")]],
+    indirect=True,
+)
+def test_get_tenant_concurrency_expect_exception(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    with pytest.raises(Exception, match="Tenant concurrency must be at least 1"):
+        parse_tenant_concurrency(get_storage_password_values(storage_passwords))
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111,22222]"),
+            (PasswordKeys.INGEST_FULL_EVENT_DATA.value, "true"),
+            (PasswordKeys.SEVERITIES_FILTER.value, "low,high"),
+            (PasswordKeys.NUMBER_OF_DAYS_TO_BACKFILL.value, "7"),
+            ("some_other_app_key", "some_other_value"),
+        ]
+    ],
+    indirect=True,
+)
+def test_load_ingest_config_lists_passwords_once(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    with mock.patch.object(
+        storage_passwords, "list", wraps=storage_passwords.list
+    ) as list_passwords:
+        config = IngestConfig.load(storage_passwords=storage_passwords)
+        list_passwords.assert_called_once()
+
+    assert config == IngestConfig(
+        api_key="some_api_key",
+        tenant_ids=[11111, 22222],
+        ingest_full_event_data=True,
+        number_of_days_to_backfill=7,
+        severities_filter=["low", "high"],
+        source_types_filter=[],
+        full_event_requests_per_second=5,
+        full_event_max_workers=4,
+        tenant_concurrency=4,
+    )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+        ]
+    ],
+    indirect=True,
+)
+def test_ingest_config_loader_reparses_only_on_change(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    loader = IngestConfigLoader(reload_interval=0)
+    config = loader.load(storage_passwords=storage_passwords)
+    assert loader.load(storage_passwords=storage_passwords) is config
+
+    storage_passwords._passwords[1]._state["clear_password"] = "[11111,22222]"
+    reloaded_config = loader.load(storage_passwords=storage_passwords)
+    assert reloaded_config is not config
+    assert reloaded_config.tenant_ids == [11111, 22222]
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+        ]
+    ],
+    indirect=True,
+)
+def test_ingest_config_loader_lists_passwords_once_per_interval(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    loader = IngestConfigLoader(reload_interval=300)
+    with mock.patch.object(
+        storage_passwords, "list", wraps=storage_passwords.list
+    ) as list_passwords, mock.patch("time.monotonic", return_value=1000.0):
+        config = loader.load(storage_passwords=storage_passwords)
+        assert loader.load(storage_passwords=storage_passwords) is config
+        list_passwords.assert_called_once()
+
+    with mock.patch.object(
+        storage_passwords, "list", wraps=storage_passwords.list
+    ) as list_passwords, mock.patch("time.monotonic", return_value=1300.0):
+        loader.load(storage_passwords=storage_passwords)
+        list_passwords.assert_called_once()
+
+
+def test_page_size() -> None:
+    values = {
+        PasswordKeys.API_KEY.value: "some_api_key",
+        PasswordKeys.TENANT_IDS.value: "[11111]",
+    }
+
+    config = IngestConfig.from_values(values)
+    assert (config.page_size, config.adaptive_page_size) == (None, False)
+
+    config = IngestConfig.from_values({**values, PasswordKeys.PAGE_SIZE.value: "200"})
+    assert (config.page_size, config.adaptive_page_size) == (200, False)
+
+    config = IngestConfig.from_values({**values, PasswordKeys.PAGE_SIZE.value: "auto"})
+    assert (config.page_size, config.adaptive_page_size) == (None, True)
+
+    with pytest.raises(Exception, match="Page size not a number"):
+        parse_page_size({PasswordKeys.PAGE_SIZE.value: "lots"})
+
+    with pytest.raises(Exception, match="Page size must be between 1 and 1000"):
+        parse_page_size({PasswordKeys.PAGE_SIZE.value: "0"})
+
+
+def test_data_store_backend() -> None:
+    assert parse_data_store_backend({}) == DataStoreBackend.CONFIG
+    assert (
+        parse_data_store_backend({PasswordKeys.DATA_STORE_BACKEND.value: "sqlite"})
+        == DataStoreBackend.SQLITE
+    )
+
+    with pytest.raises(Exception, match="Data store backend redis not supported"):
+        parse_data_store_backend({PasswordKeys.DATA_STORE_BACKEND.value: "redis"})
@@ -1,57 +1,40 @@
+import cron_job_ingest_events
+import data_store as data_store_module
 import datetime
+import flare
+import io
+import json
+import logger as logger_module
+import os
 import pytest
+import runpy
+import threading
 
+from activity_cache import ActivityCache
 from conftest import FakeFlareAPI
 from conftest import FakeLogger
 from conftest import FakeStoragePasswords
-from constants import CRON_JOB_THRESHOLD_SINCE_LAST_FETCH
+from constants import APP_NAME
 from constants import PasswordKeys
+from cron_job_ingest_events import create_rate_limiter
 from cron_job_ingest_events import fetch_feed
-from cron_job_ingest_events import get_api_key
-from cron_job_ingest_events import get_ingest_full_event_data
-from cron_job_ingest_events import get_tenant_ids
+from cron_job_ingest_events import ingest_events
 from cron_job_ingest_events import main
+from cron_job_ingest_events import run_daemon
 from data_store import ConfigDataStore
+from files import get_state_directory
 from freezegun import freeze_time
-
-
-@pytest.mark.parametrize("storage_passwords", [[]], indirect=True)
-def test_get_api_key_expect_exception(storage_passwords: FakeStoragePasswords) -> None:
-    with pytest.raises(Exception, match="API key not found"):
-        get_api_key(storage_passwords=storage_passwords)
-
-
-@pytest.mark.parametrize(
-    "storage_passwords",
-    [[(PasswordKeys.API_KEY.value, "some_api_key")]],
-    indirect=True,
-)
-def test_tenant_id_expect_exception(storage_passwords: FakeStoragePasswords) -> None:
-    with pytest.raises(Exception, match="Tenant IDs not found"):
-        get_tenant_ids(storage_passwords=storage_passwords)
-
-
-@pytest.mark.parametrize(
-    "storage_passwords",
-    [
-        [
-            (PasswordKeys.API_KEY.value, "some_api_key"),
-            (PasswordKeys.TENANT_IDS.value, "[11111,22222]"),
-        ],
-    ],
-    indirect=True,
-)
-def test_get_api_credentials_expect_api_key_and_tenant_id(
-    storage_passwords: FakeStoragePasswords,
-) -> None:
-    assert get_api_key(storage_passwords=storage_passwords) == "some_api_key"
-    assert get_tenant_ids(storage_passwords=storage_passwords) == [11111, 22222]
-
-
-def test_get_default_ingest_full_event_data_value(
-    storage_passwords: FakeStoragePasswords,
-) -> None:
-    assert get_ingest_full_event_data(storage_passwords=storage_passwords) is False
+from ingest_config import IngestConfig
+from ingestion_status import read_ingestion_status
+from logger import Logger
+from metrics import Metrics
+from pathlib import Path
+from rate_limiter import AdaptiveRateLimiter
+from spool import Spool
+from types import SimpleNamespace
+from typing import Iterator
+from typing import Optional
+from unittest import mock
 
 
 def test_fetch_feed_expect_feed_response(
@@ -97,8 +80,8 @@ def test_main_expect_early_return(
     storage_passwords: FakeStoragePasswords,
     data_store: ConfigDataStore,
 ) -> None:
-    data_store.set_last_fetch(
-        datetime.datetime.fromisoformat("2000-01-01T12:00:00+00:00")
+    data_store.try_acquire_lease(
+        "tenant_11111", "some_other_process", datetime.timedelta(minutes=2)
     )
 
     main(
@@ -108,7 +91,8 @@ def test_main_expect_early_return(
         data_store=data_store,
     )
     assert logger.messages == [
-        f"INFO: Fetched events less than {int(CRON_JOB_THRESHOLD_SINCE_LAST_FETCH.seconds / 60)} minutes ago, exiting"
+        "INFO: Tenant 11111 is being ingested by another process, skipping",
+        "INFO: Every tenant is being ingested by another process, exiting",
     ]
 
 
@@ -118,6 +102,59 @@ def test_main_expect_early_return(
         [
             (PasswordKeys.API_KEY.value, "some_api_key"),
             (PasswordKeys.TENANT_IDS.value, "[11111,22222]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_skips_leased_tenants(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+) -> None:
+    with freeze_time("2000-01-01 12:00:00"):
+        data_store.try_acquire_lease(
+            "tenant_11111", "some_other_process", datetime.timedelta(minutes=2)
+        )
+        data_store.try_acquire_lease(
+            "tenant_22222", "some_stale_process", datetime.timedelta(minutes=2)
+        )
+
+    with freeze_time("2000-01-01 12:01:00"):
+        # The second lease expires, as if its holder stopped its heartbeat.
+        data_store.try_acquire_lease(
+            "tenant_11111", "some_other_process", datetime.timedelta(minutes=2)
+        )
+
+    with freeze_time("2000-01-01 12:02:30"):
+        main(
+            logger=logger,
+            storage_passwords=storage_passwords,
+            flare_api_cls=FakeFlareAPI,
+            data_store=data_store,
+        )
+
+    assert "INFO: Tenant 11111 is being ingested by another process, skipping" in (
+        logger.messages
+    )
+    assert data_store.get_next_by_tenant(11111) is None
+    assert data_store.get_next_by_tenant(22222) == "second_next_token"
+    # Leases are given back at the end of the run.
+    lease = data_store.get_lease("tenant_22222")
+    assert lease is not None
+    assert lease[1] == datetime.datetime(
+        2000, 1, 1, 12, 2, 30, tzinfo=datetime.timezone.utc
+    )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111,22222]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+            (PasswordKeys.TENANT_CONCURRENCY.value, "1"),
         ]
     ],
     indirect=True,
@@ -141,3 +178,548 @@ def test_main_expect_normal_run(
         "INFO: Fetched 2 events on tenant 22222",
         "INFO: Fetched 4 events across all tenants",
     ]
+    assert data_store.get_next_by_tenant(11111) == "second_next_token"
+    assert data_store.get_next_by_tenant(22222) == "second_next_token"
+
+    # The data store fixture mocks `open`.
+    records = [
+        json.loads(line)
+        for line in (Path(get_state_directory()) / "flare_metrics.log")
+        .read_text()
+        .splitlines()
+    ]
+    assert [record.get("tenant_id") for record in records] == [None, 11111, 22222]
+    assert records[0]["flare.run.count"] == 1
+    for record in records[1:]:
+        assert record["flare.events_fetched"] == 2
+        assert record["flare.events_emitted"] == 2
+        assert record["flare.emit.count"] >= 1
+
+    status = read_ingestion_status()
+    assert status is not None
+    assert status["last_fetched_at"] == "2000-01-01T00:00:00+00:00"
+    assert status["rate_limit"]["throttled_count"] == 0
+    for tenant_id in ["11111", "22222"]:
+        assert status["tenants"][tenant_id]["last_checkpoint_at"] == (
+            "2000-01-01T00:00:00+00:00"
+        )
+        assert status["tenants"][tenant_id]["events_emitted"] == 2
+        assert status["tenants"][tenant_id]["errors"] == 0
+        assert status["tenants"][tenant_id]["caught_up"]
+
+
+class ConcurrentFakeFlareAPI(FakeFlareAPI):
+    # Every tenant waits for the others, which only works if they run concurrently.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def __init__(
+        self,
+        api_key: str,
+        tenant_id: int,
+        logger: Logger,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        max_workers: int = 1,
+        activity_cache: Optional[ActivityCache] = None,
+        page_size: Optional[int] = None,
+        adaptive_page_size: bool = False,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.tenant_id = tenant_id
+
+    def fetch_feed_events(
+        self,
+        next: Optional[str],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        ingest_full_event_data: bool,
+        severities: list[str],
+        source_types: list[str],
+    ) -> Iterator[tuple[dict, Optional[str]]]:
+        yield ({"actor": f"first of {self.tenant_id}"}, f"first_{self.tenant_id}")
+        self.barrier.wait()
+        yield ({"actor": f"second of {self.tenant_id}"}, f"second_{self.tenant_id}")
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111,22222,33333]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+            (PasswordKeys.TENANT_CONCURRENCY.value, "3"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_fetches_tenants_concurrently(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    main(
+        logger=logger,
+        storage_passwords=storage_passwords,
+        flare_api_cls=ConcurrentFakeFlareAPI,
+        data_store=data_store,
+    )
+
+    emitted = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(emitted) == 6
+    for tenant_id in [11111, 22222, 33333]:
+        assert [
+            event["actor"] for event in emitted if event["tenant_id"] == tenant_id
+        ] == [
+            f"first of {tenant_id}",
+            f"second of {tenant_id}",
+        ]
+        assert data_store.get_next_by_tenant(tenant_id) == f"second_{tenant_id}"
+
+    assert logger.messages[-1] == "INFO: Fetched 6 events across all tenants"
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.FULL_EVENT_REQUESTS_PER_SECOND.value, "0.5"),
+        ]
+    ],
+    indirect=True,
+)
+def test_create_rate_limiter_below_one_request_per_second(
+    storage_passwords: FakeStoragePasswords,
+) -> None:
+    rate_limiter = create_rate_limiter(
+        IngestConfig.load(storage_passwords=storage_passwords)
+    )
+
+    assert rate_limiter.rate == 0.5
+    assert rate_limiter.acquire() == 0
+
+
+class OnePageFakeFlareAPI(FakeFlareAPI):
+    # Only the first run has events, the following ones resume from the last page.
+    def fetch_feed_events(
+        self,
+        next: Optional[str],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        ingest_full_event_data: bool,
+        severities: list[str],
+        source_types: list[str],
+    ) -> list[tuple[dict, Optional[str]]]:
+        if next:
+            return []
+        return super().fetch_feed_events(
+            next=next,
+            start_date=start_date,
+            end_date=end_date,
+            ingest_full_event_data=ingest_full_event_data,
+            severities=severities,
+            source_types=source_types,
+        )
+
+
+class CountdownEvent(threading.Event):
+    # Sets itself after a number of idle waits, standing in for SIGTERM.
+    def __init__(self, idle_waits: int) -> None:
+        super().__init__()
+        self.idle_waits = idle_waits
+        self.timeouts: list[Optional[float]] = []
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self.timeouts.append(timeout)
+        if len(self.timeouts) >= self.idle_waits:
+            self.set()
+        return self.is_set()
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+            (PasswordKeys.DAEMON_IDLE_BACKOFF.value, "5"),
+        ]
+    ],
+    indirect=True,
+)
+def test_run_daemon_backs_off_when_idle(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    shutdown_event = CountdownEvent(idle_waits=5)
+    run_daemon(
+        logger=logger,
+        storage_passwords=storage_passwords,
+        flare_api_cls=OnePageFakeFlareAPI,
+        data_store=data_store,
+        shutdown_event=shutdown_event,
+    )
+
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert data_store.get_next_by_tenant(11111) == "second_next_token"
+    assert shutdown_event.timeouts == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert logger.messages[0] == "INFO: Starting the ingestion daemon"
+    assert logger.messages[-1] == "INFO: Stopped the ingestion daemon"
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_run_daemon_profiles_every_run(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+) -> None:
+    with mock.patch.dict(os.environ, {"FLARE_PROFILE": "true"}):
+        run_daemon(
+            logger=logger,
+            storage_passwords=storage_passwords,
+            flare_api_cls=OnePageFakeFlareAPI,
+            data_store=data_store,
+            shutdown_event=CountdownEvent(idle_waits=2),
+        )
+
+    # One artifact per run, each written as soon as its run is over.
+    paths = {
+        message.split("saved to ", 1)[1].split(".folded", 1)[0]
+        for message in logger.messages
+        if message.startswith("INFO: Profiled ")
+    }
+    assert len(paths) == 3
+    assert all(
+        path.startswith(os.path.join(get_state_directory(), "profiles"))
+        for path in paths
+    )
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+@freeze_time("2000-01-01")
+def test_ingest_events_checkpoints_on_shutdown(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    config = IngestConfig.load(storage_passwords=storage_passwords)
+    shutdown_event = threading.Event()
+    shutdown_event.set()
+
+    events_fetched_count = ingest_events(
+        logger=logger,
+        config=config,
+        flare_api_cls=FakeFlareAPI,
+        data_store=data_store,
+        rate_limiter=create_rate_limiter(config),
+        shutdown_event=shutdown_event,
+    )
+
+    assert events_fetched_count == 0
+    assert capsys.readouterr().out == ""
+    assert "INFO: Shutting down, stopping the ingestion" in logger.messages
+    assert data_store.get_last_fetch() == datetime.datetime(
+        2000, 1, 1, tzinfo=datetime.timezone.utc
+    )
+    assert data_store.get_next_by_tenant(11111) is None
+
+
+class FailingMidPageFakeFlareAPI(FakeFlareAPI):
+    # Fails right after the first event of the second page.
+    def fetch_feed_events(
+        self,
+        next: Optional[str],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        ingest_full_event_data: bool,
+        severities: list[str],
+        source_types: list[str],
+    ) -> Iterator[tuple[dict, Optional[str]]]:
+        yield ({"actor": "first guy"}, None)
+        yield ({"actor": "second guy"}, "second_page_token")
+        yield ({"actor": "third guy"}, None)
+        raise Exception("Server error")
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_resumes_from_the_start_of_a_failed_page(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+) -> None:
+    main(
+        logger=logger,
+        storage_passwords=storage_passwords,
+        flare_api_cls=FailingMidPageFakeFlareAPI,
+        data_store=data_store,
+    )
+
+    # The rest of the second page was never fetched.
+    assert data_store.get_next_by_tenant(11111) == "second_page_token"
+    assert "ERROR: Exception=Server error" in logger.messages
+    status = read_ingestion_status()
+    assert status is not None
+    assert not status["tenants"]["11111"]["caught_up"]
+
+
+class SlicedFakeFlareAPI(FakeFlareAPI):
+    # Serves one page per backfill slice and fails the slice starting at noon
+    # partway through its second page.
+    requests: list[tuple[Optional[str], Optional[datetime.datetime]]] = []
+
+    def fetch_feed_events(
+        self,
+        next: Optional[str],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        ingest_full_event_data: bool,
+        severities: list[str],
+        source_types: list[str],
+    ) -> Iterator[tuple[dict, Optional[str]]]:
+        self.requests.append((next, end_date))
+        assert start_date
+        if end_date is None:
+            yield ({"actor": "live guy"}, "live_next_token")
+            return
+
+        yield ({"actor": f"guy of {start_date.hour}"}, f"next_{start_date.hour}")
+        if start_date.hour == 12 and not next:
+            yield ({"actor": "second guy of 12"}, None)
+            raise Exception("Server error")
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.NUMBER_OF_DAYS_TO_BACKFILL.value, "1"),
+            (PasswordKeys.BACKFILL_SLICES.value, "4"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_backfills_new_tenant_in_slices(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    with freeze_time("2000-01-02 00:00:00"):
+        main(
+            logger=logger,
+            storage_passwords=storage_passwords,
+            flare_api_cls=SlicedFakeFlareAPI,
+            data_store=data_store,
+        )
+
+    assert sorted(
+        json.loads(line)["actor"] for line in capsys.readouterr().out.splitlines()
+    ) == ["guy of 0", "guy of 12", "guy of 18", "guy of 6", "second guy of 12"]
+    plan = data_store.get_backfill_plan(11111)
+    assert plan is not None
+    assert plan.end == datetime.datetime(2000, 1, 2, tzinfo=datetime.timezone.utc)
+    assert [s.done for s in plan.slices] == [True, True, False, True]
+    assert plan.progress == 75.0
+    assert plan.slices[2].next == "next_12"
+    assert data_store.get_next_by_tenant(11111) is None
+
+    # The failed slice resumes from its checkpoint, then the live cursor
+    # takes over from the end of the backfill.
+    for _ in range(2):
+        with freeze_time("2000-01-02 00:30:00"):
+            main(
+                logger=logger,
+                storage_passwords=storage_passwords,
+                flare_api_cls=SlicedFakeFlareAPI,
+                data_store=data_store,
+            )
+
+    plan = data_store.get_backfill_plan(11111)
+    assert plan is not None and plan.done
+    assert SlicedFakeFlareAPI.requests[-2:] == [
+        ("next_12", plan.slices[2].end),
+        (None, None),
+    ]
+    assert data_store.get_next_by_tenant(11111) == "live_next_token"
+    assert (
+        "INFO: Fetching tenant_id=11111, next=None, start_date=FakeDatetime(2000, 1, 2, 0, 0, tzinfo=datetime.timezone.utc)"
+        in logger.messages
+    )
+
+
+class ReplayingFakeFlareAPI(FakeFlareAPI):
+    # Replays the same page on every run, as after a crash in the middle of it.
+    def fetch_feed_events(
+        self,
+        next: Optional[str],
+        start_date: Optional[datetime.datetime],
+        end_date: Optional[datetime.datetime],
+        ingest_full_event_data: bool,
+        severities: list[str],
+        source_types: list[str],
+    ) -> list[tuple[dict, Optional[str]]]:
+        return [
+            ({"metadata": {"uid": "some_uid_1"}}, None),
+            ({"metadata": {"uid": "some_uid_2"}}, "first_next_token"),
+        ]
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_suppresses_duplicate_events(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # The dedup index is read back from disk, which the data store fixture mocks.
+    for _ in range(2):
+        main(
+            logger=logger,
+            storage_passwords=storage_passwords,
+            flare_api_cls=ReplayingFakeFlareAPI,
+            data_store=ConfigDataStore(path=str(tmp_path / "data_store.conf")),
+        )
+
+    assert [
+        json.loads(line)["metadata"]["uid"]
+        for line in capsys.readouterr().out.splitlines()
+    ] == ["some_uid_1", "some_uid_2"]
+    assert logger.messages[-2:] == [
+        "INFO: Fetched 2 events across all tenants",
+        "INFO: Suppressed 2 duplicate events",
+    ]
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_main_emits_events_spooled_by_previous_run(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # A previous run crashed after spooling two events but emitting only one.
+    with Spool(
+        path=os.path.join(get_state_directory(), "spool", "11111")
+    ) as tenant_spool:
+        tenant_spool.emit({"metadata": {"uid": "some_uid_1"}, "tenant_id": 11111})
+        tenant_spool.flush()
+        data_store.set_spool_offset(11111, tenant_spool.end)
+        tenant_spool.emit({"metadata": {"uid": "some_uid_2"}, "tenant_id": 11111})
+    spool_end = tenant_spool.end
+    data_store.set_next_by_tenant(11111, "first_next_token")
+
+    main(
+        logger=logger,
+        storage_passwords=storage_passwords,
+        flare_api_cls=OnePageFakeFlareAPI,
+        data_store=data_store,
+    )
+
+    assert [
+        json.loads(line)["metadata"]["uid"]
+        for line in capsys.readouterr().out.splitlines()
+    ] == ["some_uid_2"]
+    assert (
+        "INFO: Emitting the events spooled for tenant 11111 by a previous run"
+        in logger.messages
+    )
+    assert data_store.get_spool_offset(11111) == spool_end
+
+
+@pytest.mark.parametrize(
+    "storage_passwords",
+    [
+        [
+            (PasswordKeys.API_KEY.value, "some_api_key"),
+            (PasswordKeys.TENANT_IDS.value, "[11111]"),
+            (PasswordKeys.BACKFILL_SLICES.value, "1"),
+        ]
+    ],
+    indirect=True,
+)
+def test_scripted_input_entry_point(
+    logger: FakeLogger,
+    storage_passwords: FakeStoragePasswords,
+    data_store: ConfigDataStore,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # Runs the script like splunkd does, with the session token on stdin.
+    splunk_service = SimpleNamespace(
+        apps={
+            APP_NAME: SimpleNamespace(
+                service=SimpleNamespace(storage_passwords=storage_passwords)
+            )
+        }
+    )
+    with mock.patch(
+        "vendor.splunklib.client.connect", return_value=splunk_service
+    ) as connect, mock.patch.object(
+        data_store_module, "get_data_store", return_value=data_store
+    ), mock.patch.object(
+        logger_module, "Logger", return_value=logger
+    ), mock.patch.object(flare, "FlareAPI", FakeFlareAPI), mock.patch(
+        "sys.stdin", io.StringIO("some_token\n")
+    ), mock.patch("sys.argv", [cron_job_ingest_events.__file__]):
+        runpy.run_path(cron_job_ingest_events.__file__, run_name="__main__")
+
+    assert connect.call_args.kwargs["token"] == "some_token"
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert data_store.get_next_by_tenant(11111) == "second_next_token"
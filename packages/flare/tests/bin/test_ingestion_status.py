@@ -0,0 +1,66 @@
+from files import get_state_directory
+from freezegun import freeze_time
+from ingestion_status import get_ingestion_status
+from ingestion_status import read_ingestion_status
+from ingestion_status import write_ingestion_status
+from pathlib import Path
+
+
+def test_write_keeps_previous_tenants() -> None:
+    assert read_ingestion_status() is None
+
+    write_ingestion_status(
+        {
+            "last_fetched_at": "2000-01-01T00:00:00+00:00",
+            "tenants": {
+                "11111": {"newest_materialized_at": "1999-12-31T00:00:00+00:00"},
+                "22222": {"newest_materialized_at": "1999-12-30T00:00:00+00:00"},
+            },
+        }
+    )
+    # Nothing new was ingested for the first tenant and the second one was
+    # ingested by another process.
+    write_ingestion_status(
+        {
+            "last_fetched_at": "2000-01-02T00:00:00+00:00",
+            "tenants": {"11111": {"newest_materialized_at": None, "errors": 1}},
+        }
+    )
+
+    assert read_ingestion_status() == {
+        "last_fetched_at": "2000-01-02T00:00:00+00:00",
+        "tenants": {
+            "11111": {
+                "newest_materialized_at": "1999-12-31T00:00:00+00:00",
+                "errors": 1,
+            },
+            "22222": {"newest_materialized_at": "1999-12-30T00:00:00+00:00"},
+        },
+    }
+    # Kept with the ingestion's state, away from the app's configuration.
+    assert (Path(get_state_directory()) / "ingestion_status.json").exists()
+
+
+@freeze_time("2000-01-01 00:01:00")
+def test_backlog() -> None:
+    assert get_ingestion_status() is None
+
+    write_ingestion_status(
+        {
+            "tenants": {
+                "11111": {"newest_materialized_at": "2000-01-01T00:00:00Z"},
+                "22222": {"newest_materialized_at": None},
+                # Idle since its last event, an hour ago.
+                "33333": {
+                    "newest_materialized_at": "1999-12-31T23:01:00Z",
+                    "caught_up": True,
+                },
+            },
+        }
+    )
+
+    status = get_ingestion_status()
+    assert status is not None
+    assert status["tenants"]["11111"]["backlog_seconds"] == 60.0
+    assert status["tenants"]["22222"]["backlog_seconds"] is None
+    assert status["tenants"]["33333"]["backlog_seconds"] == 0.0
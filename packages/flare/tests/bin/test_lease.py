@@ -0,0 +1,81 @@
+from conftest import FakeLogger
+from data_store import ConfigDataStore
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from freezegun import freeze_time
+from lease import LeaseKeeper
+
+
+def test_lease_is_exclusive_until_expired(data_store: ConfigDataStore) -> None:
+    ttl = timedelta(minutes=2)
+    with freeze_time("2024-03-06 14:00:00"):
+        assert data_store.try_acquire_lease("tenant_111", "first", ttl)
+        assert not data_store.try_acquire_lease("tenant_111", "second", ttl)
+        assert data_store.try_acquire_lease("tenant_222", "second", ttl)
+
+    with freeze_time("2024-03-06 14:01:00"):
+        # Renewing pushes the expiry back.
+        assert data_store.try_acquire_lease("tenant_111", "first", ttl)
+
+    with freeze_time("2024-03-06 14:02:30"):
+        assert not data_store.try_acquire_lease("tenant_111", "second", ttl)
+
+    with freeze_time("2024-03-06 14:03:00"):
+        assert data_store.try_acquire_lease("tenant_111", "second", ttl)
+        assert data_store.get_lease("tenant_111") == (
+            "second",
+            datetime(2024, 3, 6, 14, 5, tzinfo=timezone.utc),
+        )
+
+
+def test_release_lease_only_by_owner(data_store: ConfigDataStore) -> None:
+    ttl = timedelta(minutes=2)
+    with freeze_time("2024-03-06 14:00:00"):
+        data_store.try_acquire_lease("tenant_111", "first", ttl)
+        data_store.release_lease("tenant_111", "second")
+        assert not data_store.try_acquire_lease("tenant_111", "second", ttl)
+
+        data_store.release_lease("tenant_111", "first")
+        assert data_store.try_acquire_lease("tenant_111", "second", ttl)
+
+
+def test_lease_keeper_heartbeat_and_release(
+    logger: FakeLogger, data_store: ConfigDataStore
+) -> None:
+    with freeze_time("2024-03-06 14:00:00") as frozen_time:
+        with LeaseKeeper(
+            data_store=data_store, logger=logger, owner="first", heartbeat_interval=3600
+        ) as lease_keeper:
+            assert lease_keeper.acquire("tenant_111")
+
+            frozen_time.tick(timedelta(minutes=1))
+            lease_keeper.renew()
+            assert lease_keeper.is_held("tenant_111")
+            lease = data_store.get_lease("tenant_111")
+            assert lease and lease[1] == datetime(
+                2024, 3, 6, 14, 3, tzinfo=timezone.utc
+            )
+
+        assert not lease_keeper.is_held("tenant_111")
+        assert data_store.try_acquire_lease("tenant_111", "second", timedelta(1))
+
+
+def test_lease_keeper_drops_lost_lease(
+    logger: FakeLogger, data_store: ConfigDataStore
+) -> None:
+    with freeze_time("2024-03-06 14:00:00") as frozen_time:
+        lease_keeper = LeaseKeeper(data_store=data_store, logger=logger, owner="first")
+        assert lease_keeper.acquire("tenant_111")
+
+        # The heartbeat stalled for longer than the lease.
+        frozen_time.tick(timedelta(minutes=5))
+        assert data_store.try_acquire_lease(
+            "tenant_111", "second", timedelta(minutes=2)
+        )
+
+        lease_keeper.renew()
+        assert not lease_keeper.is_held("tenant_111")
+        assert logger.messages == [
+            "ERROR: Lost the lease tenant_111 to another process"
+        ]
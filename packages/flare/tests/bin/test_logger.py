@@ -0,0 +1,58 @@
+import logging
+
+from constants import APP_NAME
+from logger import Logger
+from logger import format_fields
+from logger import format_message
+from typing import Any
+from unittest import mock
+
+
+def test_handlers_are_installed_once() -> None:
+    for _ in range(3):
+        Logger(class_name="some_handler.py").info("Some message")
+
+    assert len(logging.getLogger(APP_NAME).handlers) == 1
+    assert not logging.getLogger(f"{APP_NAME}.some_handler").handlers
+
+
+def test_format_message() -> None:
+    assert format_message("Fetched %d events", (12,), {}) == "Fetched 12 events"
+    assert format_message("100% done", (), {}) == "100% done"
+    assert (
+        format_message("Fetched a page", (), {"tenant_id": 11111, "next": None})
+        == "Fetched a page tenant_id=11111 next=None"
+    )
+    assert format_fields({"error": 'some "bad" error', "empty": ""}) == (
+        'error="some \\"bad\\" error" empty=""'
+    )
+
+
+def test_messages_are_formatted_only_when_enabled() -> None:
+    class Payload:
+        formatted_count = 0
+
+        def __str__(self) -> str:
+            Payload.formatted_count += 1
+            return "some payload"
+
+    logger = Logger(class_name="some_handler.py")
+    app_logger = logging.getLogger(APP_NAME)
+    level = app_logger.level
+    app_logger.setLevel(logging.INFO)
+    records: list[Any] = []
+    try:
+        with mock.patch.object(logging.Logger, "handle", side_effect=records.append):
+            logger.debug("Page: %s", Payload())
+            assert Payload.formatted_count == 0
+            assert records == []
+
+            logger.info("Page: %s", Payload(), tenant_id=11111)
+            assert Payload.formatted_count == 0
+    finally:
+        app_logger.setLevel(level)
+
+    assert [record.getMessage() for record in records] == [
+        "some_handler: Page: some payload tenant_id=11111"
+    ]
+    assert Payload.formatted_count == 1
@@ -0,0 +1,59 @@
+import os
+import stat
+
+from files import get_state_directory
+from freezegun import freeze_time
+from lookup_cache import LookupCache
+from pathlib import Path
+
+
+def test_lookups_are_cached_per_api_key_and_endpoint() -> None:
+    lookup_cache_path = os.path.join(get_state_directory(), "lookup_cache.json")
+    lookup_cache = LookupCache()
+    assert lookup_cache.get(api_key="some_key", endpoint="tenants") is None
+    lookup_cache.set(
+        api_key="some_key", endpoint="tenants", value={"tenants": [{"id": 11111}]}
+    )
+    lookup_cache.set(
+        api_key="some_key", endpoint="severity_filters", value={"severities": []}
+    )
+
+    # Other processes reuse them, without the API key ever being written.
+    assert LookupCache().get(api_key="some_key", endpoint="tenants") == {
+        "tenants": [{"id": 11111}]
+    }
+    assert LookupCache().get(api_key="some_other_key", endpoint="tenants") is None
+    with open(lookup_cache_path) as lookup_file:
+        assert "some_key" not in lookup_file.read()
+    assert stat.S_IMODE(os.stat(lookup_cache_path).st_mode) == 0o600
+
+    lookup_cache.invalidate(api_key="some_key", endpoint="tenants")
+    assert lookup_cache.get(api_key="some_key", endpoint="tenants") is None
+    assert lookup_cache.get(api_key="some_key", endpoint="severity_filters") == {
+        "severities": []
+    }
+
+    lookup_cache.invalidate(api_key="some_key")
+    assert lookup_cache.get(api_key="some_key", endpoint="severity_filters") is None
+
+
+def test_lookups_expire() -> None:
+    lookup_cache = LookupCache(ttl=60.0)
+
+    with freeze_time("2024-03-06 12:00:00"):
+        lookup_cache.set(api_key="some_key", endpoint="tenants", value=[11111])
+
+    with freeze_time("2024-03-06 12:00:59"):
+        assert lookup_cache.get(api_key="some_key", endpoint="tenants") == [11111]
+
+    with freeze_time("2024-03-06 12:01:00"):
+        assert lookup_cache.get(api_key="some_key", endpoint="tenants") is None
+
+
+def test_unwritable_cache_is_ignored(tmp_path: Path) -> None:
+    # The directory of the cache is a file.
+    (tmp_path / "local").touch()
+    lookup_cache = LookupCache(path=str(tmp_path / "local" / "cache.json"))
+    lookup_cache.set(api_key="some_key", endpoint="tenants", value=[11111])
+
+    assert lookup_cache.get(api_key="some_key", endpoint="tenants") is None
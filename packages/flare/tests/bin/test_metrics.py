@@ -0,0 +1,79 @@
+import json
+import os
+
+from files import get_state_directory
+from freezegun import freeze_time
+from metrics import Histogram
+from metrics import Metrics
+from metrics import write_metrics
+from pathlib import Path
+from unittest import mock
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram(buckets=(0.1, 0.2, 0.4, 0.8))
+    for value in [0.05, 0.15, 0.15, 0.3, 0.5, 1.5]:
+        histogram.observe(value)
+
+    assert histogram.count == 6
+    assert histogram.sum == 2.65
+    assert histogram.max == 1.5
+    assert histogram.quantile(0.5) == 0.2
+    assert histogram.quantile(0.8) == 0.8
+    assert histogram.quantile(0.95) == 1.5
+
+    histogram = Histogram(buckets=(0.1, 0.2))
+    histogram.observe(0.01)
+    # Never above the largest value observed.
+    assert histogram.quantile(0.5) == 0.01
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_summary() -> None:
+    metrics = Metrics()
+    metrics.observe("search_page", 1.5)
+    metrics.observe("search_page", 0.5)
+    with mock.patch("time.perf_counter", side_effect=[10.0, 10.25]):
+        with metrics.time("emit"):
+            pass
+    metrics.increment("throttles")
+    metrics.increment("throttles", 2)
+
+    summary = metrics.summary()
+    assert summary["flare.throttles"] == 3
+    assert summary["flare.search_page.count"] == 2
+    assert summary["flare.search_page.sum"] == 2.0
+    assert summary["flare.search_page.max"] == 1.5
+    assert summary["flare.emit.count"] == 1
+    assert summary["flare.emit.sum"] == 0.25
+
+
+@freeze_time("2000-01-01")
+def test_write_metrics() -> None:
+    metrics_log_path = Path(get_state_directory()) / "flare_metrics.log"
+    metrics = Metrics()
+    metrics.increment("events_fetched", 12)
+
+    write_metrics(metrics=metrics, tenant_id=11111)
+    write_metrics(metrics=Metrics())
+
+    with open(metrics_log_path) as metrics_log:
+        assert [json.loads(line) for line in metrics_log] == [
+            {
+                "timestamp": "2000-01-01T00:00:00+00:00",
+                "tenant_id": 11111,
+                "flare.events_fetched": 12,
+            },
+            {"timestamp": "2000-01-01T00:00:00+00:00"},
+        ]
+
+
+def test_write_metrics_rotates_log() -> None:
+    metrics_log_path = Path(get_state_directory()) / "flare_metrics.log"
+    with mock.patch("metrics.METRICS_LOG_MAX_SIZE", 10):
+        write_metrics(metrics=Metrics(), tenant_id=11111)
+        write_metrics(metrics=Metrics(), tenant_id=22222)
+
+    assert os.path.exists(f"{metrics_log_path}.1")
+    with open(metrics_log_path) as metrics_log:
+        assert [json.loads(line)["tenant_id"] for line in metrics_log] == [22222]
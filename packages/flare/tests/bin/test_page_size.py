@@ -0,0 +1,42 @@
+import pytest
+
+from page_size import PageSizeTuner
+
+
+def test_grows_while_pages_are_fast_and_full() -> None:
+    tuner = PageSizeTuner(page_size=100, max_page_size=300)
+
+    tuner.on_page(latency=0.5, size=1024, item_count=100)
+    assert tuner.page_size == 200
+    tuner.on_page(latency=0.5, size=1024, item_count=200)
+    assert tuner.page_size == 300
+
+    # The end of the feed says nothing about larger pages.
+    tuner = PageSizeTuner(page_size=100)
+    tuner.on_page(latency=0.5, size=1024, item_count=12)
+    assert tuner.page_size == 100
+
+
+def test_shrinks_over_the_limits() -> None:
+    tuner = PageSizeTuner(page_size=400, target_latency=5, max_page_bytes=1024)
+
+    tuner.on_page(latency=6, size=512, item_count=400)
+    assert tuner.page_size == 200
+    tuner.on_page(latency=1, size=2048, item_count=200)
+    assert tuner.page_size == 100
+
+
+def test_shrinks_after_timeouts() -> None:
+    tuner = PageSizeTuner(page_size=40, min_page_size=10)
+
+    tuner.on_timeout()
+    assert (tuner.page_size, tuner.can_shrink) == (20, True)
+    tuner.on_timeout()
+    assert (tuner.page_size, tuner.can_shrink) == (10, False)
+    tuner.on_timeout()
+    assert tuner.page_size == 10
+
+
+def test_invalid_page_size() -> None:
+    with pytest.raises(Exception, match="Page size must be between"):
+        PageSizeTuner(page_size=5, min_page_size=10)
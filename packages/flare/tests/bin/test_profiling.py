@@ -0,0 +1,46 @@
+import os
+import threading
+
+from conftest import FakeLogger
+from pathlib import Path
+from profiling import SamplingProfiler
+from profiling import profile
+
+
+def wait_for_event(event: threading.Event) -> None:
+    event.wait()
+
+
+def test_samples_every_thread() -> None:
+    event = threading.Event()
+    thread = threading.Thread(target=wait_for_event, args=(event,))
+    thread.start()
+
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    while profiler.sample_count < 20:
+        threading.Event().wait(0.001)
+    profiler.stop()
+    event.set()
+    thread.join()
+
+    functions = [function for function, _, _ in profiler.get_top_functions(100)]
+    assert any(function.startswith("wait_for_event ") for function in functions)
+    assert any(
+        function.startswith("test_samples_every_thread ") for function in functions
+    )
+
+
+def test_profile_writes_artifact(logger: FakeLogger, tmp_path: Path) -> None:
+    with profile(logger=logger, name="some_run", directory=str(tmp_path)):
+        threading.Event().wait(0.05)
+
+    [artifact] = os.listdir(tmp_path)
+    assert artifact.startswith("flare_some_run_")
+    assert artifact.endswith(".folded")
+    for line in (tmp_path / artifact).read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+    assert logger.messages[0].startswith("INFO: Profiled ")
+    assert f"saved to {tmp_path / artifact}" in logger.messages[0]
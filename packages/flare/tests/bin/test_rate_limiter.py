@@ -0,0 +1,145 @@
+import pytest
+import threading
+import time
+
+from rate_limiter import AdaptiveRateLimiter
+from rate_limiter import TokenBucket
+from rate_limiter import get_rate_limit_reset
+from rate_limiter import get_retry_after
+from unittest import mock
+
+
+def test_token_bucket_allows_burst_up_to_capacity() -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, capacity=3)
+        with mock.patch("time.sleep") as sleep:
+            assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+            sleep.assert_not_called()
+
+
+def test_token_bucket_waits_once_empty() -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, capacity=1)
+        with mock.patch("time.sleep") as sleep:
+            assert bucket.acquire() == 0.0
+            assert bucket.acquire() == 0.5
+            assert bucket.acquire() == 1.0
+            assert sleep.call_args_list == [mock.call(0.5), mock.call(1.0)]
+
+
+def test_token_bucket_refills_over_time() -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+
+    with mock.patch("time.monotonic", return_value=100.5):
+        with mock.patch("time.sleep") as sleep:
+            assert bucket.acquire() == 0.0
+            sleep.assert_not_called()
+
+
+def test_token_bucket_invalid_rate() -> None:
+    with pytest.raises(Exception, match="Rate must be greater than 0"):
+        TokenBucket(rate=0)
+
+
+def test_adaptive_rate_limiter_increases_on_success() -> None:
+    limiter = AdaptiveRateLimiter(rate=1, max_rate=1.2, increase=0.1)
+    limiter.observe(status_code=200, headers={})
+    assert limiter.rate == pytest.approx(1.1)
+    limiter.observe(status_code=200, headers={})
+    limiter.observe(status_code=200, headers={})
+    assert limiter.rate == pytest.approx(1.2)
+
+
+def test_adaptive_rate_limiter_decreases_on_throttle() -> None:
+    limiter = AdaptiveRateLimiter(rate=4, min_rate=1.5, decrease_factor=0.5)
+    with mock.patch("time.monotonic", return_value=100.0):
+        assert limiter.observe(status_code=429, headers={}) is True
+    assert limiter.rate == 2
+    with mock.patch("time.monotonic", return_value=101.0):
+        limiter.observe(status_code=429, headers={})
+    assert limiter.rate == 1.5
+    assert limiter.throttled_count == 2
+
+
+def test_adaptive_rate_limiter_does_not_speed_up_on_server_errors() -> None:
+    limiter = AdaptiveRateLimiter(rate=1)
+    assert limiter.observe(status_code=503, headers={}) is False
+    assert limiter.rate == 1
+
+
+def test_adaptive_rate_limiter_decreases_once_per_interval() -> None:
+    limiter = AdaptiveRateLimiter(rate=4, decrease_interval=1.0)
+    with mock.patch("time.monotonic", return_value=100.0):
+        # Every call in flight is throttled at once.
+        for _ in range(5):
+            limiter.observe(status_code=429, headers={})
+    assert limiter.rate == 2
+    assert limiter.throttled_count == 5
+
+    with mock.patch("time.monotonic", return_value=100.5):
+        limiter.observe(status_code=429, headers={})
+    assert limiter.rate == 2
+
+    with mock.patch("time.monotonic", return_value=101.0):
+        limiter.observe(status_code=429, headers={})
+    assert limiter.rate == 1
+
+
+def test_adaptive_rate_limiter_counts_concurrent_throttles() -> None:
+    limiter = AdaptiveRateLimiter(rate=4)
+    threads = [
+        threading.Thread(target=lambda: [limiter.on_throttled() for _ in range(1000)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.throttled_count == 8000
+
+
+def test_adaptive_rate_limiter_waits_for_retry_after() -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        limiter = AdaptiveRateLimiter(rate=1, capacity=5)
+        limiter.observe(status_code=429, headers={"Retry-After": "3"})
+        with mock.patch("time.sleep") as sleep:
+            assert limiter.acquire() == 3.0
+            sleep.assert_called_once_with(3.0)
+
+
+def test_adaptive_rate_limiter_pause_is_interrupted_by_stop_event() -> None:
+    stop_event = threading.Event()
+    limiter = AdaptiveRateLimiter(rate=1, stop_event=stop_event)
+    limiter.observe(status_code=429, headers={"Retry-After": "600"})
+
+    threading.Timer(0.05, stop_event.set).start()
+    started_at = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started_at < 5
+
+
+def test_adaptive_rate_limiter_waits_for_exhausted_quota_reset() -> None:
+    with mock.patch("time.monotonic", return_value=100.0):
+        limiter = AdaptiveRateLimiter(rate=1, capacity=5)
+        limiter.observe(
+            status_code=200,
+            headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "7"},
+        )
+        with mock.patch("time.sleep"):
+            assert limiter.acquire() == 7.0
+
+
+def test_get_retry_after() -> None:
+    assert get_retry_after({}) is None
+    assert get_retry_after({"Retry-After": "2.5"}) == 2.5
+    assert get_retry_after({"Retry-After": "not a date"}) is None
+    with mock.patch("time.time", return_value=784111777.0):
+        assert get_retry_after({"Retry-After": "Sun, 06 Nov 1994 08:49:47 GMT"}) == 10.0
+
+
+def test_get_rate_limit_reset_from_epoch() -> None:
+    with mock.patch("time.time", return_value=1000000.0):
+        assert get_rate_limit_reset({"RateLimit-Reset": "1000012"}) == 12.0
+        assert get_rate_limit_reset({"RateLimit-Reset": "12"}) == 12.0
@@ -0,0 +1,62 @@
+import os
+import pytest
+
+from spool import Spool
+
+
+def test_events_are_read_in_order(tmp_path: str) -> None:
+    with Spool(path=str(tmp_path)) as spool:
+        offset = spool.start
+        spool.emit({"uid": 1})
+        spool.emit({"uid": 2})
+        assert spool.read(offset) == ([], offset)
+
+        spool.flush()
+        events, offset = spool.read(offset)
+        assert events == [{"uid": 1}, {"uid": 2}]
+        assert offset == spool.end
+
+        spool.emit({"uid": 3})
+        spool.flush()
+        assert spool.read(offset) == ([{"uid": 3}], spool.end)
+
+
+def test_segments_are_rolled_and_removed(tmp_path: str) -> None:
+    with Spool(path=str(tmp_path), segment_size=1, max_buffer_size=0) as spool:
+        for uid in range(10):
+            spool.emit({"uid": uid, "data": "some_data"})
+        assert len(os.listdir(tmp_path)) == 11
+
+        events: list[dict] = []
+        offset = spool.start
+        while offset < spool.end:
+            batch, offset = spool.read(offset, max_size=8)
+            events.extend(batch)
+        assert [event["uid"] for event in events] == list(range(10))
+
+        size = spool.size
+        spool.remove_before(offset)
+        assert os.listdir(tmp_path) == ["0000000010.seg"]
+        assert spool.size < size
+        assert spool.start == offset == spool.end
+
+
+def test_torn_write_is_dropped_on_reopen(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Like on Windows, where os.pread is missing.
+    monkeypatch.delattr(os, "pread", raising=False)
+
+    with Spool(path=str(tmp_path)) as spool:
+        spool.emit({"uid": 1})
+    end = spool.end
+
+    # A crash in the middle of writing the second event.
+    with open(os.path.join(tmp_path, "0000000000.seg"), "ab") as segment:
+        segment.write(b'{"uid": ')
+
+    with Spool(path=str(tmp_path)) as spool:
+        assert spool.end == end
+        spool.emit({"uid": 2})
+        spool.flush()
+        assert spool.read(spool.start) == ([{"uid": 1}, {"uid": 2}], spool.end)
@@ -0,0 +1,47 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from freezegun import freeze_time
+from token_cache import TokenCache
+
+
+@freeze_time("2024-03-06 12:00:00")
+def test_tokens_are_cached_per_api_key_and_tenant() -> None:
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=45)
+
+    token_cache = TokenCache()
+    assert token_cache.get(api_key="some_key", tenant_id=11111) is None
+    token_cache.set(
+        api_key="some_key", tenant_id=11111, token="some_token", expires_at=expires_at
+    )
+
+    assert token_cache.get(api_key="some_key", tenant_id=11111) == (
+        "some_token",
+        expires_at,
+    )
+    assert token_cache.get(api_key="some_key", tenant_id=22222) is None
+    assert token_cache.get(api_key="some_other_key", tenant_id=11111) is None
+
+    # The tokens are never shared with other processes.
+    assert TokenCache().get(api_key="some_key", tenant_id=11111) is None
+
+    token_cache.invalidate(api_key="some_key", tenant_id=11111)
+    assert token_cache.get(api_key="some_key", tenant_id=11111) is None
+
+
+def test_tokens_expiring_soon_are_not_reused() -> None:
+    token_cache = TokenCache()
+
+    with freeze_time("2024-03-06 12:00:00"):
+        token_cache.set(
+            api_key="some_key",
+            tenant_id=11111,
+            token="some_token",
+            expires_at=datetime.now(timezone.utc) + timedelta(minutes=45),
+        )
+
+    with freeze_time("2024-03-06 12:39:59"):
+        assert token_cache.get(api_key="some_key", tenant_id=11111) is not None
+
+    with freeze_time("2024-03-06 12:40:00"):
+        assert token_cache.get(api_key="some_key", tenant_id=11111) is None
@@ -24,6 +24,20 @@ export interface SourceTypeCategory extends SourceType {
     types: SourceType[];
 }
 
+export interface TenantIngestionStatus {
+    last_checkpoint_at: string | null;
+    newest_materialized_at: string | null;
+    backlog_seconds: number | null;
+    events_emitted: number;
+    events_per_second: number;
+    errors: number;
+    retries: number;
+    throttles: number;
+    backfill: { progress: number; done: boolean } | null;
+}
+
 export interface IngestionStatus {
     last_fetched_at: string;
+    rate_limit?: { rate: number; throttled_count: number } | null;
+    tenants?: Record<string, TenantIngestionStatus>;
 }